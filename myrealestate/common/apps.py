@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myrealestate.common'
+
+    def ready(self):
+        # Import signal handlers
+        import myrealestate.common.signals
@@ -1,4 +1,5 @@
 # context_processors.py
+from .fragment_cache import FragmentKeys, FRAGMENT_TIMEOUT
 from .storage import StorageHealthCheck
 
 def storage_status(request):
@@ -7,4 +8,11 @@ def storage_status(request):
     return {
         'storage_healthy': is_healthy,
         'storage_last_checked': last_checked
-    }
\ No newline at end of file
+    }
+
+def fragment_cache(request):
+    """Vary-on keys for the cached navigation and picker fragments"""
+    return {
+        'fragment_keys': FragmentKeys(request),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+    }
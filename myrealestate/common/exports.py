@@ -0,0 +1,51 @@
+"""
+Streaming CSV/XLSX writers for list exports.
+
+Both writers consume a row iterator (normally a values_list queryset iterated with
+a server-side cursor) and never hold more than one chunk of rows in memory.
+"""
+import csv
+import tempfile
+
+from django.http import StreamingHttpResponse, FileResponse
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """File-like object that hands back what is written, so csv.writer can feed a generator"""
+    def write(self, value):
+        return value
+
+
+def csv_response(headers, rows, filename):
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(headers, rows, filename, sheet_title='Export'):
+    """
+    XLSX is a zip archive, so it cannot be emitted row by row. The write-only workbook
+    spools rows to disk as they are appended, and the finished file is streamed back
+    from a temporary file.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,90 @@
+"""
+Cache keys for template fragments that rarely change.
+
+The navigation partials and the amenity/feature pickers are wrapped in {% cache %}
+blocks that vary on the keys exposed here as `fragment_keys`. Each key combines the
+company, the user's role in it and version tokens kept in the shared Django cache.
+A signal handler replaces the relevant token when its inputs change (see
+common.signals and properties.catalog), so stale fragments are never looked up
+again and simply expire.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+COMPANY = 'company'
+USER = 'user'
+
+
+def version_key(name, scope):
+    return f"fragment_version:{name}:{scope}"
+
+
+def get_versions(*pairs):
+    """Current token for each (name, scope) pair, creating any that are missing"""
+    keys = [version_key(name, scope) for name, scope in pairs]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        token = time.time_ns()
+        for key in missing:
+            cache.add(key, token, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def bump_versions(name, scopes):
+    keys = [version_key(name, scope) for scope in set(scopes)]
+    if not keys:
+        return
+
+    def bump():
+        token = time.time_ns()
+        cache.set_many({key: token for key in keys}, timeout=None)
+
+    bump()
+    # Again after commit, in case a request re-rendered from the old rows in between
+    transaction.on_commit(bump)
+
+
+class FragmentKeys:
+    """Lazily computed vary-on values for the {% cache %} blocks of one request"""
+
+    def __init__(self, request):
+        self.request = request
+
+    @cached_property
+    def company_id(self):
+        return (getattr(self.request, 'company', None) or {}).get('id')
+
+    @cached_property
+    def role(self):
+        return (getattr(self.request, 'company', None) or {}).get('access_level', '')
+
+    @cached_property
+    def _versions(self):
+        user = getattr(self.request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        company_version, user_version = get_versions((COMPANY, self.company_id), (USER, user_id))
+        return user_id, company_version, user_version
+
+    @cached_property
+    def sidebar(self):
+        _, company_version, _ = self._versions
+        return f"{self.company_id}:{self.role}:{company_version}"
+
+    @cached_property
+    def topbar(self):
+        # Also lists the user's other companies and shows their name
+        user_id, company_version, user_version = self._versions
+        return f"{user_id}:{self.company_id}:{self.role}:{company_version}:{user_version}"
+
+    @cached_property
+    def catalog(self):
+        from myrealestate.properties.catalog import amenity_catalog, feature_catalog
+
+        return f"{amenity_catalog.current_version()}:{feature_catalog.current_version()}"
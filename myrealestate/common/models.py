@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import DEFERRED
 from djmoney.models.fields import MoneyField
 
 class BaseModel(models.Model):
@@ -14,6 +15,58 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class LoadedValuesMixin:
+    '''
+    Remembers the column values an instance was loaded with, so that save/delete hooks
+    can work out what changed without re-reading the row.
+    '''
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, (value for value in values if value is not DEFERRED)))
+        return instance
+
+    def get_loaded_values(self):
+        '''Values as loaded from the database, or None for an instance that was never loaded'''
+        return getattr(self, '_loaded_values', None)
+
+    def reset_loaded_values(self):
+        '''Treat the current in-memory values as the stored ones (call after a successful save)'''
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+
+
+class CounterCacheMixin:
+    '''
+    For models with counter cache columns maintained via F() updates elsewhere.
+    Saving an existing instance never writes those columns back, so a stale
+    in-memory count cannot overwrite a concurrent increment.
+    '''
+    counter_cache_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and self.counter_cache_fields:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_cache_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+
+class SoftDeleteManager(models.Manager):
+    '''
+    Default manager for models with an is_deleted flag. Rows flagged for background
+    deletion disappear from every query at once; declare `all_objects = models.Manager()`
+    alongside it for the code that has to see them.
+    '''
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 
 class CurrencyField(MoneyField):
     def __init__(self, *args, **kwargs):
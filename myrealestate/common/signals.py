@@ -0,0 +1,39 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from myrealestate.accounts.models import User, UserCompanyAccess
+from myrealestate.companies.models import Company
+
+from .fragment_cache import COMPANY, USER, bump_versions
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company_fragments(sender, instance, **kwargs):
+    bump_versions(COMPANY, [instance.pk])
+    # Every member's topbar lists the company by name
+    bump_versions(USER, UserCompanyAccess.objects.filter(company=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_fragments(sender, instance, **kwargs):
+    bump_versions(USER, [instance.pk])
+
+
+@receiver(post_save, sender=UserCompanyAccess)
+@receiver(post_delete, sender=UserCompanyAccess)
+def invalidate_access_fragments(sender, instance, **kwargs):
+    bump_versions(USER, [instance.user_id])
+
+
+@receiver(m2m_changed, sender=UserCompanyAccess)
+def invalidate_membership_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.companies.add()/remove() write the through rows without post_save
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_versions(USER, [instance.pk])
+    elif action == 'pre_clear':
+        bump_versions(USER, UserCompanyAccess.objects.filter(company=instance).values_list('user_id', flat=True))
+    else:
+        bump_versions(USER, pk_set)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from myrealestate.accounts.models import UserTypeEnums
+from myrealestate.accounts.tests.factories import UserFactory
+from myrealestate.common.fragment_cache import COMPANY, get_versions
+from myrealestate.companies.models import Company
+from myrealestate.properties.models import Amenity
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Acme Rentals")
+        self.user.companies.add(self.company, through_defaults={'access_level': UserTypeEnums.COMPANY_OWNER})
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('properties:create-unit')
+
+    def test_navigation_served_from_cache(self):
+        self.client.get(self.url)
+        # A write that bypasses signals is not picked up...
+        Company.objects.filter(pk=self.company.pk).update(name="Renamed Quietly")
+        response = self.client.get(self.url)
+        self.assertContains(response, "Acme Rentals")
+        self.assertNotContains(response, "Renamed Quietly")
+
+        # ...but saving the company invalidates its fragments
+        self.company.name = "Acme Property Group"
+        self.company.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Acme Property Group")
+        self.assertNotContains(response, "Acme Rentals")
+
+    def test_new_company_access_refreshes_topbar(self):
+        self.client.get(self.url)
+        other = Company.objects.create(name="Second Portfolio")
+        self.user.companies.add(other, through_defaults={'access_level': UserTypeEnums.COMPANY_USER})
+        self.assertContains(self.client.get(self.url), "Second Portfolio")
+
+    def test_amenity_picker_follows_catalog(self):
+        Amenity.objects.create(name="Pool", category="Recreation", icon="pool")
+        self.assertContains(self.client.get(self.url), "Pool")
+        Amenity.objects.create(name="Sauna", category="Recreation", icon="sauna")
+        self.assertContains(self.client.get(self.url), "Sauna")
+
+    def test_company_save_bumps_version(self):
+        before, = get_versions((COMPANY, self.company.pk))
+        self.company.save()
+        after, = get_versions((COMPANY, self.company.pk))
+        self.assertNotEqual(before, after)
@@ -7,7 +7,9 @@ from django.http import Http404, JsonResponse, HttpResponseBadRequest
 from django.template.loader import render_to_string
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
+from django.utils import timezone
 from .utils import getCurrentCompany
+from .exports import csv_response, xlsx_response
 from .mixins import CompanyRequiredMixin
 from icecream import ic
 from django.contrib.contenttypes.models import ContentType
@@ -46,6 +48,7 @@ class BaseListView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, ListView)
     paginate_by = 10
     search_fields = []  # Fields to search in
     ordering = "-created_at"  # Default ordering
+    export_url_name = None  # URL name of the matching ExportMixin view, if any
     
     def get_queryset(self):
         # First get company-filtered queryset
@@ -74,6 +77,7 @@ class BaseListView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, ListView)
             "can_delete": self.has_delete_permission(),
             'app_name': self.model._meta.app_label,
             'model_name': self.model._meta.model_name,
+            'export_url': reverse(self.export_url_name) if self.export_url_name else None,
         })
         return context
     
@@ -89,6 +93,47 @@ class BaseListView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, ListView)
         """Check if user can delete objects"""
         return True
 
+class ExportMixin:
+    """
+    Mixin for list views that streams the filtered queryset as CSV or XLSX (?format=xlsx)
+    instead of rendering a page. Rows are read as values_list tuples through a
+    server-side cursor, so memory stays flat however large the portfolio is.
+    """
+    export_fields = ()  # (header, lookup) pairs
+    export_chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        headers = [header for header, _ in self.export_fields]
+        rows = self.get_export_rows(queryset)
+        filename = f"{self.model._meta.verbose_name_plural.replace(' ', '-')}-{timezone.localdate():%Y-%m-%d}"
+
+        if request.GET.get('format') == 'xlsx':
+            return xlsx_response(headers, rows, f"{filename}.xlsx", sheet_title=str(self.model._meta.verbose_name_plural))
+        return csv_response(headers, rows, f"{filename}.csv")
+
+    def get_export_rows(self, queryset):
+        lookups = [lookup for _, lookup in self.export_fields]
+        converters = [self._choice_labels(lookup) for lookup in lookups]
+        # List views may prefetch relations for display; an export only needs the columns
+        for row in queryset.prefetch_related(None).values_list(*lookups).iterator(chunk_size=self.export_chunk_size):
+            yield [
+                labels.get(value, value) if labels else value
+                for labels, value in zip(converters, row)
+            ]
+
+    def _choice_labels(self, lookup):
+        """Map stored choice codes to their labels so exports read like the UI"""
+        model = self.model
+        *relations, name = lookup.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        field = model._meta.get_field(name)
+        if getattr(field, 'choices', None):
+            return {value: str(label) for value, label in field.flatchoices}
+        return None
+
+
 class BaseCreateView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, CreateView):
     """Base create view"""
     template_name = "common/form.html"
@@ -48,7 +48,7 @@ class TestCompanyMiddleware(TestCase):
         request = self._get_request()
         
         # Set initial company data in session
-        company_data = company_dict(self.company, self.user)
+        company_data = company_dict(self.company, UserTypeEnums.COMPANY_OWNER)
         request.session['company'] = company_data
         request.session['current_company_id'] = self.company.id
         
@@ -75,6 +75,37 @@ class TestCompanyMiddleware(TestCase):
         self.assertIsNone(request.company)
 
 
+class TestCompanyMiddlewareRole(TestCase):
+    def setUp(self):
+        self.middleware = CompanyMiddleware(get_response=lambda req: HttpResponse())
+        self.user = UserFactory()
+        self.company = Company.objects.create(name="Test Company")
+        self.user.companies.add(self.company, through_defaults={'access_level': UserTypeEnums.COMPANY_OWNER})
+
+    def _get_request(self):
+        request = RequestFactory().get('/')
+        SessionMiddleware(lambda req: HttpResponse()).process_request(request)
+        request.user = self.user
+        return request
+
+    def test_refresh_reads_role_from_membership(self):
+        request = self._get_request()
+        request.refresh_company = True
+
+        with self.assertNumQueries(1):
+            self.middleware.process_request(request)
+        self.assertEqual(request.company['access_level'], UserTypeEnums.COMPANY_OWNER)
+
+    def test_session_without_role_is_recomputed(self):
+        request = self._get_request()
+        request.session['company'] = {'id': self.company.id, 'name': self.company.name}
+        request.session['current_company_id'] = self.company.id
+
+        self.middleware.process_request(request)
+        self.assertEqual(request.company['access_level'], UserTypeEnums.COMPANY_OWNER)
+        self.assertEqual(request.session['company']['access_level'], UserTypeEnums.COMPANY_OWNER)
+
+
 class TestCompanyContextProcessor(TestCase):
     def setUp(self):
         self.client = Client()
@@ -95,7 +126,7 @@ class TestCompanyContextProcessor(TestCase):
         request.user = self.user
         
         # Simulate middleware
-        company_data = company_dict(self.company, self.user)
+        company_data = company_dict(self.company, UserTypeEnums.COMPANY_OWNER)
         request.company = company_data
         
         context = company_context(request)
@@ -121,7 +152,7 @@ class TestCompanyContextProcessor(TestCase):
         request.user = self.user
         
         # Set invalid company data
-        invalid_company_data = company_dict(CompanyFactory(), self.user)
+        invalid_company_data = company_dict(CompanyFactory(), UserTypeEnums.COMPANY_OWNER)
         request.company = invalid_company_data
         
         context = company_context(request)
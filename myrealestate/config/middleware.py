@@ -1,28 +1,31 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
-from myrealestate.accounts.models import User
+from myrealestate.accounts.models import User, UserCompanyAccess
 from myrealestate.companies.models import Company
 
 
-def company_dict(company: Company, user: User) -> dict:
+def company_dict(company: Company, access_level: str) -> dict:
     return {
         'id': company.id,
         'name': company.name,
+        'access_level': access_level,
     }
 
 
+def company_memberships(user: User):
+    """The user's company access rows with their company, in company order"""
+    return UserCompanyAccess.objects.filter(user=user).select_related('company').order_by('company_id', 'pk')
+
+
 @receiver(user_logged_in)
 def store_company_details(sender, user: User, request, **kwargs):
     if user.is_authenticated:
-        companies = Company.objects.filter(
-            usercompanyaccess__user=user
-        ).distinct()
-        
-        if companies.exists():
-            company = companies.first()
-            request.session['company'] = company_dict(company, user)
-            request.session['current_company_id'] = company.id
+        membership = company_memberships(user).first()
+
+        if membership:
+            request.session['company'] = company_dict(membership.company, membership.access_level)
+            request.session['current_company_id'] = membership.company_id
         else:
             request.session['company'] = None
             request.session['current_company_id'] = None
@@ -32,7 +35,9 @@ class CompanyMiddleware(MiddlewareMixin):
     def process_request(self, request):
         company_details = request.session.get('company')
 
-        if getattr(request, 'refresh_company', False):
+        # Sessions stored before the role was cached in them lack access_level
+        stale = bool(company_details) and 'access_level' not in company_details
+        if stale or getattr(request, 'refresh_company', False):
             company_details = self.refresh_company_details(request)
 
         request.company = company_details if company_details else None
@@ -40,21 +45,18 @@ class CompanyMiddleware(MiddlewareMixin):
     def refresh_company_details(self, request):
         user = request.user
         if user.is_authenticated:
-            companies = Company.objects.filter(
-                usercompanyaccess__user=user
-            ).distinct()
-            
-            if companies.exists():
+            memberships = list(company_memberships(user))
+
+            if memberships:
                 # Try to get current company from session, fall back to first company
                 current_company_id = request.session.get('current_company_id')
-                try:
-                    company = companies.get(id=current_company_id)
-                except Company.DoesNotExist:
-                    company = companies.first()
-                
-                company_details = company_dict(company, user)
+                membership = next(
+                    (access for access in memberships if access.company_id == current_company_id), memberships[0]
+                )
+
+                company_details = company_dict(membership.company, membership.access_level)
                 request.session['company'] = company_details
-                request.session['current_company_id'] = company.id
+                request.session['current_company_id'] = membership.company_id
                 return company_details
         
         request.session['company'] = None
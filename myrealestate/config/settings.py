@@ -40,6 +40,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -53,7 +54,8 @@ PROJECT_APPS = [
     'myrealestate.theme',
     'myrealestate.companies',
     'myrealestate.properties',
-    'myrealestate.finances.apps.FinancesConfig'
+    'myrealestate.finances.apps.FinancesConfig',
+    'myrealestate.listings',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + PROJECT_APPS
@@ -80,12 +82,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'myrealestate.config.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Compile each template once per process instead of on every render
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'myrealestate' / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -93,6 +103,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'myrealestate.companies.context_processors.company_context',
                 'myrealestate.common.context_processor.storage_status',
+                'myrealestate.common.context_processor.fragment_cache',
             ],
         },
     },
@@ -101,6 +112,18 @@ TEMPLATES = [
 WSGI_APPLICATION = 'myrealestate.config.wsgi.application'
 
 
+# Cache
+# Fragment and catalog version tokens must be shared by every worker process, so
+# production should point this at a shared backend (e.g. Redis or Memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -27,4 +27,6 @@ urlpatterns = [
     path('home/', home, name='home'),
     path('properties/', include('myrealestate.properties.urls', namespace='properties')),
     path('company/', include('myrealestate.companies.urls', namespace='companies')),
+    path('finances/', include('myrealestate.finances.urls', namespace='finances')),
+    path('listings/', include('myrealestate.listings.urls', namespace='listings')),
 ]
\ No newline at end of file
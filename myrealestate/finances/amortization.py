@@ -0,0 +1,193 @@
+"""
+Amortization schedules for property bonds.
+
+simulate() amortizes any number of bonds together. Each bond is a row of a
+(bond x month) grid and the months are stepped through once, with every operation
+applied to all bonds at a time. The rate for each payment comes from the PrimeRate
+history plus the bond's margin for prime-linked bonds, or is the bond's
+current_interest_rate otherwise (and for dates before the first prime rate). The
+instalment is the annuity over the remaining term, recomputed every month, so it
+follows rate changes the way a variable-rate bond does. During a payment holiday no
+instalment is due and the interest is added to the balance.
+
+Schedules are cached per bond version (bumped by finances.signals when the bond or
+the prime rate history changes). balance_as_of() answers from the cached closing
+balances with a binary search instead of simulating from the start again.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+
+from myrealestate.common.fragment_cache import bump_versions, get_versions
+from .models import PrimeRate
+from .utils import CENT
+
+BOND_VERSION = 'bond'
+PRIME_VERSION = 'prime_rate'
+SCHEDULE_TIMEOUT = 60 * 60 * 24 * 7
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def invalidate(bond_ids):
+    bump_versions(BOND_VERSION, bond_ids)
+
+
+def invalidate_prime_rates():
+    bump_versions(PRIME_VERSION, ['all'])
+
+
+def _money(value):
+    return Decimal(float(value)).quantize(CENT)
+
+
+def _to_date(value):
+    return date.fromordinal(int(value.astype(np.int64)) + EPOCH)
+
+
+class AmortizationSchedule:
+    """One row per instalment: payment dates, the annual rate applied and the amounts"""
+    fields = ('rate', 'opening', 'interest', 'capital', 'payment', 'closing')
+
+    def __init__(self, bond_id, principal, dates, rate, opening, interest, capital, payment, closing):
+        self.bond_id = bond_id
+        self.principal = principal
+        self.dates = dates
+        self.rate = rate
+        self.opening = opening
+        self.interest = interest
+        self.capital = capital
+        self.payment = payment
+        self.closing = closing
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self):
+        """The schedule as dicts, amounts rounded to cents"""
+        return [
+            {
+                'date': _to_date(self.dates[i]),
+                'rate': round(float(self.rate[i]), 4),
+                **{field: round(float(getattr(self, field)[i]), 2) for field in self.fields[1:]},
+            }
+            for i in range(len(self))
+        ]
+
+    def _index(self, day):
+        """Number of payments made on or before `day`"""
+        return int(np.searchsorted(self.dates, np.datetime64(day, 'D'), side='right'))
+
+    def balance_as_of(self, day):
+        paid = self._index(day)
+        balance = self.principal if paid == 0 else self.closing[paid - 1]
+        return _money(balance)
+
+    def split(self, start, end):
+        """Interest and capital paid between `start` and `end` inclusive: {'interest', 'capital', 'payment'}"""
+        first, last = self._index(start - timedelta(days=1)), self._index(end)
+        return {
+            field: _money(getattr(self, field)[first:last].sum())
+            for field in ('interest', 'capital', 'payment')
+        }
+
+
+def prime_history():
+    rates = list(PrimeRate.objects.order_by('effective_date').values_list('effective_date', 'rate'))
+    return (
+        np.array([day.toordinal() - EPOCH for day, _ in rates], dtype=np.int64).astype('datetime64[D]'),
+        np.array([float(rate) for _, rate in rates]),
+    )
+
+
+def payment_dates(bonds, months):
+    """(bond x month) grid of instalment dates: monthly from the month after start, on the payment day"""
+    starts = np.array([bond.start_date.toordinal() - EPOCH for bond in bonds], dtype=np.int64).astype('datetime64[D]')
+    days = np.array([bond.payment_day for bond in bonds], dtype=np.int64)
+    grid = starts.astype('datetime64[M]')[:, None] + np.arange(1, months + 1)[None, :]
+    month_starts = grid.astype('datetime64[D]')
+    month_lengths = ((grid + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    return month_starts + (np.minimum(days[:, None], month_lengths) - 1).astype('timedelta64[D]')
+
+
+def simulate(bonds, history=None):
+    """Amortization schedules of `bonds`, computed together. Returns {bond id: AmortizationSchedule}"""
+    bonds = list(bonds)
+    if not bonds:
+        return {}
+    prime_dates, prime_rates = history if history is not None else prime_history()
+    terms = np.array([bond.term_months for bond in bonds], dtype=np.int64)
+    months = int(terms.max())
+    dates = payment_dates(bonds, months)
+
+    # Annual rate on every payment date
+    fixed = np.array([float(bond.current_interest_rate) for bond in bonds])
+    margins = np.array([float(bond.prime_rate_margin) for bond in bonds])
+    linked = np.array([bond.prime_linked for bond in bonds])
+    rates = np.broadcast_to(fixed[:, None], dates.shape).copy()
+    if len(prime_rates):
+        position = np.searchsorted(prime_dates, dates, side='right') - 1
+        prime = np.where(position >= 0, prime_rates[np.maximum(position, 0)] + margins[:, None], np.nan)
+        rates = np.where(linked[:, None] & ~np.isnan(prime), prime, rates)
+    monthly = rates / 1200
+
+    holiday = np.zeros(dates.shape, dtype=bool)
+    for row, bond in enumerate(bonds):
+        if bond.has_payment_holiday and bond.payment_holiday_end_date:
+            holiday_start = np.datetime64(bond.payment_holiday_start_date or bond.start_date, 'D')
+            holiday[row] = (dates[row] >= holiday_start) & (dates[row] <= np.datetime64(bond.payment_holiday_end_date, 'D'))
+
+    principal = np.array([float(bond.bond_amount.amount) for bond in bonds])
+    opening, interest, payment, closing = (np.zeros(dates.shape) for _ in range(4))
+    balance = principal.copy()
+    for month in range(months):
+        active = month < terms
+        r = monthly[:, month]
+        remaining = np.maximum(terms - month, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annuity = np.where(r > 0, balance * r / (1 - (1 + r) ** -remaining), balance / remaining)
+        opening[:, month] = balance
+        interest[:, month] = balance * r
+        payment[:, month] = np.where(active & ~holiday[:, month], annuity, 0)
+        balance = np.where(active, balance + interest[:, month] - payment[:, month], balance)
+        closing[:, month] = balance
+
+    return {
+        bond.pk: AmortizationSchedule(
+            bond.pk, principal[row], dates[row, :terms[row]], rates[row, :terms[row]],
+            opening[row, :terms[row]], interest[row, :terms[row]],
+            payment[row, :terms[row]] - interest[row, :terms[row]],
+            payment[row, :terms[row]], closing[row, :terms[row]],
+        )
+        for row, bond in enumerate(bonds)
+    }
+
+
+def schedules_for(bonds):
+    """Cached amortization schedules of `bonds`, simulating the missing ones in one batch"""
+    bonds = list(bonds)
+    versions = get_versions((PRIME_VERSION, 'all'), *[(BOND_VERSION, bond.pk) for bond in bonds])
+    prime_version, bond_versions = versions[0], versions[1:]
+    keys = {
+        bond.pk: f"amortization:{bond.pk}:{version}:{prime_version}"
+        for bond, version in zip(bonds, bond_versions)
+    }
+    cached = cache.get_many(keys.values())
+    schedules = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [bond for bond in bonds if bond.pk not in schedules]
+    if missing:
+        computed = simulate(missing)
+        cache.set_many({keys[pk]: schedule for pk, schedule in computed.items()}, SCHEDULE_TIMEOUT)
+        schedules.update(computed)
+    return schedules
+
+
+def schedule_for(bond):
+    return schedules_for([bond])[bond.pk]
+
+
+def outstanding_balances(bonds, as_of):
+    """{bond id: capital owed} on `as_of` for many bonds, from their cached schedules"""
+    return {pk: schedule.balance_as_of(as_of) for pk, schedule in schedules_for(bonds).items()}
@@ -0,0 +1,401 @@
+"""
+Bank statement import.
+
+parse_statement() reads a CSV or OFX statement as a generator of normalized
+StatementLines. It never holds the whole file in memory. import_statement() matches
+each line to a property and category, tried in this order:
+
+- the company's StatementRules, by priority
+- an account number in the line: a municipal account (Municipal Rates), a body
+  corporate (Body Corporate Levy) or a bond (Bond Repayment, which is then split into
+  interest and capital)
+
+It then inserts the matched lines as FinancialTransactions in chunks.
+
+Every line gets a stable hash, stored in the unique FinancialTransaction.import_hash
+column, so importing the same or an overlapping statement again adds nothing twice.
+The hash is the bank's transaction id (OFX FITID) when there is one. Otherwise it is
+built from the account, date, amount, description and reference, plus the number of
+identical lines before it in the file, so two equal card payments on one day both
+count. Lines no rule matches are returned, so rules can be added and the file imported
+again.
+
+Each chunk is inserted with bulk_create(ignore_conflicts=True). One import_hash__in
+query then finds the rows this insert actually added, and the monthly summary and
+tax reports are updated for those rows only.
+"""
+import csv
+import hashlib
+import html
+import re
+import time
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import NamedTuple
+
+from django.db import transaction
+
+from . import bond_splits, tax_report
+from .utils import CENT
+from .forecast import BOND_CATEGORY, LEVY_CATEGORY
+from .models import (
+    FinancialTransaction, FinancialCategory, MunicipalAccount, BodyCorporate, PropertyBond, MonthlySummary,
+    StatementRule, CategoryType, TransactionType, PaymentMethod,
+)
+from .models.summaries import summary_values
+from .models.transactions import tax_year_for
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+MUNICIPAL_CATEGORY = ("Municipal Rates", CategoryType.EXPENSE)
+
+# Account numbers shorter than this match too much of an unrelated description
+MIN_ACCOUNT_NUMBER_LENGTH = 4
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%Y%m%d', '%d-%m-%Y', '%d %b %Y', '%d %B %Y')
+
+# Accepted CSV column names, lower case
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posting date', 'posted date', 'value date'),
+    'amount': ('amount', 'transaction amount', 'amount (zar)'),
+    'debit': ('debit', 'debit amount', 'money out', 'withdrawals'),
+    'credit': ('credit', 'credit amount', 'money in', 'deposits'),
+    'description': ('description', 'narrative', 'details', 'transaction description', 'payee', 'memo'),
+    'reference': ('reference', 'ref', 'reference number', 'beneficiary reference'),
+    'account': ('account', 'account number'),
+}
+
+
+class StatementError(ValueError):
+    """A statement line that cannot be read"""
+
+
+class StatementLine(NamedTuple):
+    date: date
+    amount: Decimal  # positive for money in, negative for money out
+    description: str
+    reference: str = ''
+    account: str = ''
+    bank_id: str = ''  # the bank's own id for the line (OFX FITID), if it has one
+
+
+def normalize_text(value):
+    """Collapse whitespace and upper-case, so the same line always reads the same"""
+    return ' '.join((value or '').split()).upper()
+
+
+def squash(value):
+    """Only the letters and digits, for comparing account numbers however they are spaced"""
+    return re.sub(r'[^0-9A-Z]', '', (value or '').upper())
+
+
+def parse_amount(value):
+    """
+    A statement amount as a Decimal. Understands thousands separators, a leading R,
+    and negatives written as -1.00, 1.00-, (1.00) or 1.00 DR.
+    """
+    text = (value or '').strip().upper().replace(',', '').replace(' ', '')
+    if not text:
+        return None
+    negative = False
+    if text.startswith('(') and text.endswith(')'):
+        negative, text = True, text[1:-1]
+    if text.endswith('DR') or text.endswith('CR'):
+        negative, text = negative or text.endswith('DR'), text[:-2]
+    if text.endswith('-'):
+        negative, text = True, text[:-1]
+    text = text.lstrip('R')
+    try:
+        amount = Decimal(text).quantize(CENT)
+    except InvalidOperation:
+        raise StatementError(f"Invalid amount {value!r}")
+    return -amount if negative else amount
+
+
+class DateParser:
+    """
+    Parses dates in any of DATE_FORMATS, trying the format that worked last first. A
+    statement repeats a few hundred dates, so each is parsed once.
+    """
+    def __init__(self):
+        self.formats = list(DATE_FORMATS)
+        self.parsed = {}
+
+    def __call__(self, value):
+        text = (value or '').strip()
+        if text in self.parsed:
+            return self.parsed[text]
+        for index, date_format in enumerate(self.formats):
+            try:
+                parsed = datetime.strptime(text, date_format).date()
+            except ValueError:
+                continue
+            if index:
+                self.formats.insert(0, self.formats.pop(index))
+            self.parsed[text] = parsed
+            return parsed
+        raise StatementError(f"Invalid date {value!r}")
+
+
+def _csv_columns(header):
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for column, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[column] = names.index(alias)
+                break
+    if 'date' in columns and ('amount' in columns or 'debit' in columns or 'credit' in columns):
+        return columns
+    return None
+
+
+def parse_csv(stream, account=''):
+    """
+    Statement lines of a CSV file with a header row. Rows before the header (bank
+    details, opening balance) are skipped. The amount comes from one signed column
+    or from separate debit and credit columns.
+    """
+    rows = csv.reader(stream)
+    columns = None
+    parse_date = DateParser()
+    for number, row in enumerate(rows, start=1):
+        if columns is None:
+            columns = _csv_columns(row)
+            continue
+        if not any(value.strip() for value in row):
+            continue
+        cells = {name: row[index] for name, index in columns.items() if index < len(row)}
+        try:
+            if 'amount' in columns:
+                amount = parse_amount(cells.get('amount'))
+            else:
+                amount = (parse_amount(cells.get('credit')) or 0) - abs(parse_amount(cells.get('debit')) or 0)
+            yield StatementLine(
+                date=parse_date(cells.get('date')),
+                amount=amount or Decimal('0.00'),
+                description=normalize_text(cells.get('description')),
+                reference=normalize_text(cells.get('reference')),
+                account=squash(cells.get('account')) or account,
+            )
+        except StatementError as error:
+            raise StatementError(f"Line {number}: {error}")
+    if columns is None:
+        raise StatementError("No header row with a date and an amount column")
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+
+
+def parse_ofx(stream, account=''):
+    """
+    Statement lines of an OFX (or QFX) file, SGML or XML flavoured. Elements are read
+    as they stream past; a line is yielded at the end of each STMTTRN.
+    """
+    fields = None
+    for closing, tag, value in (match for text in stream for match in OFX_TAG.findall(text)):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if not closing:
+                fields = {}
+                continue
+            try:
+                yield StatementLine(
+                    date=datetime.strptime(fields['DTPOSTED'][:8], '%Y%m%d').date(),
+                    amount=parse_amount(fields['TRNAMT']),
+                    description=normalize_text(' '.join(filter(None, (fields.get('NAME'), fields.get('MEMO'))))),
+                    reference=normalize_text(fields.get('REFNUM') or fields.get('CHECKNUM')),
+                    account=account,
+                    bank_id=fields.get('FITID', '').strip(),
+                )
+            except (KeyError, ValueError) as error:
+                raise StatementError(f"Transaction {fields.get('FITID', '')!r}: {error!r}")
+            fields = None
+        elif tag == 'ACCTID' and not closing and fields is None:
+            account = squash(value)
+        elif fields is not None and not closing:
+            fields[tag] = html.unescape(value.strip())
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx}
+
+
+def parse_statement(stream, format=None, name='', account=''):
+    """
+    Lines of a statement. The format is 'csv' or 'ofx', by default from the name's
+    extension. `account` is the statement's account number when the file does not
+    carry it.
+    """
+    if format is None:
+        format = 'ofx' if name.lower().endswith(('.ofx', '.qfx')) else 'csv'
+    if format not in PARSERS:
+        raise StatementError(f"Unknown statement format {format!r}")
+    return PARSERS[format](stream, account=squash(account))
+
+
+def line_hash(company_id, line, occurrence=0):
+    """Stable identity of a statement line of a company; see the module docstring"""
+    if line.bank_id:
+        parts = (company_id, line.account, 'id', line.bank_id)
+    else:
+        parts = (company_id, line.account, line.date.isoformat(), line.amount, line.description, line.reference, occurrence)
+    return hashlib.sha256('\x1f'.join(map(str, parts)).encode()).hexdigest()
+
+
+class StatementMatcher:
+    """
+    Assigns statement lines to a property and category for one company. Rules and
+    account numbers are loaded once; matching a line costs a few regular expression
+    searches.
+    """
+    def __init__(self, company):
+        self.rules = [
+            (
+                re.compile(rule.pattern, re.IGNORECASE),
+                rule.category.category_type,
+                {
+                    'transaction_type': TransactionType.INCOME if rule.category.category_type == CategoryType.INCOME else TransactionType.EXPENSE,
+                    'category_id': rule.category_id,
+                    'property_type': rule.property_type,
+                    'property_id': rule.property_id,
+                    'vendor': rule.vendor,
+                },
+            )
+            for rule in StatementRule.objects.filter(company=company, is_active=True).select_related('category')
+        ]
+
+        categories = {
+            (name, category_type): pk for pk, name, category_type in
+            FinancialCategory.objects.filter(company=company).values_list('pk', 'name', 'category_type')
+        }
+        accounts = {}
+
+        def add(number, category, property_type, property_id, **links):
+            number = squash(number)
+            if len(number) >= MIN_ACCOUNT_NUMBER_LENGTH and category in categories:
+                accounts[number] = {
+                    'transaction_type': TransactionType.EXPENSE, 'category_id': categories[category],
+                    'property_type': property_type, 'property_id': property_id, **links,
+                }
+
+        for account in MunicipalAccount.objects.filter(company=company, is_active=True):
+            add(account.account_number, MUNICIPAL_CATEGORY, account.property_type, account.property_id,
+                municipal_account_id=account.pk)
+        for levy in BodyCorporate.objects.filter(company=company, is_active=True, account_number__isnull=False):
+            add(levy.account_number, LEVY_CATEGORY, levy.property_type, levy.property_id, body_corporate_id=levy.pk)
+        for bond in PropertyBond.objects.filter(company=company, is_active=True, account_number__isnull=False).select_related('property_purchase'):
+            add(bond.account_number, BOND_CATEGORY, bond.property_purchase.property_type, bond.property_purchase.property_id,
+                property_bond_id=bond.pk)
+        self.accounts = accounts
+        # Longest first, so an account number that contains another still wins
+        self.account_pattern = re.compile('|'.join(
+            re.escape(number) for number in sorted(accounts, key=len, reverse=True)
+        )) if accounts else None
+
+    def match(self, line):
+        """Transaction fields for the line, or None when nothing matches"""
+        category_type = CategoryType.INCOME if line.amount > 0 else CategoryType.EXPENSE
+        text = f"{line.description} {line.reference}"
+        for pattern, rule_category_type, fields in self.rules:
+            if rule_category_type == category_type and pattern.search(text):
+                return fields
+        # Accounts are paid, so only money out is matched by account number
+        if self.account_pattern and category_type == CategoryType.EXPENSE:
+            found = self.account_pattern.search(squash(text))
+            if found:
+                return self.accounts[found.group()]
+        return None
+
+
+def build_transaction(company_id, line, fields, import_hash, source=''):
+    """The unsaved FinancialTransaction for a matched line"""
+    return FinancialTransaction(
+        company_id=company_id,
+        amount=abs(line.amount),
+        date=line.date,
+        # bulk_create skips save(), which would derive it
+        tax_year=tax_year_for(line.date),
+        payment_date=line.date,
+        payment_method=PaymentMethod.BANK_TRANSFER,
+        reference_number=line.reference[:100] or None,
+        description=line.description,
+        notes=f"Imported from bank statement {source}".strip(),
+        is_paid=True,
+        import_hash=import_hash,
+        **fields,
+    )
+
+
+def insert_transactions(transactions, batch_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert transactions with bulk_create(ignore_conflicts=True), so lines already on
+    the ledger are skipped, and update the monthly summary and tax reports for the rows
+    actually added. Returns those transactions.
+    """
+    with transaction.atomic():
+        FinancialTransaction.objects.bulk_create(transactions, batch_size=batch_size, ignore_conflicts=True)
+        # A row was added by this insert when the stored row under its hash carries its transaction_id
+        stored = dict(FinancialTransaction.objects.filter(
+            import_hash__in=[item.import_hash for item in transactions]
+        ).values_list('import_hash', 'transaction_id'))
+        added = [item for item in transactions if stored.get(item.import_hash) == item.transaction_id]
+        MonthlySummary.objects.record(new=[summary_values(item) for item in added])
+    tax_report.invalidate_transactions(added)
+    return added
+
+
+def import_statement(company, lines, source='', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import statement lines (from parse_statement) into the company's ledger, reading
+    and inserting `chunk_size` lines at a time.
+
+    Returns {'lines', 'imported', 'duplicates', 'skipped', 'unmatched', 'seconds'}:
+    the counts of lines read, added, already on the ledger, skipped for a zero amount,
+    and the unmatched lines themselves.
+    """
+    started = time.monotonic()
+    matcher = StatementMatcher(company)
+    stats = {'lines': 0, 'imported': 0, 'duplicates': 0, 'skipped': 0, 'unmatched': [], 'seconds': 0.0}
+    occurrences = Counter()
+    hashes = set()
+    bond_ids = set()
+    lines = iter(lines)
+    while chunk := list(islice(lines, chunk_size)):
+        pending = []
+        for line in chunk:
+            stats['lines'] += 1
+            key = (line.account, line.date, line.amount, line.description, line.reference)
+            occurrence = occurrences[key]
+            occurrences[key] += 1
+            if not line.amount:
+                stats['skipped'] += 1
+                continue
+            fields = matcher.match(line)
+            if fields is None:
+                stats['unmatched'].append(line)
+                continue
+            import_hash = line_hash(company.pk, line, occurrence)
+            # A bank id repeated within the file is the same line listed twice
+            if import_hash in hashes:
+                stats['duplicates'] += 1
+                continue
+            hashes.add(import_hash)
+            pending.append(build_transaction(company.pk, line, fields, import_hash, source))
+        added = insert_transactions(pending, batch_size=chunk_size) if pending else []
+        stats['imported'] += len(added)
+        stats['duplicates'] += len(pending) - len(added)
+        bond_ids.update(item.property_bond_id for item in added if item.property_bond_id)
+
+    if bond_ids:
+        bond_splits.split_pending(bond_ids)
+    stats['seconds'] = time.monotonic() - started
+    logger.info(
+        f"Imported {stats['imported']} of {stats['lines']} statement lines for company {company.pk} "
+        f"({stats['duplicates']} already imported, {len(stats['unmatched'])} unmatched) in {stats['seconds']:.2f}s"
+    )
+    return stats
@@ -0,0 +1,127 @@
+"""
+Interest/capital split of bond repayments.
+
+A repayment is a transaction in the company's "Bond Repayment" category that is
+linked to a bond. Splitting it posts the interest part as a separate, tax-deductible
+"Bond Interest" transaction (split_from points back at the payment). The payment
+itself keeps only the capital part, so the two still add up to what was paid.
+The interest for each payment is taken from the bond's amortization schedule, from
+the instalment that falls in the same month, and is capped at the amount paid.
+
+split_bond_payments() handles every unsplit repayment of a bond in one pass: one
+schedule lookup, one vectorized month match, one bulk_create and one bulk_update. A
+new repayment is split when it is saved (finances.signals), repayments generated
+from recurring templates right after materialization, and historic months with the
+split_bond_payments command.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from djmoney.money import Money
+
+from . import tax_report
+from .amortization import schedules_for
+from .utils import CENT
+from .forecast import BOND_CATEGORY
+from .models import FinancialTransaction, FinancialCategory, MonthlySummary, PropertyBond, BondComponent, CategoryType
+from .models.summaries import summary_values
+from .models.transactions import tax_year_for
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTEREST_CATEGORY = ("Bond Interest", CategoryType.EXPENSE)
+
+
+def unsplit_payments(bond_ids=None):
+    payments = FinancialTransaction.objects.filter(
+        property_bond__isnull=False, bond_component__isnull=True,
+        category__name=BOND_CATEGORY[0], category__category_type=BOND_CATEGORY[1],
+    )
+    if bond_ids is not None:
+        payments = payments.filter(property_bond_id__in=bond_ids)
+    return payments
+
+
+def interest_categories(company_ids):
+    return dict(
+        FinancialCategory.objects.filter(
+            company_id__in=company_ids, name=INTEREST_CATEGORY[0], category_type=INTEREST_CATEGORY[1]
+        ).values_list('company_id', 'pk')
+    )
+
+
+def split_bond_payments(bond, schedule, payments, interest_category_id):
+    """Split these repayments of `bond` using its schedule. Returns the number split."""
+    if not payments or interest_category_id is None:
+        return 0
+    paid_months = np.array([payment.date for payment in payments], dtype='datetime64[D]').astype('datetime64[M]')
+    schedule_months = schedule.dates.astype('datetime64[M]')
+    position = np.searchsorted(schedule_months, paid_months)
+    found = position < len(schedule_months)
+    found[found] = schedule_months[position[found]] == paid_months[found]
+    interest = np.where(found, schedule.interest[np.minimum(position, len(schedule) - 1)], 0)
+
+    components, before = [], []
+    for payment, scheduled_interest, matched in zip(payments, interest.tolist(), found.tolist()):
+        if not matched:
+            # Paid outside the bond term: nothing to split against
+            continue
+        before.append(summary_values(payment))
+        paid = payment.amount.amount
+        interest_part = min(paid, Decimal(scheduled_interest).quantize(CENT))
+        payment.amount = Money(paid - interest_part, payment.amount.currency)
+        payment.bond_component = BondComponent.CAPITAL
+        components.append(FinancialTransaction(
+            transaction_type=payment.transaction_type,
+            property_type=payment.property_type,
+            property_id=payment.property_id,
+            company_id=payment.company_id,
+            amount=Money(interest_part, payment.amount.currency),
+            category_id=interest_category_id,
+            date=payment.date,
+            due_date=payment.due_date,
+            payment_method=payment.payment_method,
+            reference_number=payment.reference_number,
+            vendor=payment.vendor,
+            property_bond_id=bond.pk,
+            bond_component=BondComponent.INTEREST,
+            split_from=payment,
+            description=payment.description,
+            notes=f"Interest portion of bond payment {payment.transaction_id}",
+            is_tax_deductible=True,
+            tax_year=payment.tax_year or tax_year_for(payment.date),
+            is_paid=payment.is_paid,
+            payment_date=payment.payment_date,
+        ))
+
+    split = [payment for payment in payments if payment.bond_component == BondComponent.CAPITAL]
+    with transaction.atomic():
+        FinancialTransaction.objects.bulk_create(components)
+        FinancialTransaction.objects.bulk_update(split, ['amount', 'bond_component'])
+        # Bulk writes skip the signals that keep the monthly summary current
+        MonthlySummary.objects.record(old=before, new=[summary_values(row) for row in split + components])
+        tax_report.invalidate_transactions(split + components)
+    return len(split)
+
+
+def split_pending(bond_ids=None):
+    """Split every unsplit repayment, a single batched pass per bond. Returns the number split."""
+    payments = {}
+    for payment in unsplit_payments(bond_ids).order_by('date'):
+        payments.setdefault(payment.property_bond_id, []).append(payment)
+    if not payments:
+        return 0
+
+    bonds = list(PropertyBond.objects.filter(pk__in=payments))
+    schedules = schedules_for(bonds)
+    categories = interest_categories({bond.company_id for bond in bonds})
+    split = sum(
+        split_bond_payments(bond, schedules[bond.pk], payments[bond.pk], categories.get(bond.company_id))
+        for bond in bonds
+    )
+    if split:
+        logger.info(f"Split {split} bond payments into interest and capital")
+    return split
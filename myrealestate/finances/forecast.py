@@ -0,0 +1,278 @@
+"""
+Monthly cash-flow forecasts for a company, estate, building or unit.
+
+Nothing is materialized: every source of future cash flow becomes one schedule row
+(first allowed date, last allowed date, step, day of month, signed amount, category).
+The sources are the active recurring transaction templates, the monthly payment of
+active bonds, and the monthly and special levies of body corporates. Bonds and body
+corporates that already have a recurring template are left to the template. The rows
+are expanded into a (schedule x occurrence) grid of datetime64 dates in a few array
+operations per frequency. Dates outside the window are masked out, and the
+rest are summed into (category x month) buckets with a single bincount.
+
+Results are cached per scope, horizon and day under the company's forecast version
+token. finances.signals and the recurring materialization bump that token whenever
+a template, bond, levy or category changes.
+"""
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from myrealestate.common.fragment_cache import bump_versions, get_versions
+from .models import (
+    RecurringTransaction, PropertyBond, BodyCorporate, CategoryType, PropertyType, TransactionType,
+    RecurrenceFrequency,
+)
+
+FORECAST_VERSION = 'forecast'
+FORECAST_TIMEOUT = 60 * 60 * 24
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 60
+
+# Frequency -> (unit, step); day steps are in days, month steps in months
+FREQUENCY_STEPS = {
+    RecurrenceFrequency.DAILY: ('D', 1),
+    RecurrenceFrequency.WEEKLY: ('D', 7),
+    RecurrenceFrequency.BIWEEKLY: ('D', 14),
+    RecurrenceFrequency.MONTHLY: ('M', 1),
+    RecurrenceFrequency.QUARTERLY: ('M', 3),
+    RecurrenceFrequency.SEMIANNUALLY: ('M', 6),
+    RecurrenceFrequency.ANNUALLY: ('M', 12),
+}
+
+# Default categories used for bonds and levies that have no recurring template
+BOND_CATEGORY = ("Bond Repayment", CategoryType.EXPENSE)
+LEVY_CATEGORY = ("Body Corporate Levy", CategoryType.EXPENSE)
+SPECIAL_LEVY_CATEGORY = ("Special Levy", CategoryType.EXPENSE)
+
+NO_END = date.max.toordinal()
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def invalidate(company_ids):
+    bump_versions(FORECAST_VERSION, [pk for pk in company_ids if pk is not None])
+
+
+def scope_members(scope):
+    """
+    (property_type, property_id) pairs the forecast of `scope` covers: the estate,
+    building or unit itself and everything under it. None means the whole company.
+    """
+    if scope is None:
+        return None
+    from myrealestate.properties.models import Estate, Building, Unit
+
+    if isinstance(scope, Unit):
+        return [(PropertyType.UNIT, scope.pk)]
+    if isinstance(scope, Building):
+        buildings = [scope.pk]
+        members = [(PropertyType.BUILDING, scope.pk)]
+    elif isinstance(scope, Estate):
+        buildings = list(Building.objects.filter(estate=scope).values_list('pk', flat=True))
+        members = [(PropertyType.ESTATE, scope.pk)] + [(PropertyType.BUILDING, pk) for pk in buildings]
+    else:
+        raise TypeError(f"Cannot forecast a {scope.__class__.__name__}")
+    units = Unit.objects.filter(building_id__in=buildings).values_list('pk', flat=True)
+    return members + [(PropertyType.UNIT, pk) for pk in units]
+
+
+def _property_filter(members, prefix=''):
+    """Q matching rows whose generic property link is one of `members`"""
+    by_type = {}
+    for property_type, property_id in members:
+        by_type.setdefault(property_type, []).append(property_id)
+    query = Q(pk__in=[])
+    for property_type, ids in by_type.items():
+        query |= Q(**{f'{prefix}property_type': property_type, f'{prefix}property_id__in': ids})
+    return query
+
+
+def _dates(ordinals):
+    # Building datetime64 arrays from date objects is slow; day ordinals convert at C speed
+    return (np.array(ordinals, dtype=np.int64) - EPOCH).astype('datetime64[D]')
+
+
+class ScheduleRows:
+    """Column-wise schedule rows (dates as ordinals), collected in lists and handed to NumPy in one go"""
+
+    def __init__(self):
+        self.units, self.steps, self.anchors, self.days = [], [], [], []
+        self.lowers, self.uppers, self.amounts, self.categories = [], [], [], []
+        self.category_index = {}
+
+    def add(self, frequency, anchor, day, lower, upper, amount, category):
+        unit, step = FREQUENCY_STEPS[frequency]
+        self.units.append(unit)
+        self.steps.append(step)
+        self.anchors.append(anchor.toordinal())
+        self.days.append(day)
+        self.lowers.append(lower.toordinal())
+        self.uppers.append(NO_END if upper is None else upper.toordinal())
+        self.amounts.append(amount)
+        self.categories.append(self.category_index.setdefault(category, len(self.category_index)))
+
+    def arrays(self):
+        return {
+            'units': np.array(self.units),
+            'steps': np.array(self.steps, dtype=np.int64),
+            'anchors': _dates(self.anchors),
+            'days': np.array(self.days, dtype=np.int64),
+            'lowers': _dates(self.lowers),
+            'uppers': _dates(self.uppers),
+            'amounts': np.array(self.amounts, dtype=np.float64),
+            'categories': np.array(self.categories, dtype=np.int64),
+        }
+
+
+def collect_schedules(company_id, members, today):
+    rows = ScheduleRows()
+
+    templates = RecurringTransaction.objects.filter(company_id=company_id, is_active=True).select_related('category')
+    bonds = PropertyBond.objects.filter(company_id=company_id, is_active=True)
+    levies = BodyCorporate.objects.filter(company_id=company_id, is_active=True)
+    if members is not None:
+        templates = templates.filter(_property_filter(members))
+        bonds = bonds.filter(_property_filter(members, prefix='property_purchase__'))
+        levies = levies.filter(_property_filter(members))
+
+    templated_bonds, templated_levies = set(), set()
+    for template in templates:
+        sign = 1 if template.transaction_type == TransactionType.INCOME else -1
+        rows.add(
+            template.frequency, template.next_due_date, template.start_date.day,
+            template.next_due_date, template.end_date, sign * float(template.amount.amount),
+            (template.category.name, template.category.category_type),
+        )
+        templated_bonds.add(template.property_bond_id)
+        templated_levies.add(template.body_corporate_id)
+
+    for bond in bonds.exclude(pk__in=templated_bonds - {None}):
+        lower = bond.start_date
+        if bond.has_payment_holiday and bond.payment_holiday_end_date:
+            lower = max(lower, bond.payment_holiday_end_date + timedelta(days=1))
+        rows.add(
+            RecurrenceFrequency.MONTHLY, bond.start_date, bond.payment_day, lower, bond.end_date,
+            -float(bond.monthly_payment.amount), BOND_CATEGORY,
+        )
+
+    for levy in levies.exclude(pk__in=templated_levies - {None}):
+        rows.add(RecurrenceFrequency.MONTHLY, today, levy.payment_day, today, None, -float(levy.monthly_levy.amount), LEVY_CATEGORY)
+        if levy.special_levy.amount:
+            rows.add(
+                RecurrenceFrequency.MONTHLY, today, levy.payment_day, today, levy.special_levy_end_date,
+                -float(levy.special_levy.amount), SPECIAL_LEVY_CATEGORY,
+            )
+    return rows
+
+
+def expand_day_steps(anchors, steps, lowers, horizon_days):
+    """Occurrence grid of schedules stepping a fixed number of days from their anchors"""
+    # Jump each schedule to its first occurrence on or after its lower bound
+    behind = (lowers - anchors).astype(np.int64)
+    skip = np.maximum(-(-behind // steps), 0)
+    first = anchors + (skip * steps).astype('timedelta64[D]')
+    count = horizon_days // int(steps.min()) + 2
+    return first[:, None] + (np.arange(count)[None, :] * steps[:, None]).astype('timedelta64[D]')
+
+
+def expand_month_steps(anchors, steps, days, lowers, start_month, horizon_months):
+    """
+    Occurrence grid of schedules stepping whole months, each on its day of month
+    (clamped to month end), with the month offset of each occurrence from start_month
+    """
+    anchor_months = (anchors.astype('datetime64[M]') - start_month).astype(np.int64)
+    behind = (lowers.astype('datetime64[M]') - start_month).astype(np.int64) - anchor_months
+    skip = np.maximum(-(-behind // steps), 0)
+    first = anchor_months + skip * steps
+    count = horizon_months // int(steps.min()) + 2
+    offsets = first[:, None] + np.arange(count)[None, :] * steps[:, None]
+    # Month starts come from a small lookup table, not a calendar conversion per cell
+    low, high = int(offsets.min()), int(offsets.max())
+    table = (start_month + np.arange(low, high + 2)).astype('datetime64[D]')
+    month_starts = table[offsets - low]
+    month_lengths = (table[offsets - low + 1] - month_starts).astype(np.int64)
+    return month_starts + (np.minimum(days[:, None], month_lengths) - 1).astype('timedelta64[D]'), offsets
+
+
+def bucket(rows, today, months):
+    """(category x month) totals of every occurrence from today to the end of the horizon"""
+    totals = np.zeros((len(rows.category_index), months))
+    if not rows.amounts:
+        return totals
+    columns = rows.arrays()
+    start = np.datetime64(today, 'D')
+    start_month = start.astype('datetime64[M]')
+    month_bounds = (start_month + np.arange(months + 1)).astype('datetime64[D]')
+    end = month_bounds[-1]
+    lowers = np.maximum(columns['lowers'], start)
+
+    # One grid per frequency, so each is only as wide as its own number of occurrences
+    for unit, step in set(zip(columns['units'].tolist(), columns['steps'].tolist())):
+        selected = (columns['units'] == unit) & (columns['steps'] == step)
+        if unit == 'D':
+            dates = expand_day_steps(
+                columns['anchors'][selected], columns['steps'][selected], lowers[selected], int((end - start).astype(np.int64))
+            )
+        else:
+            dates, offsets = expand_month_steps(
+                columns['anchors'][selected], columns['steps'][selected], columns['days'][selected],
+                lowers[selected], start_month, months,
+            )
+        valid = (dates >= lowers[selected][:, None]) & (dates <= columns['uppers'][selected][:, None]) & (dates < end)
+        if unit == 'D':
+            month_index = np.searchsorted(month_bounds, dates[valid], side='right') - 1
+        else:
+            month_index = offsets[valid]
+        flat = np.broadcast_to(columns['categories'][selected][:, None], dates.shape)[valid] * months + month_index
+        weights = np.broadcast_to(columns['amounts'][selected][:, None], dates.shape)[valid]
+        totals += np.bincount(flat, weights=weights, minlength=totals.size).reshape(totals.shape)
+    return totals
+
+
+def build_forecast(company_id, members, today, months):
+    rows = collect_schedules(company_id, members, today)
+    totals = np.round(bucket(rows, today, months), 2)
+    start_month = np.datetime64(today, 'M')
+    categories = sorted(
+        rows.category_index.items(), key=lambda item: (item[0][1] != CategoryType.INCOME, item[0][0])
+    )
+    income = totals.clip(min=0).sum(axis=0)
+    expenses = totals.clip(max=0).sum(axis=0)
+    return {
+        'months': [(start_month + offset).astype('datetime64[D]').item() for offset in range(months)],
+        'categories': [
+            {'name': name, 'type': category_type, 'amounts': totals[index].tolist()}
+            for (name, category_type), index in categories
+        ],
+        'income': np.round(income, 2).tolist(),
+        'expenses': np.round(-expenses, 2).tolist(),
+        'net': np.round(income + expenses, 2).tolist(),
+    }
+
+
+def forecast(company, scope=None, months=DEFAULT_MONTHS, today=None):
+    """
+    Month-by-month projected cash flow of `company`, or of one of its estates,
+    buildings or units, for `months` months starting with the current one:
+    {'months': [date, ...], 'categories': [{'name', 'type', 'amounts'}, ...],
+    'income': [...], 'expenses': [...], 'net': [...]} with expenses as positive amounts.
+    """
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"A forecast covers between 1 and {MAX_MONTHS} months")
+    today = today or timezone.localdate()
+    company_id = getattr(company, 'pk', company)
+    members = scope_members(scope)
+
+    # Membership is part of the key, so units moving between buildings never serve a stale forecast
+    digest = 'all' if members is None else zlib.crc32(repr(sorted(members)).encode())
+    version, = get_versions((FORECAST_VERSION, company_id))
+    key = f"forecast:{company_id}:{digest}:{months}:{today.isoformat()}:{version}"
+    result = cache.get(key)
+    if result is None:
+        result = build_forecast(company_id, members, today, months)
+        cache.set(key, result, FORECAST_TIMEOUT)
+    return result
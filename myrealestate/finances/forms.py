@@ -6,6 +6,7 @@ from myrealestate.finances.models import (
     PropertyPurchase, PropertyBond, MunicipalAccount, BodyCorporate, 
     FinancialCategory, FinancialTransaction
 )
+from myrealestate.finances.models.property_reference import property_type_for
 
 
 class PropertyPurchaseForm(BaseModelForm):
@@ -85,15 +86,8 @@ class PropertyPurchaseForm(BaseModelForm):
         
         # Set property information if provided
         if self.property_obj:
-            if hasattr(self.property_obj, 'estate'):
-                cleaned_data['property_type'] = 'estate'
-                cleaned_data['property_id'] = self.property_obj.id
-            elif hasattr(self.property_obj, 'building'):
-                cleaned_data['property_type'] = 'building'
-                cleaned_data['property_id'] = self.property_obj.id
-            elif hasattr(self.property_obj, 'unit'):
-                cleaned_data['property_type'] = 'unit'
-                cleaned_data['property_id'] = self.property_obj.id
+            cleaned_data['property_type'] = property_type_for(self.property_obj)
+            cleaned_data['property_id'] = self.property_obj.id
         
         return cleaned_data
     
@@ -102,9 +96,7 @@ class PropertyPurchaseForm(BaseModelForm):
         
         # Set property type and ID if a property object was provided
         if self.property_obj:
-            property_type = self.property_obj.__class__.__name__.lower()
-            instance.property_type = property_type
-            instance.property_id = self.property_obj.id
+            instance.property_object = self.property_obj
         
         if commit:
             instance.save()
@@ -225,8 +217,7 @@ class MunicipalAccountForm(BaseModelForm):
         
         # Set property information if provided
         if self.property_obj:
-            property_type = self.property_obj.__class__.__name__.lower()
-            cleaned_data['property_type'] = property_type
+            cleaned_data['property_type'] = property_type_for(self.property_obj)
             cleaned_data['property_id'] = self.property_obj.id
         
         return cleaned_data
@@ -236,9 +227,7 @@ class MunicipalAccountForm(BaseModelForm):
         
         # Set property type and ID if a property object was provided
         if self.property_obj:
-            property_type = self.property_obj.__class__.__name__.lower()
-            instance.property_type = property_type
-            instance.property_id = self.property_obj.id
+            instance.property_object = self.property_obj
         
         if commit:
             instance.save()
@@ -291,8 +280,7 @@ class BodyCorporateForm(BaseModelForm):
         
         # Set property information if provided
         if self.property_obj:
-            property_type = self.property_obj.__class__.__name__.lower()
-            cleaned_data['property_type'] = property_type
+            cleaned_data['property_type'] = property_type_for(self.property_obj)
             cleaned_data['property_id'] = self.property_obj.id
         
         return cleaned_data
@@ -302,9 +290,7 @@ class BodyCorporateForm(BaseModelForm):
         
         # Set property type and ID if a property object was provided
         if self.property_obj:
-            property_type = self.property_obj.__class__.__name__.lower()
-            instance.property_type = property_type
-            instance.property_id = self.property_obj.id
+            instance.property_object = self.property_obj
         
         if commit:
             instance.save()
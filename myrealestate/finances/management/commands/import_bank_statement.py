@@ -0,0 +1,50 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myrealestate.companies.models import Company
+from ...bank_import import DEFAULT_CHUNK_SIZE, PARSERS, StatementError, import_statement, parse_statement
+
+
+class Command(BaseCommand):
+    help = ("Import bank statement CSV or OFX files into a company's ledger. Lines already imported are skipped, "
+            "so overlapping statements can be imported again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, help='Company id')
+        parser.add_argument('files', nargs='+', help='Statement files')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Statement format (default: from the file extension)')
+        parser.add_argument('--account', default='', help="Account number of the statements, if the files don't name it")
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--unmatched', metavar='PATH', help='Write the lines no rule or account matched to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} does not exist")
+
+        unmatched = []
+        for path in options['files']:
+            try:
+                with open(path, newline='', encoding=options['encoding']) as stream:
+                    lines = parse_statement(stream, format=options.get('format'), name=path, account=options['account'])
+                    stats = import_statement(company, lines, source=path, chunk_size=options['chunk_size'])
+            except (OSError, StatementError) as error:
+                raise CommandError(f"{path}: {error}")
+            unmatched.extend(stats['unmatched'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: imported {stats['imported']} of {stats['lines']} lines in {stats['seconds']:.2f}s "
+                f"({stats['duplicates']} already imported, {stats['skipped']} without an amount, "
+                f"{len(stats['unmatched'])} unmatched)"
+            ))
+
+        if options.get('unmatched') and unmatched:
+            with open(options['unmatched'], 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['Date', 'Amount', 'Description', 'Reference', 'Account'])
+                writer.writerows(
+                    [line.date.isoformat(), line.amount, line.description, line.reference, line.account] for line in unmatched
+                )
+            self.stdout.write(f"Wrote {len(unmatched)} unmatched lines to {options['unmatched']}")
@@ -0,0 +1,50 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from ...recurring import DEFAULT_BATCH_SIZE, materialize_due_transactions
+
+
+def run_worker(today, batch_size, max_batches):
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+    return materialize_due_transactions(today=today, batch_size=batch_size, max_batches=max_batches)
+
+
+class Command(BaseCommand):
+    help = ('Create the transactions of every recurring transaction that has fallen due, including missed periods. '
+            'Safe to run on several nodes at once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Materialize occurrences due by this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, help='Stop each worker after this many batches')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes on this node')
+        parser.add_argument('--loop', type=int, metavar='SECONDS',
+                            help='Keep running, sleeping this long between passes')
+
+    def run_pass(self, options):
+        args = (options.get('date'), options['batch_size'], options.get('max_batches'))
+        if options['workers'] <= 1:
+            return [materialize_due_transactions(*args)]
+        connections.close_all()
+        with ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(run_worker, *zip(*[args] * options['workers'])))
+
+    def handle(self, *args, **options):
+        while True:
+            results = self.run_pass(options)
+            for stats in results:
+                if stats['templates']:
+                    rate = stats['templates'] / stats['seconds'] if stats['seconds'] else 0
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Worker {stats['worker']}: created {stats['transactions']} transactions from "
+                        f"{stats['templates']} recurring transactions in {stats['batches']} batches "
+                        f"({rate:.0f} templates/s)"
+                    ))
+            if not options.get('loop'):
+                break
+            time.sleep(options['loop'])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...models import MonthlySummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly income and expense summaries from the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild summaries belonging to this company id')
+
+    def handle(self, *args, **options):
+        created = MonthlySummary.objects.rebuild(company_id=options.get('company'))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} monthly summaries"))
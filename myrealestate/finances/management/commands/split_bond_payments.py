@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...bond_splits import split_pending
+
+
+class Command(BaseCommand):
+    help = 'Split every bond repayment that has not been split yet into its interest and capital parts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bond', type=int, action='append', help='Only split payments of this bond id (repeatable)')
+
+    def handle(self, *args, **options):
+        split = split_pending(options.get('bond'))
+        self.stdout.write(self.style.SUCCESS(f"Split {split} bond payments"))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myrealestate.companies.models import Company
+from ...stress_test import DEFAULT_MONTHS, DEFAULT_PATHS, DEFAULT_VOLATILITY, stress_test
+
+
+class Command(BaseCommand):
+    help = "Simulate prime-rate paths against a company's bonds and rent roll and report shortfall and coverage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, help='Company id')
+        parser.add_argument('--paths', type=int, default=DEFAULT_PATHS)
+        parser.add_argument('--months', type=int, default=DEFAULT_MONTHS)
+        parser.add_argument('--volatility', type=float, default=DEFAULT_VOLATILITY,
+                            help='Yearly standard deviation of prime, in percentage points')
+        parser.add_argument('--drift', type=float, default=0.0, help='Yearly trend of prime, in percentage points')
+        parser.add_argument('--vacancy', type=float, help='Expected vacancy rate (default: current share of vacant units)')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--workers', type=int, help='Number of worker processes (default: all cores)')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} does not exist")
+        if options['paths'] < 1 or options['months'] < 1:
+            raise CommandError("--paths and --months must be positive")
+
+        result = stress_test(
+            company, paths=options['paths'], months=options['months'], volatility=options['volatility'],
+            drift=options['drift'], vacancy=options.get('vacancy'), seed=options.get('seed'), workers=options.get('workers'),
+        )
+        self.stdout.write(
+            f"{result['bonds']} bonds ({result['floating_bonds']} floating), "
+            f"outstanding {result['outstanding_balance']:,.2f}, monthly rent {result['monthly_rent']:,.2f}, "
+            f"vacancy {result['vacancy']:.1%}"
+        )
+        self.stdout.write("month        debt service p50/p95       shortfall p50/p95   DSCR p5/p50")
+        for index, month in enumerate(result['months']):
+            self.stdout.write(
+                f"{month:%Y-%m}  {result['debt_service'][50][index]:>12,.2f} / {result['debt_service'][95][index]:>12,.2f}"
+                f"  {result['shortfall'][50][index]:>9,.2f} / {result['shortfall'][95][index]:>9,.2f}"
+                f"  {result['dscr'][5][index]:>5.2f} / {result['dscr'][50][index]:>5.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Shortfall in {result['shortfall_probability']:.1%} of {result['paths']} paths; "
+            f"worst month shortfall p95 {result['worst_shortfall'][95]:,.2f}, lowest DSCR p5 {result['lowest_dscr'][5]:.2f}"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('finances', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialtransaction',
+            name='recurring_transaction',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='finances.recurringtransaction'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtransaction',
+            index=models.Index(fields=['is_active', 'next_due_date'], name='finances_re_is_acti_ab0490_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='financialtransaction',
+            constraint=models.UniqueConstraint(fields=('recurring_transaction', 'date'), name='unique_recurring_occurrence'),
+        ),
+    ]
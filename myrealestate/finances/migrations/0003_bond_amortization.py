@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:20
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0002_recurring_occurrences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrimeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_date', models.DateField(unique=True)),
+                ('rate', models.DecimalField(decimal_places=2, help_text='Annual prime rate (%)', max_digits=5, validators=[django.core.validators.MinValueValidator(0)])),
+            ],
+            options={
+                'ordering': ['effective_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='propertybond',
+            name='payment_holiday_start_date',
+            field=models.DateField(blank=True, help_text='First day of the payment holiday (the bond start date if empty)', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0003_bond_amortization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialtransaction',
+            name='bond_component',
+            field=models.CharField(blank=True, choices=[('in', 'Interest'), ('ca', 'Capital')], max_length=2, null=True),
+        ),
+        migrations.AddField(
+            model_name='financialtransaction',
+            name='split_from',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='interest_component', to='finances.financialtransaction'),
+        ),
+    ]
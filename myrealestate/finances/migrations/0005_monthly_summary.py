@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def summarize_ledger(apps, schema_editor):
+    schema_editor.execute("""
+        INSERT INTO finances_monthlysummary
+            (company_id, property_type, property_id, category_id, transaction_type, month, amount, vat_amount, transaction_count)
+        SELECT company_id, property_type, property_id, category_id, transaction_type,
+               date_trunc('month', date)::date, SUM(amount), SUM(vat_amount), COUNT(*)
+        FROM finances_financialtransaction
+        GROUP BY company_id, property_type, property_id, category_id, transaction_type, date_trunc('month', date)
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('finances', '0004_bond_payment_split'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property_type', models.CharField(choices=[('es', 'Estate'), ('bu', 'Building'), ('un', 'Unit')], max_length=2)),
+                ('property_id', models.IntegerField()),
+                ('transaction_type', models.CharField(choices=[('in', 'Income'), ('ex', 'Expense')], max_length=10)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('vat_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='finances.financialcategory')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='companies.company')),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly summaries',
+                'indexes': [models.Index(fields=['company', 'month'], name='finances_mo_company_13878c_idx'), models.Index(fields=['company', 'property_type', 'property_id', 'month'], name='finances_mo_company_5d6cee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('company', 'property_type', 'property_id', 'category', 'transaction_type', 'month'), name='unique_monthly_summary')],
+            },
+        ),
+        migrations.RunPython(summarize_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_tax_years(apps, schema_editor):
+    # Transactions saved without going through clean() have no tax year (March to February)
+    schema_editor.execute("""
+        UPDATE finances_financialtransaction
+        SET tax_year = CASE WHEN EXTRACT(MONTH FROM date) >= 3
+                            THEN EXTRACT(YEAR FROM date) ELSE EXTRACT(YEAR FROM date) - 1 END
+        WHERE tax_year IS NULL
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('finances', '0005_monthly_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialtransaction',
+            index=models.Index(fields=['company', 'tax_year', 'transaction_type', 'category'], name='finances_fi_company_f4c82d_idx'),
+        ),
+        migrations.RunPython(backfill_tax_years, migrations.RunPython.noop),
+    ]
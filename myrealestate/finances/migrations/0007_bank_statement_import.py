@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('finances', '0006_tax_year_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialtransaction',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='StatementRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pattern', models.CharField(help_text='Regular expression, matched case-insensitively against the description and reference', max_length=255)),
+                ('property_type', models.CharField(choices=[('es', 'Estate'), ('bu', 'Building'), ('un', 'Unit')], max_length=2)),
+                ('property_id', models.IntegerField()),
+                ('vendor', models.CharField(blank=True, help_text='Vendor recorded on matched expenses', max_length=255, null=True)),
+                ('priority', models.PositiveIntegerField(default=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_rules', to='finances.financialcategory')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_rules', to='companies.company')),
+            ],
+            options={
+                'ordering': ['priority', 'pk'],
+            },
+        ),
+    ]
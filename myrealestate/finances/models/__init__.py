@@ -1,23 +1,25 @@
 from .enums import (
     CategoryType, PropertyType, PurchaseType, InterestRateType,
-    TransactionType, PaymentMethod, RecurrenceFrequency
+    TransactionType, PaymentMethod, RecurrenceFrequency, BondComponent
 )
 
 from .categories import FinancialCategory
 from .property_purchase import PropertyPurchase
-from .property_bond import PropertyBond
+from .property_bond import PropertyBond, PrimeRate
 from .municipal_account import MunicipalAccount
 from .body_corporate import BodyCorporate
 from .transactions import FinancialTransaction
 from .recurring_transactions import RecurringTransaction
+from .summaries import MonthlySummary
+from .statement_rules import StatementRule
 
 # Define what's available when using 'from myrealestate.finances.models import *'
 __all__ = [
     'CategoryType', 'PropertyType', 'PurchaseType', 'InterestRateType',
-    'TransactionType', 'PaymentMethod', 'RecurrenceFrequency',
-    'FinancialCategory', 'PropertyPurchase', 'PropertyBond',
+    'TransactionType', 'PaymentMethod', 'RecurrenceFrequency', 'BondComponent',
+    'FinancialCategory', 'PropertyPurchase', 'PropertyBond', 'PrimeRate',
     'MunicipalAccount', 'BodyCorporate', 'FinancialTransaction',
-    'RecurringTransaction'
+    'RecurringTransaction', 'MonthlySummary', 'StatementRule'
 ]
 
 
@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator
 from .enums import PropertyType
 from django.utils.translation import gettext_lazy as _
 from .enums import PropertyType
+from .property_reference import PropertyReference, PropertyReferenceQuerySet
 
 
 
@@ -16,6 +17,7 @@ class BodyCorporate(BaseModel):
     
     property_type = models.CharField(max_length=2, choices=PropertyType.choices)
     property_id = models.IntegerField()
+    property_object = PropertyReference()
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="body_corporates")
     
     # Body corporate details
@@ -37,6 +39,8 @@ class BodyCorporate(BaseModel):
     notes = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     
+    objects = PropertyReferenceQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Body corporates"
@@ -46,12 +50,4 @@ class BodyCorporate(BaseModel):
     
     def get_property_object(self):
         """Get the actual property object"""
-        from myrealestate.properties.models import Estate, Building, Unit
-        
-        if self.property_type == 'estate':
-            return Estate.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'building':
-            return Building.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'unit':
-            return Unit.objects.filter(id=self.property_id).first()
-        return None
+        return self.property_object
@@ -48,3 +48,8 @@ class RecurrenceFrequency(models.TextChoices):
     QUARTERLY = 'qu', _('Quarterly')
     SEMIANNUALLY = 'sa', _('Semi-Annually')
     ANNUALLY = 'an', _('Annually')
+
+
+class BondComponent(models.TextChoices):
+    INTEREST = 'in', _('Interest')
+    CAPITAL = 'ca', _('Capital')
@@ -3,6 +3,7 @@ from myrealestate.common.models import BaseModel, CurrencyField
 from django.core.validators import MinValueValidator
 from .enums import PropertyType
 from django.utils.translation import gettext_lazy as _
+from .property_reference import PropertyReference, PropertyReferenceQuerySet
 
 class MunicipalAccount(BaseModel):
     """
@@ -11,6 +12,7 @@ class MunicipalAccount(BaseModel):
     
     property_type = models.CharField(max_length=2, choices=PropertyType.choices)
     property_id = models.IntegerField()
+    property_object = PropertyReference()
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="municipal_accounts")
     
     # Municipal account details
@@ -36,6 +38,8 @@ class MunicipalAccount(BaseModel):
     notes = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     
+    objects = PropertyReferenceQuerySet.as_manager()
+
     class Meta:
         ordering = ['municipality', 'account_number']
         
@@ -44,12 +48,4 @@ class MunicipalAccount(BaseModel):
     
     def get_property_object(self):
         """Get the actual property object"""
-        from myrealestate.properties.models import Estate, Building, Unit
-        
-        if self.property_type == 'estate':
-            return Estate.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'building':
-            return Building.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'unit':
-            return Unit.objects.filter(id=self.property_id).first()
-        return None
\ No newline at end of file
+        return self.property_object
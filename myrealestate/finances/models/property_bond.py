@@ -4,8 +4,22 @@ from .enums import InterestRateType
 from . import PropertyPurchase
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
+from datetime import date
 
 
+class PrimeRate(models.Model):
+    """
+    History of the prime lending rate. Prime-linked bonds accrue interest at the rate in
+    effect on each payment date plus their prime_rate_margin.
+    """
+    effective_date = models.DateField(unique=True)
+    rate = models.DecimalField(max_digits=5, decimal_places=2, help_text=_("Annual prime rate (%)"), validators=[MinValueValidator(0)])
+
+    class Meta:
+        ordering = ['effective_date']
+
+    def __str__(self):
+        return f"Prime {self.rate}% from {self.effective_date}"
 
 
 class PropertyBond(BaseModel):
@@ -36,6 +50,7 @@ class PropertyBond(BaseModel):
     is_active = models.BooleanField(default=True)
     initiation_fee = CurrencyField(default=0)
     has_payment_holiday = models.BooleanField(default=False)
+    payment_holiday_start_date = models.DateField(null=True, blank=True, help_text=_("First day of the payment holiday (the bond start date if empty)"))
     payment_holiday_end_date = models.DateField(null=True, blank=True)
     
     notes = models.TextField(blank=True, null=True)
@@ -69,4 +84,17 @@ class PropertyBond(BaseModel):
             return 0
             
         diff = relativedelta(end_date, today)
-        return diff.years * 12 + diff.months
\ No newline at end of file
+        return diff.years * 12 + diff.months
+
+    @property
+    def term_months(self):
+        return self.term_years * 12
+
+    def amortization_schedule(self):
+        """The bond's full amortization schedule (see finances.amortization)"""
+        from ..amortization import schedule_for
+        return schedule_for(self)
+
+    def outstanding_balance(self, as_of=None):
+        """Capital still owed after the last payment on or before `as_of` (today by default)"""
+        return self.amortization_schedule().balance_as_of(as_of or date.today())
@@ -2,12 +2,14 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from myrealestate.common.models import BaseModel, CurrencyField
 from .enums import PropertyType, PurchaseType
+from .property_reference import PropertyReference, PropertyReferenceQuerySet
 
 class PropertyPurchase(BaseModel):
     """Records the purchase details of a property with South African-specific fields"""
     # Link to the property
     property_type = models.CharField(max_length=2, choices=PropertyType.choices)
     property_id = models.IntegerField()
+    property_object = PropertyReference()
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="property_purchases")
     
     # Basic purchase information
@@ -40,6 +42,8 @@ class PropertyPurchase(BaseModel):
     
     purchase_notes = models.TextField(blank=True, null=True)
     
+    objects = PropertyReferenceQuerySet.as_manager()
+
     class Meta:
         ordering = ['-purchase_date']
     
@@ -111,12 +115,4 @@ class PropertyPurchase(BaseModel):
     
     def get_property_object(self):
         """Get the actual property object"""
-        from myrealestate.properties.models import Estate, Building, Unit
-        
-        if self.property_type == PropertyType.ESTATE:
-            return Estate.objects.filter(id=self.property_id).first()
-        elif self.property_type == PropertyType.BUILDING:
-            return Building.objects.filter(id=self.property_id).first()
-        elif self.property_type == PropertyType.UNIT:
-            return Unit.objects.filter(id=self.property_id).first()
-        return None
+        return self.property_object
@@ -0,0 +1,119 @@
+from django.apps import apps
+from django.db import models
+from django.db.models.query import ModelIterable
+
+from .enums import PropertyType
+
+# Model behind each stored property_type code, and what its __str__ needs loaded
+PROPERTY_MODELS = {
+    PropertyType.ESTATE: ('properties.Estate', ()),
+    PropertyType.BUILDING: ('properties.Building', ('estate',)),
+    PropertyType.UNIT: ('properties.Unit', ('building',)),
+}
+
+
+def property_model(property_type):
+    return apps.get_model(PROPERTY_MODELS[property_type][0])
+
+
+def property_type_for(property_obj):
+    """The PropertyType code of an Estate, Building or Unit"""
+    for property_type, (label, _) in PROPERTY_MODELS.items():
+        if property_obj._meta.label == label:
+            return property_type
+    raise TypeError(f"{property_obj.__class__.__name__} is not a property")
+
+
+def _queryset(property_type):
+    label, related = PROPERTY_MODELS[property_type]
+    return apps.get_model(label).objects.select_related(*related)
+
+
+class PropertyReference:
+    """
+    Typed access to the estate, building or unit a model's (property_type, property_id)
+    pair points at. Reading loads the object once per instance (None when it does not
+    exist or has been deleted); assigning an estate, building or unit sets both columns.
+    Use prefetch_properties() to load it for many instances at once.
+    """
+    def __init__(self, type_field='property_type', id_field='property_id'):
+        self.type_field = type_field
+        self.id_field = id_field
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.cache_name = f'_{name}_cache'
+
+    def key(self, instance):
+        return getattr(instance, self.type_field), getattr(instance, self.id_field)
+
+    def is_cached(self, instance):
+        cached = instance.__dict__.get(self.cache_name)
+        return cached is not None and cached[0] == self.key(instance)
+
+    def set_cached(self, instance, value):
+        instance.__dict__[self.cache_name] = (self.key(instance), value)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if not self.is_cached(instance):
+            property_type, property_id = self.key(instance)
+            value = None
+            if property_type in PROPERTY_MODELS and property_id is not None:
+                value = _queryset(property_type).filter(pk=property_id).first()
+            self.set_cached(instance, value)
+        return instance.__dict__[self.cache_name][1]
+
+    def __set__(self, instance, value):
+        setattr(instance, self.type_field, property_type_for(value))
+        setattr(instance, self.id_field, value.pk)
+        self.set_cached(instance, value)
+
+
+def prefetch_properties(instances, name='property_object'):
+    """
+    Resolve the `name` property reference of many instances with one in_bulk query per
+    property type, attaching the objects so reading it costs no query. Takes a list of
+    instances (resolved in place) and returns it.
+    """
+    instances = list(instances)
+    if not instances:
+        return instances
+    reference = getattr(type(instances[0]), name)
+    pending = [instance for instance in instances if not reference.is_cached(instance)]
+    ids_by_type = {}
+    for instance in pending:
+        property_type, property_id = reference.key(instance)
+        if property_type in PROPERTY_MODELS and property_id is not None:
+            ids_by_type.setdefault(property_type, set()).add(property_id)
+    loaded = {
+        property_type: _queryset(property_type).in_bulk(ids)
+        for property_type, ids in ids_by_type.items()
+    }
+    for instance in pending:
+        property_type, property_id = reference.key(instance)
+        reference.set_cached(instance, loaded.get(property_type, {}).get(property_id))
+    return instances
+
+
+class PropertyReferenceQuerySet(models.QuerySet):
+    """QuerySet whose prefetch_properties() resolves the property references of the results in bulk"""
+    _property_prefetches = ()
+
+    def prefetch_properties(self, name='property_object'):
+        clone = self._chain()
+        clone._property_prefetches = (*self._property_prefetches, name)
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._property_prefetches = self._property_prefetches
+        return clone
+
+    def _fetch_all(self):
+        resolved = self._result_cache is not None
+        super()._fetch_all()
+        if not resolved and self._property_prefetches and self._iterable_class is ModelIterable:
+            for name in self._property_prefetches:
+                prefetch_properties(self._result_cache, name)
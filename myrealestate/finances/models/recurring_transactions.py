@@ -3,8 +3,11 @@ from myrealestate.common.models import BaseModel, CurrencyField
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 import uuid
+from dateutil.relativedelta import relativedelta
 from .enums import RecurrenceFrequency, PropertyType, TransactionType, CategoryType
 from . import FinancialCategory, MunicipalAccount, BodyCorporate, PropertyBond, FinancialTransaction
+from .transactions import tax_year_for
+from .property_reference import PropertyReference, PropertyReferenceQuerySet
 
 
 class RecurringTransaction(BaseModel):
@@ -17,6 +20,7 @@ class RecurringTransaction(BaseModel):
     # Link to property
     property_type = models.CharField(max_length=2, choices=PropertyType.choices)
     property_id = models.IntegerField()
+    property_object = PropertyReference()
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="recurring_transactions")
     
     # Financial details
@@ -53,11 +57,20 @@ class RecurringTransaction(BaseModel):
     # Tax information
     is_tax_deductible = models.BooleanField(default=False)
     
+    objects = PropertyReferenceQuerySet.as_manager()
+
     class Meta:
         ordering = ['next_due_date']
+        indexes = [
+            models.Index(fields=['is_active', 'next_due_date']),
+        ]
     
     def __str__(self):
         return f"{self.get_transaction_type_display()} of {self.amount} ({self.get_frequency_display()})"
+
+    def get_property_object(self):
+        """Get the actual property object"""
+        return self.property_object
     
     def clean(self):
         # Ensure category type matches transaction type
@@ -66,67 +79,83 @@ class RecurringTransaction(BaseModel):
         if self.transaction_type == 'expense' and self.category.category_type != CategoryType.EXPENSE:
             raise ValidationError("Category must be an expense category for expense transactions")
     
-    def calculate_next_due_date(self):
+    # Month-based steps keep the day of month of start_date, so a schedule starting on
+    # the 31st falls on the last day of shorter months without drifting afterwards
+    FREQUENCY_STEPS = {
+        RecurrenceFrequency.DAILY: relativedelta(days=1),
+        RecurrenceFrequency.WEEKLY: relativedelta(weeks=1),
+        RecurrenceFrequency.BIWEEKLY: relativedelta(weeks=2),
+        RecurrenceFrequency.MONTHLY: relativedelta(months=1),
+        RecurrenceFrequency.QUARTERLY: relativedelta(months=3),
+        RecurrenceFrequency.SEMIANNUALLY: relativedelta(months=6),
+        RecurrenceFrequency.ANNUALLY: relativedelta(years=1),
+    }
+
+    def calculate_next_due_date(self, current=None):
+        """
+        Calculate the due date following `current` (next_due_date by default) based on frequency
+        """
+        current = current or self.next_due_date
+        step = self.FREQUENCY_STEPS[self.frequency]
+        if step.months or step.years:
+            return current + relativedelta(months=step.months, years=step.years, day=self.start_date.day)
+        return current + step
+
+    def due_dates(self, until):
         """
-        Calculate the next due date based on frequency and current next_due_date
+        Every occurrence from next_due_date up to and including `until` (and end_date),
+        followed by the due date after them
         """
-        from datetime import timedelta
-        from dateutil.relativedelta import relativedelta
-        
+        dates = []
         current = self.next_due_date
-        
-        if self.frequency == 'daily':
-            return current + timedelta(days=1)
-        elif self.frequency == 'semiannually':
-            return current + relativedelta(months=6)
-        elif self.frequency == 'annually':
-            return current + relativedelta(years=1)
-        return current
-    
-    def create_transaction(self):
+        while current <= until and (self.end_date is None or current <= self.end_date):
+            dates.append(current)
+            current = self.calculate_next_due_date(current)
+        return dates, current
+
+    def build_transaction(self, date):
         """
-        Create a financial transaction based on this recurring template
+        The unsaved financial transaction for the occurrence on `date`
         """
-        # Determine tax year
-        tax_year_start_month = 3  # March
-        date_year = self.next_due_date.year
-        date_month = self.next_due_date.month
-        
-        if date_month < tax_year_start_month:
-            tax_year = date_year - 1
-        else:
-            tax_year = date_year
-        
-        transaction = FinancialTransaction(
+        return FinancialTransaction(
             transaction_type=self.transaction_type,
             property_type=self.property_type,
             property_id=self.property_id,
-            company=self.company,
+            company_id=self.company_id,
             amount=self.amount,
-            category=self.category,
-            date=self.next_due_date,
-            tenant=self.tenant,
+            category_id=self.category_id,
+            date=date,
+            recurring_transaction=self,
+            tenant_id=self.tenant_id,
             vendor=self.vendor,
             vendor_vat_number=self.vendor_vat_number,
             includes_vat=self.includes_vat,
             vat_amount=self.vat_amount,
             is_tax_deductible=self.is_tax_deductible,
-            tax_year=tax_year,
-            municipal_account=self.municipal_account,
-            body_corporate=self.body_corporate,
-            property_bond=self.property_bond,
+            tax_year=tax_year_for(date),
+            municipal_account_id=self.municipal_account_id,
+            body_corporate_id=self.body_corporate_id,
+            property_bond_id=self.property_bond_id,
             description=self.description,
             notes=f"Auto-generated from recurring transaction: {self.pk}"
         )
-        transaction.save()
-        
-        # Update next due date
-        self.next_due_date = self.calculate_next_due_date()
-        
-        # If end date is set and we've passed it, deactivate
+
+    def advance(self, next_due_date):
+        """
+        Move next_due_date on, deactivating the template once it runs past end_date
+        """
+        self.next_due_date = next_due_date
         if self.end_date and self.next_due_date > self.end_date:
             self.is_active = False
-            
+
+    def create_transaction(self):
+        """
+        Create a financial transaction based on this recurring template
+        """
+        transaction = self.build_transaction(self.next_due_date)
+        transaction.save()
+
+        self.advance(self.calculate_next_due_date())
         self.save()
-        
-        return transaction
\ No newline at end of file
+
+        return transaction
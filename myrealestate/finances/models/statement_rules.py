@@ -0,0 +1,43 @@
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from myrealestate.common.models import BaseModel
+from .enums import PropertyType
+from .categories import FinancialCategory
+from .property_reference import PropertyReference, PropertyReferenceQuerySet
+
+
+class StatementRule(BaseModel):
+    """
+    Assigns imported bank statement lines whose description or reference matches
+    `pattern` to a property and category (see finances.bank_import). A rule only
+    matches lines of its category's kind: money in for income categories, money out
+    for expense categories. Rules are tried by priority, lowest first.
+    """
+    company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="statement_rules")
+    pattern = models.CharField(max_length=255, help_text=_("Regular expression, matched case-insensitively against the description and reference"))
+    category = models.ForeignKey(FinancialCategory, on_delete=models.CASCADE, related_name="statement_rules")
+
+    property_type = models.CharField(max_length=2, choices=PropertyType.choices)
+    property_id = models.IntegerField()
+    property_object = PropertyReference()
+
+    vendor = models.CharField(max_length=255, blank=True, null=True, help_text=_("Vendor recorded on matched expenses"))
+    priority = models.PositiveIntegerField(default=100)
+    is_active = models.BooleanField(default=True)
+
+    objects = PropertyReferenceQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['priority', 'pk']
+
+    def __str__(self):
+        return f"{self.pattern} -> {self.category}"
+
+    def clean(self):
+        try:
+            re.compile(self.pattern)
+        except re.error as error:
+            raise ValidationError({'pattern': f"Invalid regular expression: {error}"})
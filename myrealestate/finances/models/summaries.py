@@ -0,0 +1,188 @@
+from decimal import Decimal
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from djmoney.money import Money
+
+from .enums import PropertyType, TransactionType
+from . import FinancialCategory, FinancialTransaction
+
+# Transaction columns a summary cell depends on
+SUMMARY_SOURCE_FIELDS = (
+    'company_id', 'property_type', 'property_id', 'category_id', 'transaction_type', 'date', 'amount', 'vat_amount',
+)
+SUMMARY_KEY_FIELDS = ('company_id', 'property_type', 'property_id', 'category_id', 'transaction_type', 'month')
+ZERO = Decimal('0')
+
+
+def _decimal(value):
+    if isinstance(value, Money):
+        return value.amount
+    return ZERO if value is None else Decimal(value)
+
+
+def summary_contribution(values):
+    """The summary cell a transaction (given as its SUMMARY_SOURCE_FIELDS values) falls in, and what it adds"""
+    key = (
+        values['company_id'], values['property_type'], values['property_id'],
+        values['category_id'], values['transaction_type'], values['date'].replace(day=1),
+    )
+    return key, (_decimal(values['amount']), _decimal(values['vat_amount']), 1)
+
+
+def summary_values(instance):
+    return {field: getattr(instance, field) for field in SUMMARY_SOURCE_FIELDS}
+
+
+class MonthlySummaryManager(models.Manager):
+    def record(self, old=(), new=()):
+        """
+        Move transactions' contributions from their old values to their new values. Both
+        are lists of SUMMARY_SOURCE_FIELDS dicts; a created transaction has no old values,
+        a deleted one no new values.
+        """
+        deltas = {}
+        for values_list, sign in ((old, -1), (new, 1)):
+            for values in values_list:
+                key, contribution = summary_contribution(values)
+                totals = deltas.setdefault(key, [ZERO, ZERO, 0])
+                for index, value in enumerate(contribution):
+                    totals[index] += sign * value
+        self.apply_deltas(deltas)
+
+    def apply_deltas(self, deltas):
+        """
+        Apply {summary key: (amount, vat_amount, transaction_count)} to the summary in one
+        INSERT ... ON CONFLICT DO UPDATE statement, creating missing cells on first touch,
+        then drop cells that were emptied. Rows are sent in key order so concurrent
+        writers lock cells in the same order.
+        """
+        rows = [(*key, *deltas[key]) for key in sorted(deltas) if any(deltas[key])]
+        if not rows:
+            return
+        table = self.model._meta.db_table
+        columns = ', '.join(SUMMARY_KEY_FIELDS)
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+        sql = f"""
+            INSERT INTO {table} ({columns}, amount, vat_amount, transaction_count)
+            VALUES {placeholders}
+            ON CONFLICT ({columns}) DO UPDATE SET
+                amount = {table}.amount + EXCLUDED.amount,
+                vat_amount = {table}.vat_amount + EXCLUDED.vat_amount,
+                transaction_count = {table}.transaction_count + EXCLUDED.transaction_count
+        """
+        emptied = Q(pk__in=[])
+        for row in rows:
+            if row[-1] < 0:
+                emptied |= Q(**dict(zip(SUMMARY_KEY_FIELDS, row)))
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [value for row in rows for value in row])
+            self.filter(emptied, transaction_count__lte=0).delete()
+
+    def rebuild(self, company_id=None):
+        """Recompute every summary cell from the ledger with one grouped aggregate. Returns the number of cells."""
+        transactions = FinancialTransaction.objects.all()
+        summaries = self.all()
+        if company_id:
+            transactions = transactions.filter(company_id=company_id)
+            summaries = summaries.filter(company_id=company_id)
+
+        rows = (
+            transactions.annotate(month=TruncMonth('date'))
+            .values(*SUMMARY_KEY_FIELDS)
+            .annotate(
+                total=Coalesce(Sum('amount'), Value(ZERO)),
+                total_vat=Coalesce(Sum('vat_amount'), Value(ZERO)),
+                count=Count('pk'),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            summaries.delete()
+            return len(self.bulk_create(
+                [
+                    self.model(
+                        **{field: row[field] for field in SUMMARY_KEY_FIELDS},
+                        amount=row['total'], vat_amount=row['total_vat'], transaction_count=row['count'],
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000,
+            ))
+
+    def for_company(self, company, start=None, end=None, members=None):
+        """
+        Cells of `company` for the months from `start` to `end` inclusive, optionally only
+        for these (property_type, property_id) pairs
+        """
+        cells = self.filter(company=company)
+        if start:
+            cells = cells.filter(month__gte=start.replace(day=1))
+        if end:
+            cells = cells.filter(month__lte=end.replace(day=1))
+        if members is not None:
+            by_type = {}
+            for property_type, property_id in members:
+                by_type.setdefault(property_type, []).append(property_id)
+            query = Q(pk__in=[])
+            for property_type, ids in by_type.items():
+                query |= Q(property_type=property_type, property_id__in=ids)
+            cells = cells.filter(query)
+        return cells
+
+    def profit_and_loss(self, company, start, end, members=None):
+        """
+        Monthly income, expenses and net result, and totals per category, read from the
+        summary cells only: {'months': [...], 'categories': [...]}
+        """
+        cells = self.for_company(company, start, end, members)
+        income = Sum('amount', filter=Q(transaction_type=TransactionType.INCOME), default=ZERO)
+        expenses = Sum('amount', filter=Q(transaction_type=TransactionType.EXPENSE), default=ZERO)
+        months = [
+            {**row, 'net': row['income'] - row['expenses']}
+            for row in cells.values('month').annotate(income=income, expenses=expenses, vat_amount=Sum('vat_amount')).order_by('month')
+        ]
+        categories = list(
+            cells.values('category_id', 'transaction_type', name=F('category__name'))
+            .annotate(amount=Sum('amount'), vat_amount=Sum('vat_amount'), transaction_count=Sum('transaction_count'))
+            .order_by('transaction_type', 'name')
+        )
+        return {'months': months, 'categories': categories}
+
+
+class MonthlySummary(models.Model):
+    """
+    Income and expense totals per company, property, category, transaction type and
+    month. Kept in step with the ledger by FinancialTransaction save and delete signals
+    (and by the bulk writers); `manage.py rebuild_monthly_summaries` recomputes it.
+    Amounts are summed as stored, in the company's currency.
+    """
+    company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="monthly_summaries")
+    property_type = models.CharField(max_length=2, choices=PropertyType.choices)
+    property_id = models.IntegerField()
+    category = models.ForeignKey(FinancialCategory, on_delete=models.CASCADE, related_name="monthly_summaries")
+    transaction_type = models.CharField(max_length=10, choices=TransactionType.choices)
+    month = models.DateField(help_text="First day of the month")
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    vat_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+
+    objects = MonthlySummaryManager()
+
+    class Meta:
+        verbose_name_plural = "Monthly summaries"
+        indexes = [
+            models.Index(fields=['company', 'month']),
+            models.Index(fields=['company', 'property_type', 'property_id', 'month']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'property_type', 'property_id', 'category', 'transaction_type', 'month'],
+                name='unique_monthly_summary',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} {self.category_id} {self.month:%Y-%m}: {self.amount}"
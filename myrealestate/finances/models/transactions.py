@@ -1,14 +1,23 @@
 from django.db import models
-from myrealestate.common.models import BaseModel, CurrencyField
+from myrealestate.common.models import BaseModel, CurrencyField, LoadedValuesMixin
 from .enums import PropertyType
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 import uuid
-from .enums import TransactionType, PropertyType, PaymentMethod
+from .enums import TransactionType, PropertyType, PaymentMethod, BondComponent
 from . import FinancialCategory, MunicipalAccount, BodyCorporate, PropertyBond
+from .property_reference import PropertyReference, PropertyReferenceQuerySet, property_type_for
 
+# South African tax year runs from March to February
+TAX_YEAR_START_MONTH = 3
 
-class FinancialTransaction(BaseModel):
+
+def tax_year_for(day):
+    """Tax year a date falls in, named after the calendar year it starts in"""
+    return day.year if day.month >= TAX_YEAR_START_MONTH else day.year - 1
+
+
+class FinancialTransaction(LoadedValuesMixin, BaseModel):
     """
     Base model for financial transactions
     """
@@ -20,6 +29,7 @@ class FinancialTransaction(BaseModel):
     # Link to property in property hierarchy
     property_type = models.CharField(max_length=2, choices=PropertyType.choices)
     property_id = models.IntegerField()
+    property_object = PropertyReference()
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="financial_transactions")
     
     # Financial details
@@ -47,6 +57,16 @@ class FinancialTransaction(BaseModel):
     municipal_account = models.ForeignKey(MunicipalAccount, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
     body_corporate = models.ForeignKey(BodyCorporate, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
     property_bond = models.ForeignKey(PropertyBond, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
+
+    # Template this transaction was generated from; with the date it identifies the occurrence
+    recurring_transaction = models.ForeignKey('RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
+
+    # Bond repayments are split into the capital part (kept on the payment) and an interest transaction
+    bond_component = models.CharField(max_length=2, choices=BondComponent.choices, null=True, blank=True)
+    split_from = models.OneToOneField('self', on_delete=models.CASCADE, null=True, blank=True, related_name="interest_component")
+
+    # Hash of the bank statement line this was imported from; re-importing the line finds it taken
+    import_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     description = models.TextField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
@@ -62,6 +82,8 @@ class FinancialTransaction(BaseModel):
     is_paid = models.BooleanField(default=True)
     payment_date = models.DateField(null=True, blank=True, help_text="Date when payment was made or received")
     
+    objects = PropertyReferenceQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date']
         indexes = [
@@ -70,6 +92,10 @@ class FinancialTransaction(BaseModel):
             models.Index(fields=['date']),
             models.Index(fields=['is_paid']),
             models.Index(fields=['tax_year']),
+            models.Index(fields=['company', 'tax_year', 'transaction_type', 'category']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_transaction', 'date'], name='unique_recurring_occurrence'),
         ]
     
     def __str__(self):
@@ -84,37 +110,24 @@ class FinancialTransaction(BaseModel):
         
         # Set tax year if not provided
         if not self.tax_year:
-            # South African tax year runs from March to February
-            tax_year_start_month = 3  # March
-            date_year = self.date.year
-            date_month = self.date.month
-            
-            if date_month < tax_year_start_month:
-                self.tax_year = date_year - 1
-            else:
-                self.tax_year = date_year
-    
+            self.tax_year = tax_year_for(self.date)
+
+    def save(self, *args, **kwargs):
+        # Reports group by tax year, so every saved transaction carries one
+        if not self.tax_year and self.date:
+            self.tax_year = tax_year_for(self.date)
+        super().save(*args, **kwargs)
+
     def get_property_object(self):
         """Get the actual property object"""
-        from myrealestate.properties.models import Estate, Building, Unit
-        
-        if self.property_type == 'estate':
-            return Estate.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'building':
-            return Building.objects.filter(id=self.property_id).first()
-        elif self.property_type == 'unit':
-            return Unit.objects.filter(id=self.property_id).first()
-        return None
+        return self.property_object
     
     @classmethod
     def get_transactions_for_property(cls, property_obj, start_date=None, end_date=None):
         """
         Get all transactions for a specific property
         """
-        property_type = property_obj.__class__.__name__.lower()
-        property_id = property_obj.id
-        
-        query = cls.objects.filter(property_type=property_type, property_id=property_id)
+        query = cls.objects.filter(property_type=property_type_for(property_obj), property_id=property_obj.id)
         
         if start_date:
             query = query.filter(date__gte=start_date)
@@ -130,7 +143,7 @@ class FinancialTransaction(BaseModel):
         """
         return cls.get_transactions_for_property(
             property_obj, start_date, end_date
-        ).filter(transaction_type='income')
+        ).filter(transaction_type=TransactionType.INCOME)
     
     @classmethod
     def get_expenses_for_property(cls, property_obj, start_date=None, end_date=None):
@@ -139,7 +152,7 @@ class FinancialTransaction(BaseModel):
         """
         return cls.get_transactions_for_property(
             property_obj, start_date, end_date
-        ).filter(transaction_type='expense')
+        ).filter(transaction_type=TransactionType.EXPENSE)
     
     @property
     def is_tax_deductible_auto(self):
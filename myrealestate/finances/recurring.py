@@ -0,0 +1,107 @@
+"""
+Materialization of recurring transaction templates.
+
+materialize_due_transactions() picks up every active template whose next_due_date
+has arrived, across all companies, and creates the transactions for all the
+occurrences it is behind on (one per missed period, not just the latest). The rows
+are inserted with bulk_create in chunks and the templates are advanced, and
+deactivated past their end_date, with a single bulk_update per chunk.
+
+Any number of workers can run it at once, in threads, processes or on other nodes:
+each batch of templates is claimed with SELECT ... FOR UPDATE SKIP LOCKED and
+processed in its own transaction, so no two workers ever hold the same template and
+a worker that dies mid-batch leaves nothing behind but released locks. Each generated
+transaction also carries its template and date, which are unique together, so an
+occurrence is never created twice.
+"""
+import os
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import bond_splits, forecast, tax_report
+from .models import RecurringTransaction, FinancialTransaction, MonthlySummary
+from .models.summaries import summary_values
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def due_templates(today):
+    return RecurringTransaction.objects.filter(is_active=True, next_due_date__lte=today).order_by('pk')
+
+
+def claim_batch(today, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Lock up to `batch_size` due templates no other worker holds. Must be called inside
+    the transaction that processes them; the locks last until it ends.
+    """
+    return list(due_templates(today).select_for_update(skip_locked=True)[:batch_size])
+
+
+def materialize_templates(templates, today, batch_size=DEFAULT_BATCH_SIZE):
+    """Create the due occurrences of these templates and advance them. Returns the number of occurrences"""
+    occurrences = []
+    now = timezone.now()
+    for template in templates:
+        dates, next_due_date = template.due_dates(today)
+        occurrences.extend(template.build_transaction(date) for date in dates)
+        template.advance(next_due_date)
+        template.updated_at = now
+
+    # The templates are locked, so occurrences already on the ledger cannot appear meanwhile
+    if occurrences:
+        existing = set(FinancialTransaction.objects.filter(
+            recurring_transaction__in=templates, date__gte=min(occurrence.date for occurrence in occurrences)
+        ).values_list('recurring_transaction_id', 'date'))
+        occurrences = [
+            occurrence for occurrence in occurrences
+            if (occurrence.recurring_transaction_id, occurrence.date) not in existing
+        ]
+    # No ignore_conflicts: a conflict here is a bug, and skipped rows would still be summarized
+    FinancialTransaction.objects.bulk_create(occurrences, batch_size=batch_size)
+    MonthlySummary.objects.record(new=[summary_values(occurrence) for occurrence in occurrences])
+    tax_report.invalidate_transactions(occurrences)
+    RecurringTransaction.objects.bulk_update(templates, ['next_due_date', 'is_active', 'updated_at'])
+    forecast.invalidate({template.company_id for template in templates})
+    bond_ids = {template.property_bond_id for template in templates if template.property_bond_id}
+    if bond_ids and occurrences:
+        bond_splits.split_pending(bond_ids)
+    return len(occurrences)
+
+
+def materialize_due_transactions(today=None, batch_size=DEFAULT_BATCH_SIZE, max_batches=None, worker=None):
+    """
+    Catch active templates up to `today` (the local date by default), claiming and
+    committing `batch_size` templates at a time until none are left unclaimed (or
+    `max_batches` have run). This is the entry point for schedulers and workers; see
+    the materialize_recurring_transactions command.
+
+    Returns this worker's throughput: {'worker', 'batches', 'templates',
+    'transactions', 'seconds'}.
+    """
+    today = today or timezone.localdate()
+    stats = {
+        'worker': worker or f"{os.uname().nodename}:{os.getpid()}",
+        'batches': 0, 'templates': 0, 'transactions': 0, 'seconds': 0.0,
+    }
+    started = time.monotonic()
+    while max_batches is None or stats['batches'] < max_batches:
+        with transaction.atomic():
+            templates = claim_batch(today, batch_size=batch_size)
+            if not templates:
+                break
+            stats['transactions'] += materialize_templates(templates, today, batch_size=batch_size)
+        stats['templates'] += len(templates)
+        stats['batches'] += 1
+    stats['seconds'] = time.monotonic() - started
+    if stats['templates']:
+        logger.info(
+            f"Worker {stats['worker']} materialized {stats['transactions']} occurrences of "
+            f"{stats['templates']} recurring transactions in {stats['seconds']:.2f}s"
+        )
+    return stats
@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -8,7 +8,13 @@ from .models import (
     PropertyBond, 
     FinancialTransaction, 
     FinancialCategory,
+    RecurringTransaction,
+    BodyCorporate,
+    PrimeRate,
+    MonthlySummary,
 )
+from .models.summaries import SUMMARY_SOURCE_FIELDS, summary_contribution, summary_values
+from . import amortization, bond_splits, forecast, tax_report
 
 from .utils import create_default_financial_categories
 
@@ -19,3 +25,102 @@ def create_company_financial_categories(sender, instance, created, **kwargs):
     """
     if created:
         create_default_financial_categories(instance)
+
+
+@receiver(post_save, sender=RecurringTransaction)
+@receiver(post_delete, sender=RecurringTransaction)
+@receiver(post_save, sender=PropertyBond)
+@receiver(post_delete, sender=PropertyBond)
+@receiver(post_save, sender=BodyCorporate)
+@receiver(post_delete, sender=BodyCorporate)
+@receiver(post_save, sender=FinancialCategory)
+@receiver(post_save, sender=PropertyPurchase)
+def invalidate_forecast(sender, instance, **kwargs):
+    """
+    Schedules, amounts, category names and the property a bond belongs to all feed the
+    cash-flow forecast
+    """
+    forecast.invalidate([instance.company_id])
+
+
+@receiver(post_save, sender=PropertyBond)
+@receiver(post_delete, sender=PropertyBond)
+def invalidate_bond_schedule(sender, instance, **kwargs):
+    amortization.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=PrimeRate)
+@receiver(post_delete, sender=PrimeRate)
+def invalidate_prime_linked_schedules(sender, instance, **kwargs):
+    amortization.invalidate_prime_rates()
+
+
+# Columns whose previous values the ledger hooks below need
+TRANSACTION_TRACKED_FIELDS = SUMMARY_SOURCE_FIELDS + ('tax_year',)
+
+
+@receiver(pre_save, sender=FinancialTransaction)
+def ensure_loaded_transaction_values(sender, instance, raw=False, **kwargs):
+    """
+    Summary deltas need the previously stored values. Re-read them only when the
+    instance was built by hand or loaded with .only()/.defer().
+    """
+    if raw or instance._state.adding:
+        return
+    loaded = instance.get_loaded_values() or {}
+    if all(field in loaded for field in TRANSACTION_TRACKED_FIELDS):
+        return
+    stored = sender.objects.filter(pk=instance.pk).values(*TRANSACTION_TRACKED_FIELDS).first()
+    if stored is not None:
+        instance._loaded_values = {**loaded, **stored}
+
+
+def _stored_values(instance):
+    loaded = instance.get_loaded_values()
+    if loaded is None:
+        return None
+    return {field: loaded.get(field, getattr(instance, field)) for field in TRANSACTION_TRACKED_FIELDS}
+
+
+@receiver(post_save, sender=FinancialTransaction)
+def on_transaction_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Move the transaction's amounts between summary months, categories and properties
+    as it changes, and invalidate the tax reports of the years it left and entered
+    """
+    if raw:
+        return
+    old = None if created else _stored_values(instance)
+    new = summary_values(instance)
+    if old is None or summary_contribution(old) != summary_contribution(new):
+        MonthlySummary.objects.record(old=[old] if old else [], new=[new])
+    years = {(instance.company_id, instance.tax_year)}
+    if old:
+        years.add((old['company_id'], old['tax_year']))
+    tax_report.invalidate(years)
+    instance.reset_loaded_values()
+
+
+@receiver(post_delete, sender=FinancialTransaction)
+def on_transaction_deleted(sender, instance, **kwargs):
+    old = _stored_values(instance) or {field: getattr(instance, field) for field in TRANSACTION_TRACKED_FIELDS}
+    MonthlySummary.objects.record(old=[old])
+    tax_report.invalidate([(old['company_id'], old['tax_year'])])
+
+
+@receiver(post_save, sender=FinancialCategory)
+def invalidate_tax_reports(sender, instance, **kwargs):
+    # Deductibility is read from the category at report time
+    tax_report.invalidate_company([instance.company_id])
+
+
+@receiver(post_save, sender=FinancialTransaction)
+def split_bond_payment(sender, instance, raw=False, **kwargs):
+    """
+    Post the interest part of a newly recorded bond repayment. Runs after the summary
+    update, and reloads the capital amount so saving the instance again keeps the split.
+    """
+    if not raw and instance.property_bond_id and instance.bond_component is None:
+        if bond_splits.split_pending([instance.property_bond_id]):
+            instance.refresh_from_db(fields=['amount', 'amount_currency', 'bond_component'])
+            instance.reset_loaded_values()
@@ -0,0 +1,173 @@
+"""
+Interest-rate stress testing of a company's bond portfolio.
+
+stress_test() simulates thousands of monthly prime-rate paths (a random walk moving
+in 25 basis point steps). It applies them to every active bond of the company,
+starting from each bond's outstanding balance and remaining term in its amortization
+schedule. Prime-linked and variable-rate bonds follow the path; fixed-rate bonds keep
+their current rate. The debt service on each path is set against the rent roll
+(Unit.base_rent), discounted by a vacancy rate that varies randomly around the
+company's current vacancy.
+
+The paths are split into chunks and run in a process pool. Within a chunk every
+month is one set of array operations over a (path x bond) balance matrix, so 500
+bonds by 10k paths take seconds. The result reports, per month and per path, the
+distribution of shortfall (debt service the rent does not cover) and of the
+debt-service coverage ratio (rent / debt service).
+"""
+import math
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.utils import timezone
+
+from .amortization import schedules_for, prime_history
+from .models import PropertyBond, InterestRateType
+
+DEFAULT_PATHS = 10_000
+DEFAULT_MONTHS = 60
+PERCENTILES = (5, 50, 95)
+CHUNK_SIZE = 500
+RATE_STEP = 0.25  # prime moves in quarter points
+
+# Yearly standard deviation of the prime rate, in percentage points
+DEFAULT_VOLATILITY = 1.0
+DEFAULT_VACANCY_VOLATILITY = 0.03
+
+
+def portfolio(company, today):
+    """
+    Outstanding balance, remaining instalments, current annual rate and rate
+    sensitivity of each active bond of the company, as arrays
+    """
+    bonds = list(PropertyBond.objects.filter(company=company, is_active=True))
+    schedules = schedules_for(bonds)
+    day = np.datetime64(today, 'D')
+    balances, remaining, rates, floating = [], [], [], []
+    for bond in bonds:
+        schedule = schedules[bond.pk]
+        paid = int(np.searchsorted(schedule.dates, day, side='right'))
+        if paid >= len(schedule):
+            continue
+        balances.append(float(schedule.balance_as_of(today)))
+        remaining.append(len(schedule) - paid)
+        rates.append(float(schedule.rate[paid]))
+        floating.append(bond.prime_linked or bond.interest_rate_type != InterestRateType.FIXED)
+    return (
+        np.array(balances), np.array(remaining, dtype=np.int64), np.array(rates), np.array(floating, dtype=bool)
+    )
+
+
+def rent_roll(company):
+    """Monthly rent of all units and the share of them currently vacant"""
+    from myrealestate.properties.models import Unit
+
+    units = list(Unit.objects.filter(company=company).values_list('base_rent', 'is_vacant'))
+    rent = sum(float(base_rent or 0) for base_rent, _ in units)
+    vacancy = sum(1 for _, is_vacant in units if is_vacant) / len(units) if units else 0.0
+    return rent, vacancy
+
+
+def debt_service(balances, remaining, rates, shocks, months):
+    """
+    Total monthly instalment of bonds at annual `rates` moved by `shocks` (a paths x
+    months grid of rate changes), re-annuitized over the remaining term every month.
+    Returns a (paths x months) array.
+    """
+    paths = shocks.shape[0]
+    balance = np.broadcast_to(balances, (paths, len(balances))).copy()
+    total = np.zeros((paths, months))
+    for month in range(months):
+        left = remaining - month
+        active = left > 0
+        r = np.maximum(rates[None, :] + shocks[:, month, None], 0) / 1200
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1 - (1 + r) ** -left, accurate for small rates
+            annuity = np.where(r > 0, balance * r / -np.expm1(-left * np.log1p(r)), balance / np.maximum(left, 1))
+        payment = np.where(active, annuity, 0)
+        total[:, month] = payment.sum(axis=1)
+        balance = np.where(active, balance * (1 + r) - payment, balance)
+    return total
+
+
+def simulate_chunk(args):
+    """Debt service and rent income of one chunk of paths: two (paths x months) arrays"""
+    (balances, remaining, rates, floating, rent, vacancy, paths, months,
+     volatility, drift, vacancy_volatility, seed) = args
+    rng = np.random.default_rng(seed)
+
+    # Prime path as cumulative quarter-point moves from today's rate
+    moves = rng.normal(drift / 12, volatility / math.sqrt(12), (paths, months))
+    shocks = np.cumsum(np.round(moves / RATE_STEP) * RATE_STEP, axis=1)
+
+    # Fixed-rate bonds pay the same on every path, so they are amortized once
+    service = debt_service(balances[~floating], remaining[~floating], rates[~floating], np.zeros((1, months)), months)
+    service = service + debt_service(balances[floating], remaining[floating], rates[floating], shocks, months)
+
+    vacancies = np.clip(vacancy + rng.normal(0, vacancy_volatility, (paths, months)), 0, 1)
+    income = rent * (1 - vacancies)
+    return service, income
+
+
+def _percentiles(values):
+    """Percentiles over the paths (axis 0), ignoring months without debt service"""
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        result = np.nanpercentile(values, PERCENTILES, axis=0)
+    return {percentile: np.round(row, 4).tolist() for percentile, row in zip(PERCENTILES, result)}
+
+
+def stress_test(company, paths=DEFAULT_PATHS, months=DEFAULT_MONTHS, volatility=DEFAULT_VOLATILITY, drift=0.0,
+                vacancy=None, vacancy_volatility=DEFAULT_VACANCY_VOLATILITY, seed=None, workers=None, today=None):
+    """
+    Simulate `paths` prime-rate paths over `months` months for the company's bonds and
+    rent roll. `volatility` and `drift` are the yearly standard deviation and trend of
+    prime in percentage points; `vacancy` defaults to the current share of vacant units.
+    Runs in a pool of `workers` processes (all cores by default, 1 to run inline).
+    """
+    today = today or timezone.localdate()
+    balances, remaining, rates, floating = portfolio(company, today)
+    rent, current_vacancy = rent_roll(company)
+    vacancy = current_vacancy if vacancy is None else vacancy
+
+    chunks = [CHUNK_SIZE] * (paths // CHUNK_SIZE) + ([paths % CHUNK_SIZE] if paths % CHUNK_SIZE else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [
+        (balances, remaining, rates, floating, rent, vacancy, size, months, volatility, drift, vacancy_volatility, chunk_seed)
+        for size, chunk_seed in zip(chunks, seeds)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = [simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks)), mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(simulate_chunk, tasks))
+    service = np.concatenate([result[0] for result in results])
+    income = np.concatenate([result[1] for result in results])
+
+    shortfall = np.maximum(service - income, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = np.where(service > 0, income / service, np.nan)
+    start_month = np.datetime64(today, 'M')
+    _, prime_rates = prime_history()
+    return {
+        'paths': paths,
+        'months': [(start_month + offset).astype('datetime64[D]').item() for offset in range(1, months + 1)],
+        'bonds': len(balances),
+        'floating_bonds': int(floating.sum()),
+        'outstanding_balance': round(float(balances.sum()), 2),
+        'prime_rate': float(prime_rates[-1]) if len(prime_rates) else None,
+        'monthly_rent': round(rent, 2),
+        'vacancy': vacancy,
+        'debt_service': _percentiles(service),
+        'income': _percentiles(income),
+        'shortfall': _percentiles(shortfall),
+        'dscr': _percentiles(coverage),
+        'shortfall_probability': round(float((shortfall > 0).any(axis=1).mean()), 4),
+        # Distribution of each path's worst month
+        'worst_shortfall': _percentiles(shortfall.max(axis=1)),
+        'lowest_dscr': _percentiles(np.where(np.isnan(coverage), np.inf, coverage).min(axis=1)),
+    }
@@ -0,0 +1,183 @@
+"""
+South African tax-year reports.
+
+A tax year runs from March to February and is named after the year it starts in
+(FinancialTransaction.tax_year). For each year the report gives income and expenses
+by category, with expenses split into deductible ones (the transaction or its
+category is marked tax deductible) and the rest, VAT charged and paid, and the same
+totals per property.
+
+All requested years come from one grouped query, served by the (company, tax_year,
+transaction_type, category) index. Each year's report is cached under a version token
+per company and tax year. Transaction changes bump the token of the years they leave
+and enter (finances.signals, and the bulk writers), and a category change bumps the
+whole company, so a change only invalidates the reports it can affect.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, Q, Sum, Value, When
+
+from myrealestate.common.fragment_cache import bump_versions, get_versions
+from .utils import CENT
+from .models import FinancialTransaction, TransactionType
+from .models.transactions import TAX_YEAR_START_MONTH, tax_year_for
+
+TAX_REPORT_VERSION = 'tax_report'
+REPORT_TIMEOUT = 60 * 60 * 24
+
+INCOME = 'income'
+DEDUCTIBLE = 'deductible_expenses'
+NON_DEDUCTIBLE = 'non_deductible_expenses'
+SECTIONS = (INCOME, DEDUCTIBLE, NON_DEDUCTIBLE)
+ZERO = Decimal('0.00')
+
+
+def invalidate(company_years):
+    """Drop the cached reports of these (company id, tax year) pairs"""
+    bump_versions(TAX_REPORT_VERSION, [
+        f"{company_id}:{tax_year}" for company_id, tax_year in company_years
+        if company_id is not None and tax_year is not None
+    ])
+
+
+def invalidate_transactions(transactions):
+    invalidate({(transaction.company_id, transaction.tax_year) for transaction in transactions})
+
+
+def invalidate_company(company_ids):
+    """Drop every cached report of these companies, e.g. when a category's deductibility changes"""
+    bump_versions(TAX_REPORT_VERSION, [pk for pk in company_ids if pk is not None])
+
+
+def current_tax_year(today=None):
+    return tax_year_for(today or date.today())
+
+
+def tax_year_period(tax_year):
+    """First and last day of a tax year"""
+    return date(tax_year, TAX_YEAR_START_MONTH, 1), date(tax_year + 1, TAX_YEAR_START_MONTH, 1) - timedelta(days=1)
+
+
+def grouped_totals(company_id, tax_years):
+    """
+    One row per tax year, section, category and property with summed amounts, in a
+    single grouped query
+    """
+    deductible = Case(
+        When(Q(is_tax_deductible=True) | Q(category__is_tax_deductible=True), then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+    return (
+        FinancialTransaction.objects
+        .filter(company_id=company_id, tax_year__in=tax_years)
+        .annotate(deductible=deductible)
+        .values('tax_year', 'transaction_type', 'category_id', 'category__name', 'property_type', 'property_id', 'deductible')
+        .annotate(amount_total=Sum('amount'), vat_total=Sum('vat_amount'), transactions=Count('pk'))
+        .order_by()
+    )
+
+
+def _section(row):
+    if row['transaction_type'] == TransactionType.INCOME:
+        return INCOME
+    return DEDUCTIBLE if row['deductible'] else NON_DEDUCTIBLE
+
+
+def _empty_report(tax_year):
+    start, end = tax_year_period(tax_year)
+    return {
+        'tax_year': tax_year,
+        'start': start,
+        'end': end,
+        **{section: {'total': ZERO, 'vat_amount': ZERO, 'categories': {}} for section in SECTIONS},
+        'properties': {},
+    }
+
+
+def build_reports(company_id, tax_years):
+    """{tax year: report} for these years of the company, computed from the ledger"""
+    reports = {tax_year: _empty_report(tax_year) for tax_year in tax_years}
+    for row in grouped_totals(company_id, tax_years):
+        report = reports[row['tax_year']]
+        section = _section(row)
+        amount, vat_amount = row['amount_total'].quantize(CENT), row['vat_total'].quantize(CENT)
+
+        totals = report[section]
+        totals['total'] += amount
+        totals['vat_amount'] += vat_amount
+        category = totals['categories'].setdefault(row['category_id'], {
+            'category_id': row['category_id'], 'name': row['category__name'],
+            'amount': ZERO, 'vat_amount': ZERO, 'transactions': 0,
+        })
+        category['amount'] += amount
+        category['vat_amount'] += vat_amount
+        category['transactions'] += row['transactions']
+
+        property_totals = report['properties'].setdefault((row['property_type'], row['property_id']), {
+            'property_type': row['property_type'], 'property_id': row['property_id'],
+            **{name: ZERO for name in SECTIONS}, 'vat_amount': ZERO,
+        })
+        property_totals[section] += amount
+        property_totals['vat_amount'] += vat_amount
+
+    for report in reports.values():
+        for section in SECTIONS:
+            report[section]['categories'] = sorted(report[section]['categories'].values(), key=lambda c: c['name'])
+        report['properties'] = sorted(report['properties'].values(), key=lambda p: (p['property_type'], p['property_id']))
+        report['taxable_income'] = report[INCOME]['total'] - report[DEDUCTIBLE]['total']
+        # VAT charged on income less VAT paid on expenses
+        report['vat'] = {
+            'output': report[INCOME]['vat_amount'],
+            'input': report[DEDUCTIBLE]['vat_amount'] + report[NON_DEDUCTIBLE]['vat_amount'],
+        }
+        report['vat']['net'] = report['vat']['output'] - report['vat']['input']
+    return reports
+
+
+def tax_reports(company, tax_years):
+    """
+    Reports for `tax_years` of the company, in order. Cached years come from the cache
+    in one round trip; the missing ones are computed together.
+    """
+    tax_years = sorted(set(tax_years))
+    versions = get_versions(
+        (TAX_REPORT_VERSION, company.pk), *[(TAX_REPORT_VERSION, f"{company.pk}:{year}") for year in tax_years]
+    )
+    company_version, year_versions = versions[0], versions[1:]
+    keys = {
+        year: f"tax_report:{company.pk}:{year}:{company_version}:{version}"
+        for year, version in zip(tax_years, year_versions)
+    }
+    cached = cache.get_many(keys.values())
+    reports = {year: cached[key] for year, key in keys.items() if key in cached}
+    missing = [year for year in tax_years if year not in reports]
+    if missing:
+        computed = build_reports(company.pk, missing)
+        cache.set_many({keys[year]: report for year, report in computed.items()}, REPORT_TIMEOUT)
+        reports.update(computed)
+    return [reports[year] for year in tax_years]
+
+
+EXPORT_HEADERS = ['Tax Year', 'Section', 'Category', 'Property Type', 'Property ID', 'Amount', 'VAT', 'Transactions']
+
+
+def export_rows(reports):
+    """The reports as flat rows for CSV/XLSX export, yielded one at a time"""
+    for report in reports:
+        for section in SECTIONS:
+            label = section.replace('_', ' ').capitalize()
+            for category in report[section]['categories']:
+                yield [report['tax_year'], label, category['name'], '', '', category['amount'],
+                       category['vat_amount'], category['transactions']]
+            yield [report['tax_year'], f"{label} total", '', '', '', report[section]['total'],
+                   report[section]['vat_amount'], '']
+        for totals in report['properties']:
+            for section in SECTIONS:
+                if totals[section]:
+                    yield [report['tax_year'], section.replace('_', ' ').capitalize(), '', totals['property_type'],
+                           totals['property_id'], totals[section], '', '']
+        yield [report['tax_year'], 'Taxable income', '', '', '', report['taxable_income'], '', '']
+        yield [report['tax_year'], 'Net VAT', '', '', '', report['vat']['net'], '', '']
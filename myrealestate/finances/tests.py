@@ -1,3 +1,909 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from djmoney.money import Money
+
+from myrealestate.accounts.tests.factories import UserFactory
+from myrealestate.companies.models import Company
+from myrealestate.properties.models import Estate, Building, Unit, EstateTypeEnums, BuildingTypeEnums, UnitTypeEnums
+from .amortization import simulate
+from .bank_import import StatementError, import_statement, parse_statement
+from .bond_splits import split_pending
+from .forecast import forecast
+from .models import (
+    FinancialCategory, FinancialTransaction, RecurringTransaction, PropertyPurchase, PropertyBond, PrimeRate, BodyCorporate,
+    CategoryType, TransactionType, PropertyType, RecurrenceFrequency, BondComponent, InterestRateType, MonthlySummary,
+    MunicipalAccount, StatementRule,
+)
+from .models.property_reference import prefetch_properties, property_type_for
+from .recurring import materialize_due_transactions
+from .stress_test import stress_test
+from .tax_report import tax_reports
+
+
+class FinancialTransactionExportTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Test Company")
+        self.company.users.add(self.user)
+        self.user.active_company = self.company
+        self.user.save()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        # New companies are seeded with the default categories
+        category = FinancialCategory.objects.get(
+            name="Rental Income", category_type=CategoryType.INCOME, company=self.company
+        )
+        FinancialTransaction.objects.create(
+            transaction_type=TransactionType.INCOME, property_type=PropertyType.UNIT, property_id=1,
+            company=self.company, amount=1500, category=category, date=date(2024, 3, 1), vendor="Tenant A"
+        )
+        other_company = Company.objects.create(name="Other Company")
+        FinancialTransaction.objects.create(
+            transaction_type=TransactionType.INCOME, property_type=PropertyType.UNIT, property_id=2,
+            company=other_company, amount=900, date=date(2024, 3, 1),
+            category=FinancialCategory.objects.get(
+                name="Rental Income", category_type=CategoryType.INCOME, company=other_company
+            ),
+        )
+
+    def test_csv_export_is_company_scoped(self):
+        response = self.client.get(reverse('finances:export-transactions'))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("2024-03-01,Income,Rental Income,Unit,1,1500.0000,"))
+
+    def test_search(self):
+        response = self.client.get(reverse('finances:export-transactions'), {'q': 'nobody'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+
+
+class RecurringTransactionMaterializationTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.category = FinancialCategory.objects.get(
+            name="Rental Income", category_type=CategoryType.INCOME, company=self.company
+        )
+
+    def template(self, frequency, start, **values):
+        return RecurringTransaction.objects.create(
+            transaction_type=TransactionType.INCOME, property_type=PropertyType.UNIT, property_id=1,
+            company=self.company, amount=1000, category=self.category, frequency=frequency,
+            start_date=start, next_due_date=values.pop('next_due_date', start), **values
+        )
+
+    def dates(self, template):
+        return list(template.transactions.order_by('date').values_list('date', flat=True))
+
+    def test_every_frequency_advances(self):
+        start = date(2026, 1, 31)
+        expected = {
+            RecurrenceFrequency.DAILY: date(2026, 2, 1),
+            RecurrenceFrequency.WEEKLY: date(2026, 2, 7),
+            RecurrenceFrequency.BIWEEKLY: date(2026, 2, 14),
+            RecurrenceFrequency.MONTHLY: date(2026, 2, 28),
+            RecurrenceFrequency.QUARTERLY: date(2026, 4, 30),
+            RecurrenceFrequency.SEMIANNUALLY: date(2026, 7, 31),
+            RecurrenceFrequency.ANNUALLY: date(2027, 1, 31),
+        }
+        for frequency, next_due_date in expected.items():
+            template = RecurringTransaction(frequency=frequency, start_date=start, next_due_date=start)
+            self.assertEqual(template.calculate_next_due_date(), next_due_date, frequency)
+
+    def test_month_end_does_not_drift(self):
+        template = self.template(RecurrenceFrequency.MONTHLY, date(2026, 1, 31))
+        materialize_due_transactions(today=date(2026, 4, 30))
+        self.assertEqual(self.dates(template), [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)])
+        template.refresh_from_db()
+        self.assertEqual(template.next_due_date, date(2026, 5, 31))
+
+    def test_catch_up_is_idempotent(self):
+        weekly = self.template(RecurrenceFrequency.WEEKLY, date(2026, 1, 1))
+        self.template(RecurrenceFrequency.DAILY, date(2026, 3, 1))
+        stats = materialize_due_transactions(today=date(2026, 1, 29))
+        self.assertEqual((stats['templates'], stats['transactions']), (1, 5))
+        stats = materialize_due_transactions(today=date(2026, 1, 29))
+        self.assertEqual((stats['templates'], stats['transactions']), (0, 0))
+
+        # A crashed run that inserted rows but never advanced the template is repaired
+        RecurringTransaction.objects.filter(pk=weekly.pk).update(next_due_date=date(2026, 1, 1))
+        materialize_due_transactions(today=date(2026, 1, 29), batch_size=2)
+        self.assertEqual(len(self.dates(weekly)), 5)
+        generated = weekly.transactions.get(date=date(2026, 1, 8))
+        self.assertEqual((generated.company, generated.category, generated.tax_year), (self.company, self.category, 2025))
+
+    def test_end_date_deactivates(self):
+        template = self.template(RecurrenceFrequency.QUARTERLY, date(2025, 1, 15), end_date=date(2025, 9, 1))
+        call_command('materialize_recurring_transactions', '--date=2026-01-01', stdout=StringIO())
+        template.refresh_from_db()
+        self.assertEqual(self.dates(template), [date(2025, 1, 15), date(2025, 4, 15), date(2025, 7, 15)])
+        self.assertFalse(template.is_active)
+
+
+class RecurringTransactionWorkerTest(TransactionTestCase):
+    def setUp(self):
+        company = Company.objects.create(name="Test Company")
+        category = FinancialCategory.objects.get(name="Rental Income", category_type=CategoryType.INCOME, company=company)
+        self.templates = [
+            RecurringTransaction.objects.create(
+                transaction_type=TransactionType.INCOME, property_type=PropertyType.UNIT, property_id=pk,
+                company=company, amount=1000, category=category, frequency=RecurrenceFrequency.MONTHLY,
+                start_date=date(2026, 1, 1), next_due_date=date(2026, 1, 1),
+            )
+            for pk in range(3)
+        ]
+
+    def test_locked_templates_are_skipped(self):
+        locked, released = threading.Event(), threading.Event()
+
+        def other_worker():
+            with transaction.atomic():
+                list(RecurringTransaction.objects.select_for_update().filter(pk=self.templates[0].pk))
+                locked.set()
+                released.wait(10)
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        locked.wait(10)
+        try:
+            stats = materialize_due_transactions(today=date(2026, 3, 1), batch_size=1)
+        finally:
+            released.set()
+            thread.join()
+        self.assertEqual((stats['templates'], stats['batches'], stats['transactions']), (2, 2, 6))
+        self.assertFalse(self.templates[0].transactions.exists())
+
+        # The skipped template is picked up by the next run
+        stats = materialize_due_transactions(today=date(2026, 3, 1))
+        self.assertEqual(stats['templates'], 1)
+        self.assertEqual(FinancialTransaction.objects.filter(recurring_transaction__isnull=False).count(), 9)
+
+    def test_failed_batch_is_rolled_back(self):
+        with mock.patch.object(FinancialTransaction.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                materialize_due_transactions(today=date(2026, 3, 1))
+        self.assertEqual(RecurringTransaction.objects.filter(next_due_date=date(2026, 1, 1)).count(), 3)
+
+        stats = materialize_due_transactions(today=date(2026, 3, 1))
+        self.assertEqual(stats['transactions'], 9)
+
+
+def create_purchase(company, property_type, property_id):
+    return PropertyPurchase.objects.create(
+        property_type=property_type, property_id=property_id, company=company,
+        purchase_date=date(2020, 1, 1), purchase_price=1_000_000, transfer_duty=0, vat_amount=0,
+        bond_registration_cost=0, transfer_cost=0, conveyancing_fees=0, deeds_office_fees=0,
+        down_payment=100_000, financing_amount=900_000, bond_registration_fee=0, bond_initiation_fee=0,
+        municipal_rates_clearance=0, levy_clearance=0, occupational_rent=0, initial_repair_costs=0,
+    )
+
+
+class CashFlowForecastTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company)
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=self.estate, company=self.company
+        )
+        self.unit = Unit.objects.create(building=self.building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT)
+        self.other_unit = Unit.objects.create(
+            building=Building.objects.create(name="Elsewhere", company=self.company),
+            company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT,
+        )
+        self.rent = self.template(self.unit, "Rental Income", CategoryType.INCOME, TransactionType.INCOME, 1000)
+        self.template(
+            self.other_unit, "Rental Income", CategoryType.INCOME, TransactionType.INCOME, 500,
+            frequency=RecurrenceFrequency.WEEKLY, start_date=date(2026, 1, 5),
+        )
+        purchase = create_purchase(self.company, PropertyType.BUILDING, self.building.pk)
+        PropertyBond.objects.create(
+            property_purchase=purchase, company=self.company, lender="Bank", bond_amount=900_000,
+            start_date=date(2020, 1, 1), term_years=20, current_interest_rate=11, monthly_payment=9000, payment_day=1,
+        )
+        BodyCorporate.objects.create(
+            property_type=PropertyType.UNIT, property_id=self.unit.pk, company=self.company, name="Green Park BC",
+            monthly_levy=800, special_levy=200, special_levy_end_date=date(2026, 2, 28), payment_day=15,
+        )
+
+    def template(self, unit, category, category_type, transaction_type, amount, frequency=RecurrenceFrequency.MONTHLY,
+                 start_date=date(2025, 1, 31)):
+        return RecurringTransaction.objects.create(
+            transaction_type=transaction_type, property_type=PropertyType.UNIT, property_id=unit.pk,
+            company=self.company, amount=amount, frequency=frequency, start_date=start_date, next_due_date=start_date,
+            category=FinancialCategory.objects.get(name=category, category_type=category_type, company=self.company),
+        )
+
+    def category(self, result, name):
+        return next(row['amounts'] for row in result['categories'] if row['name'] == name)
+
+    def test_company_forecast(self):
+        result = forecast(self.company, months=4, today=date(2026, 1, 10))
+        self.assertEqual(result['months'], [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1)])
+        # Monthly rent on the 31st clamps to month end; weekly rent has 4 or 5 Mondays a month from the 12th
+        self.assertEqual(self.category(result, "Rental Income"), [1000 + 3 * 500, 1000 + 4 * 500, 1000 + 5 * 500, 1000 + 4 * 500])
+        # The January bond payment on the 1st is already past
+        self.assertEqual(self.category(result, "Bond Repayment"), [0, -9000, -9000, -9000])
+        self.assertEqual(self.category(result, "Body Corporate Levy"), [-800] * 4)
+        self.assertEqual(self.category(result, "Special Levy"), [-200, -200, 0, 0])
+        self.assertEqual(result['expenses'][1], 10000)
+        self.assertEqual(result['net'][0], 2500 - 1000)
+
+    def test_scopes(self):
+        unit_result = forecast(self.company, scope=self.unit, months=3, today=date(2026, 1, 10))
+        self.assertEqual({row['name'] for row in unit_result['categories']}, {"Rental Income", "Body Corporate Levy", "Special Levy"})
+        self.assertEqual(self.category(unit_result, "Rental Income"), [1000] * 3)
+
+        estate_result = forecast(self.company, scope=self.estate, months=3, today=date(2026, 1, 10))
+        self.assertIn("Bond Repayment", {row['name'] for row in estate_result['categories']})
+        self.assertEqual(self.category(estate_result, "Rental Income"), [1000] * 3)
+
+    def test_end_date_and_templated_bonds(self):
+        self.rent.end_date = date(2026, 2, 1)
+        self.rent.save()
+        result = forecast(self.company, scope=self.unit, months=3, today=date(2026, 1, 10))
+        self.assertEqual(self.category(result, "Rental Income"), [1000, 0, 0])
+
+        # A levy with its own template is not counted twice
+        levy = RecurringTransaction.objects.create(
+            transaction_type=TransactionType.EXPENSE, property_type=PropertyType.UNIT, property_id=self.unit.pk,
+            company=self.company, amount=850, frequency=RecurrenceFrequency.MONTHLY,
+            start_date=date(2026, 1, 20), next_due_date=date(2026, 1, 20), body_corporate=BodyCorporate.objects.get(),
+            category=FinancialCategory.objects.get(name="Body Corporate Levy", category_type=CategoryType.EXPENSE, company=self.company),
+        )
+        result = forecast(self.company, scope=self.unit, months=3, today=date(2026, 1, 10))
+        self.assertEqual(self.category(result, "Body Corporate Levy"), [-850] * 3)
+        self.assertNotIn("Special Levy", {row['name'] for row in result['categories']})
+        levy.delete()
+
+    def test_cached_until_templates_change(self):
+        first = forecast(self.company, months=12, today=date(2026, 1, 10))
+        RecurringTransaction.objects.filter(pk=self.rent.pk).update(amount=5000)
+        self.assertEqual(forecast(self.company, months=12, today=date(2026, 1, 10)), first)
+        self.rent.refresh_from_db()
+        self.rent.save()
+        self.assertNotEqual(forecast(self.company, months=12, today=date(2026, 1, 10)), first)
+
+    def test_horizon_limits(self):
+        with self.assertRaises(ValueError):
+            forecast(self.company, months=61)
+        self.assertEqual(len(forecast(self.company, months=60)['net']), 60)
+
+    def test_view(self):
+        user = UserFactory(email_verified=True)
+        self.company.users.add(user)
+        client = Client()
+        client.force_login(user)
+        url = reverse('finances:forecast')
+        response = client.get(url, {'months': 24, 'property_type': PropertyType.UNIT, 'property_id': self.unit.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['months']), 24)
+        self.assertEqual(client.get(url, {'months': 100}).status_code, 400)
+        self.assertEqual(client.get(url, {'property_type': PropertyType.UNIT, 'property_id': 0}).status_code, 404)
+
+
+class BondAmortizationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.purchase = create_purchase(self.company, PropertyType.UNIT, 1)
+
+    def bond(self, **values):
+        values = {
+            'bond_amount': 1_000_000, 'start_date': date(2020, 1, 10), 'term_years': 20,
+            'current_interest_rate': 12, 'prime_linked': False, 'monthly_payment': 11_010.86, 'payment_day': 1,
+            **values,
+        }
+        return PropertyBond.objects.create(property_purchase=self.purchase, company=self.company, lender="Bank", **values)
+
+    def test_fixed_rate_schedule(self):
+        schedule = self.bond().amortization_schedule()
+        rows = schedule.rows()
+        self.assertEqual(len(rows), 240)
+        self.assertEqual(rows[0]['date'], date(2020, 2, 1))
+        self.assertEqual((rows[0]['interest'], rows[0]['payment']), (10000.0, 11010.86))
+        self.assertAlmostEqual(rows[-1]['closing'], 0, places=2)
+        self.assertAlmostEqual(float(schedule.capital.sum()), 1_000_000, places=2)
+
+    def test_prime_rate_changes(self):
+        PrimeRate.objects.create(effective_date=date(2019, 1, 1), rate=10)
+        bond = self.bond(prime_linked=True, prime_rate_margin=1)
+        before = bond.amortization_schedule().rows()
+        self.assertEqual(before[0]['rate'], 11)
+
+        # A new prime rate replaces the cached schedule from its effective date on
+        PrimeRate.objects.create(effective_date=date(2023, 5, 26), rate=12)
+        after = bond.amortization_schedule().rows()
+        self.assertEqual(after[39]['date'], date(2023, 5, 1))
+        self.assertEqual(after[39], before[39])
+        self.assertEqual(after[40]['rate'], 13)
+        self.assertGreater(after[40]['payment'], before[40]['payment'])
+        self.assertAlmostEqual(after[-1]['closing'], 0, places=2)
+
+    def test_payment_holiday(self):
+        bond = self.bond(
+            has_payment_holiday=True, payment_holiday_start_date=date(2021, 1, 1), payment_holiday_end_date=date(2021, 3, 31)
+        )
+        rows = bond.amortization_schedule().rows()
+        holiday = [row for row in rows if date(2021, 1, 1) <= row['date'] <= date(2021, 3, 31)]
+        self.assertEqual([row['payment'] for row in holiday], [0, 0, 0])
+        self.assertGreater(holiday[-1]['closing'], holiday[0]['opening'])
+        self.assertGreater(rows[15]['payment'], rows[0]['payment'])
+        self.assertAlmostEqual(rows[-1]['closing'], 0, places=2)
+
+    def test_balance_as_of(self):
+        bond = self.bond()
+        schedule = bond.amortization_schedule()
+        self.assertEqual(bond.outstanding_balance(date(2020, 1, 31)), Decimal('1000000.00'))
+        self.assertEqual(bond.outstanding_balance(date(2020, 2, 1)), Decimal('998989.14'))
+        self.assertEqual(bond.outstanding_balance(date(2045, 1, 1)), Decimal('0.00'))
+        split = schedule.split(date(2020, 3, 1), date(2021, 2, 28))
+        self.assertAlmostEqual(split['interest'] + split['capital'], split['payment'], delta=Decimal('0.01'))
+        self.assertEqual(split['payment'], Decimal('132130.34'))
+
+    def test_many_bonds_at_once(self):
+        bonds = [self.bond(term_years=term, current_interest_rate=rate) for term, rate in ((5, 9), (20, 12), (30, 0))]
+        schedules = simulate(bonds)
+        self.assertEqual([len(schedules[bond.pk]) for bond in bonds], [60, 240, 360])
+        self.assertAlmostEqual(schedules[bonds[2].pk].payment[0], 1_000_000 / 360)
+        for bond in bonds:
+            self.assertEqual(schedules[bond.pk].rows(), simulate([bond])[bond.pk].rows())
+
+    def test_schedule_cached_per_bond_version(self):
+        bond = self.bond()
+        first = bond.amortization_schedule()
+        PropertyBond.objects.filter(pk=bond.pk).update(current_interest_rate=5)
+        self.assertEqual(bond.amortization_schedule().rows(), first.rows())
+        bond.refresh_from_db()
+        bond.save()
+        self.assertNotEqual(bond.amortization_schedule().rows()[0]['rate'], first.rows()[0]['rate'])
+
+    def test_view(self):
+        user = UserFactory(email_verified=True)
+        self.company.users.add(user)
+        client = Client()
+        client.force_login(user)
+        bond = self.bond()
+        response = client.get(reverse('finances:bond-amortization', args=[bond.pk]), {'as_of': '2020-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['outstanding_balance'], '1000000.00')
+        self.assertEqual(len(response.json()['schedule']), 240)
+
+
+class BondPaymentSplitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.bond = PropertyBond.objects.create(
+            property_purchase=create_purchase(self.company, PropertyType.UNIT, 1), company=self.company, lender="Bank",
+            bond_amount=1_000_000, start_date=date(2020, 1, 10), term_years=20, current_interest_rate=12,
+            prime_linked=False, monthly_payment=11_010.86, payment_day=1,
+        )
+        self.repayments = FinancialCategory.objects.get(name="Bond Repayment", category_type=CategoryType.EXPENSE, company=self.company)
+
+    def pay(self, day, amount=11_010.86):
+        return FinancialTransaction.objects.create(
+            transaction_type=TransactionType.EXPENSE, property_type=PropertyType.UNIT, property_id=1,
+            company=self.company, amount=amount, category=self.repayments, date=day, property_bond=self.bond,
+        )
+
+    def test_recorded_payment_is_split(self):
+        payment = self.pay(date(2020, 2, 3))
+        payment.refresh_from_db()
+        interest = payment.interest_component
+        self.assertEqual(interest.amount.amount, Decimal('10000.00'))
+        self.assertEqual(payment.amount.amount, Decimal('1010.86'))
+        self.assertEqual(payment.bond_component, BondComponent.CAPITAL)
+        self.assertEqual(interest.category.name, "Bond Interest")
+        self.assertTrue(interest.is_tax_deductible)
+
+        # Saving the split payment again does not split it twice
+        payment.save()
+        self.assertEqual(FinancialTransaction.objects.filter(bond_component=BondComponent.INTEREST).count(), 1)
+
+    def test_interest_is_capped_at_amount_paid(self):
+        payment = self.pay(date(2020, 2, 3), amount=500)
+        payment.refresh_from_db()
+        self.assertEqual(payment.interest_component.amount.amount, Decimal('500.00'))
+        self.assertEqual(payment.amount.amount, 0)
+
+    def test_backfill_in_one_pass(self):
+        FinancialTransaction.objects.bulk_create([
+            FinancialTransaction(
+                transaction_type=TransactionType.EXPENSE, property_type=PropertyType.UNIT, property_id=1,
+                company=self.company, amount=11_010.86, category=self.repayments, date=date(2020, month, 1),
+                property_bond=self.bond,
+            )
+            for month in range(2, 13)
+        ])
+        with self.assertNumQueries(11):
+            self.assertEqual(split_pending(), 11)
+        call_command('split_bond_payments', stdout=StringIO())
+        interest = FinancialTransaction.objects.filter(bond_component=BondComponent.INTEREST).order_by('date')
+        self.assertEqual(interest.count(), 11)
+        self.assertGreater(interest.first().amount, interest.last().amount)
+
+    def test_recurring_repayments_are_split(self):
+        RecurringTransaction.objects.create(
+            transaction_type=TransactionType.EXPENSE, property_type=PropertyType.UNIT, property_id=1,
+            company=self.company, amount=11_010.86, category=self.repayments, frequency=RecurrenceFrequency.MONTHLY,
+            start_date=date(2020, 2, 1), next_due_date=date(2020, 2, 1), property_bond=self.bond,
+        )
+        materialize_due_transactions(today=date(2020, 4, 30))
+        capital = FinancialTransaction.objects.filter(bond_component=BondComponent.CAPITAL)
+        self.assertEqual(capital.count(), 3)
+        for payment in capital:
+            self.assertEqual(payment.amount + payment.interest_component.amount, Money(Decimal('11010.86'), payment.amount.currency))
+
+
+class StressTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.purchase = create_purchase(self.company, PropertyType.UNIT, 1)
+        building = Building.objects.create(name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company)
+        for number in range(4):
+            Unit.objects.create(
+                building=building, company=self.company, number=str(number), unit_type=UnitTypeEnums.APARTMENT,
+                base_rent=5000, is_vacant=number == 0,
+            )
+
+    def bond(self, **values):
+        values = {
+            'bond_amount': 1_000_000, 'start_date': date(2020, 1, 10), 'term_years': 20,
+            'current_interest_rate': 12, 'prime_linked': False, 'interest_rate_type': InterestRateType.FIXED, 'monthly_payment': 11_010.86, 'payment_day': 1,
+            **values,
+        }
+        return PropertyBond.objects.create(property_purchase=self.purchase, company=self.company, lender="Bank", **values)
+
+    def run_test(self, **options):
+        return stress_test(self.company, paths=600, months=24, seed=1, workers=1, today=date(2020, 1, 31), **options)
+
+    def test_fixed_rate_bonds(self):
+        self.bond()
+        result = self.run_test()
+        self.assertEqual((result['bonds'], result['floating_bonds']), (1, 0))
+        self.assertEqual(result['outstanding_balance'], 1_000_000)
+        self.assertEqual((result['monthly_rent'], result['vacancy']), (20000, 0.25))
+        for percentile in (5, 50, 95):
+            self.assertAlmostEqual(result['debt_service'][percentile][0], 11010.86, places=2)
+        self.assertEqual(result['shortfall_probability'], 0)
+        self.assertAlmostEqual(result['dscr'][50][0], 15000 / 11010.86, delta=0.1)
+
+    def test_floating_bonds_follow_prime(self):
+        self.bond(interest_rate_type=InterestRateType.VARIABLE)
+        result = self.run_test(volatility=3)
+        self.assertEqual(result['floating_bonds'], 1)
+        low, high = result['debt_service'][5][-1], result['debt_service'][95][-1]
+        self.assertLess(low, 11010.86)
+        self.assertGreater(high, 11010.86)
+        self.assertEqual(self.run_test(volatility=3)['debt_service'], result['debt_service'])
+
+    def test_shortfall(self):
+        self.bond(bond_amount=2_000_000, prime_linked=True, monthly_payment=22_021.72)
+        result = self.run_test(drift=2)
+        self.assertGreater(result['shortfall_probability'], 0.5)
+        self.assertGreater(result['worst_shortfall'][50], 0)
+        self.assertLess(result['lowest_dscr'][50], 1)
+
+    def test_command(self):
+        self.bond()
+        out = StringIO()
+        call_command('stress_test_bonds', str(self.company.pk), '--paths=100', '--months=6', '--workers=1', '--seed=1', stdout=out)
+        self.assertIn("1 bonds (0 floating)", out.getvalue())
+        self.assertIn("Shortfall in 0.0% of 100 paths", out.getvalue())
+
+
+class MonthlySummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.rent = FinancialCategory.objects.get(name="Rental Income", category_type=CategoryType.INCOME, company=self.company)
+        self.repairs = FinancialCategory.objects.get(name="Repairs", category_type=CategoryType.EXPENSE, company=self.company)
+
+    def record(self, day, amount, category=None, transaction_type=TransactionType.INCOME, property_id=1, **values):
+        return FinancialTransaction.objects.create(
+            transaction_type=transaction_type, property_type=PropertyType.UNIT, property_id=property_id,
+            company=self.company, amount=amount, category=category or self.rent, date=day, **values,
+        )
+
+    def cells(self):
+        return sorted(
+            (row['month'], row['category_id'], row['property_id'], row['amount'], row['vat_amount'], row['transaction_count'])
+            for row in MonthlySummary.objects.values()
+        )
+
+    def assertMatchesLedger(self):
+        incremental = self.cells()
+        MonthlySummary.objects.rebuild()
+        self.assertEqual(incremental, self.cells())
+
+    def test_create_update_delete(self):
+        first = self.record(date(2024, 3, 5), 1000, vat_amount=150)
+        self.record(date(2024, 3, 20), 500)
+        self.assertEqual(self.cells(), [(date(2024, 3, 1), self.rent.pk, 1, Decimal('1500.00'), Decimal('150.00'), 2)])
+
+        # Moving a transaction to another month and category moves its amounts with it
+        first.date = date(2024, 4, 1)
+        first.category = self.repairs
+        first.transaction_type = TransactionType.EXPENSE
+        first.save()
+        self.assertEqual(self.cells(), [
+            (date(2024, 3, 1), self.rent.pk, 1, Decimal('500.00'), Decimal('0.00'), 1),
+            (date(2024, 4, 1), self.repairs.pk, 1, Decimal('1000.00'), Decimal('150.00'), 1),
+        ])
+        self.assertMatchesLedger()
+
+        # Emptied cells are dropped
+        FinancialTransaction.objects.get(pk=first.pk).delete()
+        self.assertEqual(len(self.cells()), 1)
+        self.assertMatchesLedger()
+
+    def test_deferred_instance_update(self):
+        transaction_ = self.record(date(2024, 3, 5), 1000)
+        loaded = FinancialTransaction.objects.defer('date', 'property_id').get(pk=transaction_.pk)
+        loaded.amount = 700
+        loaded.property_id = 2
+        loaded.save()
+        self.assertEqual(self.cells(), [(date(2024, 3, 1), self.rent.pk, 2, Decimal('700.00'), Decimal('0.00'), 1)])
+
+    def test_bulk_writers_keep_summary_current(self):
+        RecurringTransaction.objects.create(
+            transaction_type=TransactionType.INCOME, property_type=PropertyType.UNIT, property_id=1,
+            company=self.company, amount=1000, category=self.rent, frequency=RecurrenceFrequency.MONTHLY,
+            start_date=date(2024, 1, 1), next_due_date=date(2024, 1, 1),
+        )
+        materialize_due_transactions(today=date(2024, 3, 31))
+        bond = PropertyBond.objects.create(
+            property_purchase=create_purchase(self.company, PropertyType.UNIT, 1), company=self.company, lender="Bank",
+            bond_amount=1_000_000, start_date=date(2024, 1, 10), term_years=20, current_interest_rate=12,
+            prime_linked=False, monthly_payment=11_010.86, payment_day=1,
+        )
+        repayments = FinancialCategory.objects.get(name="Bond Repayment", category_type=CategoryType.EXPENSE, company=self.company)
+        payment = self.record(
+            date(2024, 2, 1), 11_010.86, category=repayments, transaction_type=TransactionType.EXPENSE, property_bond=bond
+        )
+        self.assertEqual(len(self.cells()), 5)
+        self.assertMatchesLedger()
+
+        # Saving the payment again keeps its capital amount
+        payment.save()
+        payment.refresh_from_db()
+        self.assertEqual(payment.amount.amount, Decimal('1010.86'))
+        self.assertMatchesLedger()
+
+    def test_rebuild_command(self):
+        self.record(date(2024, 3, 5), 1000)
+        MonthlySummary.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_monthly_summaries', stdout=out)
+        self.assertIn("Rebuilt 1 monthly summaries", out.getvalue())
+
+    def test_profit_and_loss_view(self):
+        estate = Estate.objects.create(name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company)
+        building = Building.objects.create(name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=estate, company=self.company)
+        unit = Unit.objects.create(building=building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT)
+        self.record(date(2024, 3, 5), 1000, property_id=unit.pk)
+        self.record(date(2024, 3, 9), 300, category=self.repairs, transaction_type=TransactionType.EXPENSE, property_id=unit.pk)
+        self.record(date(2024, 4, 5), 800, property_id=unit.pk + 1000)
+
+        user = UserFactory(email_verified=True)
+        self.company.users.add(user)
+        client = Client()
+        client.force_login(user)
+        url = reverse('finances:profit-and-loss')
+        with self.assertNumQueries(9):
+            response = client.get(url, {'start': '2024-01', 'end': '2024-06', 'property_type': PropertyType.ESTATE, 'property_id': estate.pk})
+        self.assertEqual(response.status_code, 200)
+        months = response.json()['months']
+        self.assertEqual(len(months), 1)
+        self.assertEqual((months[0]['income'], months[0]['expenses'], months[0]['net']), ('1000.00', '300.00', '700.00'))
+
+        months = client.get(url, {'start': '2024-01', 'end': '2024-06'}).json()['months']
+        self.assertEqual([month['month'] for month in months], ['2024-03-01', '2024-04-01'])
+        self.assertEqual(client.get(url, {'start': 'March'}).status_code, 400)
+
+
+class TaxYearReportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        self.rent = FinancialCategory.objects.get(name="Rental Income", category_type=CategoryType.INCOME, company=self.company)
+        self.repairs = FinancialCategory.objects.get(name="Repairs", category_type=CategoryType.EXPENSE, company=self.company)
+        self.repayments = FinancialCategory.objects.get(name="Bond Repayment", category_type=CategoryType.EXPENSE, company=self.company)
+
+        self.record(date(2024, 2, 29), 900, self.rent)
+        self.record(date(2024, 3, 1), 1000, self.rent, vat_amount=130)
+        self.record(date(2025, 2, 28), 1000, self.rent, property_id=2, vat_amount=130)
+        self.repair = self.record(date(2024, 6, 1), 400, self.repairs, TransactionType.EXPENSE, vat_amount=52)
+        self.record(date(2024, 7, 1), 5000, self.repayments, TransactionType.EXPENSE)
+        self.record(date(2024, 8, 1), 300, self.repayments, TransactionType.EXPENSE, is_tax_deductible=True)
+
+    def record(self, day, amount, category, transaction_type=TransactionType.INCOME, property_id=1, **values):
+        return FinancialTransaction.objects.create(
+            transaction_type=transaction_type, property_type=PropertyType.UNIT, property_id=property_id,
+            company=self.company, amount=amount, category=category, date=day, **values,
+        )
+
+    def test_report(self):
+        with self.assertNumQueries(1):
+            earlier, report = tax_reports(self.company, [2024, 2023])
+        self.assertEqual((earlier['tax_year'], earlier['income']['total']), (2023, Decimal('900.00')))
+        self.assertEqual((report['start'], report['end']), (date(2024, 3, 1), date(2025, 2, 28)))
+        self.assertEqual(report['income']['total'], Decimal('2000.00'))
+        self.assertEqual(
+            [(category['name'], category['amount']) for category in report['deductible_expenses']['categories']],
+            [("Bond Repayment", Decimal('300.00')), ("Repairs", Decimal('400.00'))],
+        )
+        self.assertEqual(report['non_deductible_expenses']['total'], Decimal('5000.00'))
+        self.assertEqual(report['taxable_income'], Decimal('1300.00'))
+        self.assertEqual(report['vat'], {'output': Decimal('260.00'), 'input': Decimal('52.00'), 'net': Decimal('208.00')})
+        self.assertEqual(
+            [(row['property_id'], row['income'], row['deductible_expenses']) for row in report['properties']],
+            [(1, Decimal('1000.00'), Decimal('700.00')), (2, Decimal('1000.00'), 0)],
+        )
+
+    def test_cached_per_tax_year(self):
+        tax_reports(self.company, [2023, 2024])
+        with self.assertNumQueries(0):
+            tax_reports(self.company, [2023, 2024])
+
+        # Moving a transaction between years recomputes both; other years stay cached
+        self.repair.date = date(2025, 3, 1)
+        self.repair.tax_year = 2025
+        self.repair.save()
+        with self.assertNumQueries(1):
+            reports = tax_reports(self.company, [2023, 2024, 2025])
+        self.assertEqual(reports[2]['deductible_expenses']['total'], Decimal('400.00'))
+        self.assertEqual(reports[1]['deductible_expenses']['total'], Decimal('300.00'))
+
+        # Deductibility comes from the category
+        self.repayments.is_tax_deductible = True
+        self.repayments.save()
+        self.assertEqual(tax_reports(self.company, [2024])[0]['deductible_expenses']['total'], Decimal('5300.00'))
+
+    def test_export(self):
+        user = UserFactory(email_verified=True)
+        self.company.users.add(user)
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('finances:tax-report'), {'years': '2023,2024', 'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "Tax Year,Section,Category,Property Type,Property ID,Amount,VAT,Transactions")
+        self.assertIn("2024,Taxable income,,,,1300.00,,", lines)
+
+        response = client.get(reverse('finances:tax-report'), {'years': '2024'})
+        self.assertEqual(response.json()['reports'][0]['income']['total'], '2000.00')
+        self.assertEqual(client.get(reverse('finances:tax-report'), {'years': 'last'}).status_code, 400)
+        for years in ('0', '9999', '2024,10000'):
+            self.assertEqual(client.get(reverse('finances:tax-report'), {'years': years}).status_code, 400)
+
+
+class PropertyReferenceTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company)
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=self.estate, company=self.company
+        )
+        self.unit = Unit.objects.create(building=self.building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT)
+        self.category = FinancialCategory.objects.get(
+            name="Rental Income", category_type=CategoryType.INCOME, company=self.company
+        )
+
+    def transaction(self, property_type, property_id, **values):
+        values = {'transaction_type': TransactionType.INCOME, 'category': self.category, **values}
+        return FinancialTransaction(
+            property_type=property_type, property_id=property_id, company=self.company, amount=100,
+            date=date(2024, 3, 1), **values,
+        )
+
+    def test_resolves_each_property_type(self):
+        for obj in (self.estate, self.building, self.unit):
+            transaction = self.transaction(property_type_for(obj), obj.pk)
+            with self.assertNumQueries(1):
+                self.assertEqual(transaction.property_object, obj)
+                self.assertEqual(transaction.get_property_object(), obj)
+
+    def test_missing_property(self):
+        self.assertIsNone(self.transaction(PropertyType.UNIT, self.unit.pk + 1000).property_object)
+        transaction = self.transaction(PropertyType.UNIT, self.unit.pk)
+        self.assertEqual(transaction.property_object, self.unit)
+        # Changing the columns drops the cached object
+        transaction.property_type, transaction.property_id = PropertyType.ESTATE, self.estate.pk
+        self.assertEqual(transaction.property_object, self.estate)
+        estate_id = self.estate.pk
+        self.estate.delete()
+        self.assertIsNone(self.transaction(PropertyType.ESTATE, estate_id).property_object)
+
+    def test_assignment_sets_both_columns(self):
+        transaction = self.transaction(PropertyType.ESTATE, self.estate.pk)
+        transaction.property_object = self.unit
+        self.assertEqual((transaction.property_type, transaction.property_id), (PropertyType.UNIT, self.unit.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(transaction.property_object, self.unit)
+        with self.assertRaises(TypeError):
+            transaction.property_object = self.company
+
+    def test_batched_resolution(self):
+        properties = [self.estate, self.building, self.unit]
+        FinancialTransaction.objects.bulk_create([
+            self.transaction(property_type_for(obj), obj.pk, description=str(index))
+            for index in range(500) for obj in properties
+        ] + [self.transaction(PropertyType.UNIT, self.unit.pk + 1000)])
+
+        # One query for the transactions and one per property type
+        with self.assertNumQueries(4):
+            transactions = list(FinancialTransaction.objects.filter(company=self.company).prefetch_properties())
+            resolved = [transaction.property_object for transaction in transactions]
+            # Buildings and units come with what their __str__ needs
+            names = [str(obj) for obj in resolved if obj is not None]
+        self.assertEqual(len(transactions), 1501)
+        self.assertEqual(resolved.count(None), 1)
+        self.assertEqual(len(names), 1500)
+
+        # The flag survives chaining
+        with self.assertNumQueries(2):
+            transaction = FinancialTransaction.objects.prefetch_properties().filter(property_type=PropertyType.UNIT).order_by('pk').first()
+        with self.assertNumQueries(4):
+            transactions = prefetch_properties(FinancialTransaction.objects.filter(company=self.company).order_by('pk')[:10])
+        self.assertEqual(transaction.property_object, self.unit)
+        with self.assertNumQueries(0):
+            [transaction.property_object for transaction in transactions]
+
+    def test_lookup_by_property(self):
+        self.transaction(PropertyType.UNIT, self.unit.pk).save()
+        expense = self.transaction(
+            PropertyType.UNIT, self.unit.pk, transaction_type=TransactionType.EXPENSE,
+            category=FinancialCategory.objects.get(name="Repairs", category_type=CategoryType.EXPENSE, company=self.company),
+        )
+        expense.save()
+        self.assertEqual(FinancialTransaction.get_transactions_for_property(self.unit).count(), 2)
+        self.assertEqual(list(FinancialTransaction.get_expenses_for_property(self.unit)), [expense])
+        self.assertEqual(FinancialTransaction.get_income_for_property(self.estate).count(), 0)
+
+
+class BankStatementImportTest(TestCase):
+    CSV = (
+        "Account,Cheque account 62 0001 2345\n"
+        "\n"
+        "Date,Description,Reference,Amount,Balance\n"
+        "2024-03-01,Opening balance,,0.00,1000.00\n"
+        "2024-03-01,RENT  J Smith,UNIT 1,\"8,500.00\",9500.00\n"
+        "2024-03-02,CITY OF CAPE TOWN,ACC 5550-1234-99,-1200.50,8299.50\n"
+        "2024-03-02,CARD PURCHASE HARDWARE,,-100.00,8199.50\n"
+        "2024-03-02,CARD PURCHASE HARDWARE,,-100.00,8099.50\n"
+        "2024-03-03,BOND PAYMENT,HL 800123456,-11010.86,-2911.36\n"
+        "2024-03-04,Unknown deposit,,250.00,-2661.36\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Test Company")
+        categories = FinancialCategory.objects.filter(company=self.company)
+        self.rent = categories.get(name="Rental Income", category_type=CategoryType.INCOME)
+        self.repairs = categories.get(name="Repairs", category_type=CategoryType.EXPENSE)
+        StatementRule.objects.create(
+            company=self.company, pattern=r"^RENT\b", category=self.rent, property_type=PropertyType.UNIT, property_id=1,
+        )
+        StatementRule.objects.create(
+            company=self.company, pattern="HARDWARE", category=self.repairs, property_type=PropertyType.BUILDING,
+            property_id=2, vendor="Hardware store",
+        )
+        self.municipal_account = MunicipalAccount.objects.create(
+            property_type=PropertyType.BUILDING, property_id=2, company=self.company, municipality="Cape Town",
+            account_number="555012 3499", account_holder="Test Company", billing_day=1, payment_day=7,
+        )
+        self.bond = PropertyBond.objects.create(
+            property_purchase=create_purchase(self.company, PropertyType.UNIT, 1), company=self.company, lender="Bank",
+            account_number="800123456", bond_amount=1_000_000, start_date=date(2024, 1, 10), term_years=20,
+            current_interest_rate=12, prime_linked=False, monthly_payment=11_010.86, payment_day=1,
+        )
+
+    def import_csv(self, text=None):
+        return import_statement(self.company, parse_statement(StringIO(text or self.CSV), name="march.csv"), source="march.csv")
+
+    def test_import(self):
+        stats = self.import_csv()
+        self.assertEqual((stats['lines'], stats['imported'], stats['skipped']), (7, 5, 1))
+        self.assertEqual([line.description for line in stats['unmatched']], ["UNKNOWN DEPOSIT"])
+
+        rent = FinancialTransaction.objects.get(category=self.rent)
+        self.assertEqual((rent.transaction_type, rent.amount.amount, rent.property_type), (TransactionType.INCOME, Decimal('8500.00'), PropertyType.UNIT))
+        self.assertEqual((rent.description, rent.reference_number, rent.tax_year), ("RENT J SMITH", "UNIT 1", 2024))
+
+        rates = FinancialTransaction.objects.get(municipal_account=self.municipal_account)
+        self.assertEqual((rates.category.name, rates.amount.amount, rates.property_id), ("Municipal Rates", Decimal('1200.50'), 2))
+
+        # Two identical card payments on one day are both kept
+        self.assertEqual(FinancialTransaction.objects.filter(category=self.repairs, vendor="Hardware store").count(), 2)
+
+        # The bond repayment is split into interest and capital
+        payment = FinancialTransaction.objects.get(property_bond=self.bond, bond_component=BondComponent.CAPITAL)
+        self.assertEqual(payment.category.name, "Bond Repayment")
+        self.assertTrue(payment.interest_component)
+
+        cells = MonthlySummary.objects.filter(company=self.company)
+        self.assertEqual(sum(cell.transaction_count for cell in cells), 6)
+        self.assertEqual(cells.get(category=self.repairs).amount, Decimal('200.00'))
+
+    def test_reimport_is_idempotent(self):
+        self.import_csv()
+        count = FinancialTransaction.objects.count()
+        summary = list(MonthlySummary.objects.values_list('category_id', 'amount', 'transaction_count').order_by('pk'))
+
+        # The same statement again, and a later one repeating its last lines
+        stats = self.import_csv()
+        self.assertEqual((stats['imported'], stats['duplicates']), (0, 5))
+        later = self.CSV.split("\n")
+        stats = self.import_csv("\n".join(later[2:3] + later[6:] + ["2024-03-05,CARD PURCHASE HARDWARE,,-100.00,0"]))
+        self.assertEqual((stats['imported'], stats['duplicates']), (1, 3))
+        self.assertEqual(FinancialTransaction.objects.count(), count + 1)
+        self.assertEqual(MonthlySummary.objects.get(category=self.repairs).transaction_count, 3)
+        self.assertEqual(
+            list(MonthlySummary.objects.exclude(category=self.repairs).values_list('category_id', 'amount', 'transaction_count').order_by('pk')),
+            [row for row in summary if row[0] != self.repairs.pk],
+        )
+
+    def test_ofx(self):
+        ofx = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKACCTFROM><BANKID>250655<ACCTID>62-0001-2345<ACCTTYPE>CHECKING</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240301120000[+2:SAST]<TRNAMT>8500.00<FITID>A1<NAME>RENT J SMITH &amp; CO</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240302<TRNAMT>-100.00<FITID>A2<NAME>CARD PURCHASE<MEMO>HARDWARE</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240302<TRNAMT>-100.00<FITID>A2<NAME>CARD PURCHASE<MEMO>HARDWARE</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+        lines = list(parse_statement(StringIO(ofx), name="march.ofx"))
+        self.assertEqual(lines[0].date, date(2024, 3, 1))
+        self.assertEqual((lines[0].account, lines[0].bank_id, lines[0].description), ("6200012345", "A1", "RENT J SMITH & CO"))
+        self.assertEqual(lines[1].description, "CARD PURCHASE HARDWARE")
+
+        # A bank id listed twice is one line
+        stats = import_statement(self.company, lines)
+        self.assertEqual((stats['imported'], stats['duplicates']), (2, 1))
+        stats = import_statement(self.company, parse_statement(StringIO(ofx), name="march.ofx"))
+        self.assertEqual(stats['imported'], 0)
+
+    def test_debit_and_credit_columns(self):
+        text = "Posting Date,Narrative,Debit,Credit\n01/03/2024,Rent unit 1,,R1 000.00\n02/03/2024,Hardware,(50.00),\n"
+        lines = list(parse_statement(StringIO(text)))
+        self.assertEqual([(line.date, line.amount) for line in lines], [
+            (date(2024, 3, 1), Decimal('1000.00')), (date(2024, 3, 2), Decimal('-50.00')),
+        ])
+
+    def test_invalid_lines(self):
+        with self.assertRaisesMessage(StatementError, "Line 2"):
+            list(parse_statement(StringIO("Date,Amount\n2024-13-45,10\n")))
+        with self.assertRaises(StatementError):
+            list(parse_statement(StringIO("Date,Amount\n2024-03-01,ten\n")))
+        with self.assertRaises(StatementError):
+            list(parse_statement(StringIO("no,header\n")))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path, unmatched_path = os.path.join(directory, "march.csv"), os.path.join(directory, "unmatched.csv")
+            with open(path, "w") as statement:
+                statement.write(self.CSV)
+            output = StringIO()
+            call_command('import_bank_statement', self.company.pk, path, f"--unmatched={unmatched_path}", stdout=output)
+            self.assertIn("imported 5 of 7 lines", output.getvalue())
+            with open(unmatched_path) as unmatched:
+                self.assertIn("UNKNOWN DEPOSIT", unmatched.read())
@@ -0,0 +1,13 @@
+from django.urls import path
+from myrealestate.finances.views import FinancialTransactionExportView, CashFlowForecastView, ProfitAndLossView, TaxYearReportView, BondAmortizationView
+
+
+app_name = "finances"
+
+urlpatterns = [
+    path("transactions/export/", FinancialTransactionExportView.as_view(), name="export-transactions"),
+    path("forecast/", CashFlowForecastView.as_view(), name="forecast"),
+    path("profit-and-loss/", ProfitAndLossView.as_view(), name="profit-and-loss"),
+    path("tax-report/", TaxYearReportView.as_view(), name="tax-report"),
+    path("bonds/<int:pk>/amortization/", BondAmortizationView.as_view(), name="bond-amortization"),
+]
@@ -1,7 +1,11 @@
+from decimal import Decimal
+
 from .models import FinancialCategory
 from myrealestate.companies.models import Company
 from .models.enums import CategoryType
 
+# Quantum for rounding money to whole cents
+CENT = Decimal('0.01')
 
 
 def create_default_financial_categories(company: Company):
@@ -1,3 +1,169 @@
-from django.shortcuts import render
+from datetime import MAXYEAR, MINYEAR, date
 
-# Create your views here.
+from dateutil.relativedelta import relativedelta
+from django.http import JsonResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from myrealestate.common.exports import csv_response, xlsx_response
+from myrealestate.common.mixins import CompanyRequiredMixin
+from myrealestate.common.views import BaseListView, ExportMixin, CompanyViewMixin
+from myrealestate.properties.models import Estate, Building, Unit
+from .amortization import schedule_for
+from .forecast import DEFAULT_MONTHS, MAX_MONTHS, forecast, scope_members
+from .models import FinancialTransaction, MonthlySummary, PropertyBond, PropertyType
+from .tax_report import EXPORT_HEADERS, current_tax_year, export_rows, tax_reports
+
+
+class FinancialTransactionExportView(ExportMixin, BaseListView):
+    model = FinancialTransaction
+    ordering = "-date"
+    search_fields = ["description", "vendor", "reference_number", "category__name"]
+    export_fields = (
+        ('Date', 'date'),
+        ('Type', 'transaction_type'),
+        ('Category', 'category__name'),
+        ('Property Type', 'property_type'),
+        ('Property ID', 'property_id'),
+        ('Amount', 'amount'),
+        ('Currency', 'amount_currency'),
+        ('VAT', 'vat_amount'),
+        ('Includes VAT', 'includes_vat'),
+        ('Payment Method', 'payment_method'),
+        ('Reference', 'reference_number'),
+        ('Vendor', 'vendor'),
+        ('Paid', 'is_paid'),
+        ('Payment Date', 'payment_date'),
+        ('Tax Year', 'tax_year'),
+        ('Description', 'description'),
+    )
+
+
+class PropertyScopeMixin:
+    """Reads an optional estate, building or unit scope from the property_type and property_id parameters"""
+    scope_models = {
+        PropertyType.ESTATE: Estate,
+        PropertyType.BUILDING: Building,
+        PropertyType.UNIT: Unit,
+    }
+
+    def get_scope(self, company):
+        """The requested property of `company`, or None for the whole company. Raises ValueError for a malformed id."""
+        property_type = self.request.GET.get('property_type')
+        if not property_type:
+            return None
+        if property_type not in self.scope_models:
+            raise Http404("Unknown property type")
+        if not self.request.GET.get('property_id', '').isdigit():
+            raise ValueError("property_id must be a number")
+        return get_object_or_404(self.scope_models[property_type], pk=self.request.GET['property_id'], company=company)
+
+
+class CashFlowForecastView(PropertyScopeMixin, CompanyRequiredMixin, CompanyViewMixin, View):
+    """Projected monthly cash flow of the company, or of one estate, building or unit"""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            months = int(request.GET.get('months', DEFAULT_MONTHS))
+        except ValueError:
+            return JsonResponse({"error": "months must be a number"}, status=400)
+        if not 1 <= months <= MAX_MONTHS:
+            return JsonResponse({"error": f"months must be between 1 and {MAX_MONTHS}"}, status=400)
+
+        company = self.get_company()
+        try:
+            scope = self.get_scope(company)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        result = forecast(company, scope=scope, months=months)
+        return JsonResponse({
+            "property_type": request.GET.get('property_type') or None,
+            "property_id": scope.pk if scope else None,
+            **result,
+        })
+
+
+class ProfitAndLossView(PropertyScopeMixin, CompanyRequiredMixin, CompanyViewMixin, View):
+    """
+    Monthly income and expenses of the company, or of one estate, building or unit,
+    between the `start` and `end` months (YYYY-MM, the last 12 months by default).
+    Read from the monthly summary, never from the ledger.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            end = _month(request.GET.get('end')) or date.today().replace(day=1)
+            start = _month(request.GET.get('start')) or (end - relativedelta(months=11))
+        except ValueError:
+            return JsonResponse({"error": "start and end must be months (YYYY-MM)"}, status=400)
+        if start > end:
+            return JsonResponse({"error": "start must not be after end"}, status=400)
+
+        company = self.get_company()
+        try:
+            scope = self.get_scope(company)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        result = MonthlySummary.objects.profit_and_loss(company, start, end, members=scope_members(scope))
+        return JsonResponse({
+            "property_type": request.GET.get('property_type') or None,
+            "property_id": scope.pk if scope else None,
+            "start": start,
+            "end": end,
+            **result,
+        })
+
+
+class TaxYearReportView(CompanyRequiredMixin, CompanyViewMixin, View):
+    """
+    Tax-year report of the company for one or more tax years (?years=2023,2024, the
+    current one by default), as JSON or streamed as CSV or XLSX (?format=csv|xlsx)
+    """
+    max_years = 10
+
+    def get(self, request, *args, **kwargs):
+        try:
+            years = [int(year) for year in request.GET.get('years', '').split(',') if year.strip()]
+            # A tax year ends in the next calendar year, which date() must still support
+            if not all(MINYEAR < year < MAXYEAR for year in years):
+                raise ValueError(years)
+        except ValueError:
+            return JsonResponse({"error": "years must be a comma separated list of tax years"}, status=400)
+        years = years or [current_tax_year()]
+        if len(set(years)) > self.max_years:
+            return JsonResponse({"error": f"At most {self.max_years} tax years per report"}, status=400)
+
+        company = self.get_company()
+        reports = tax_reports(company, years)
+        export_format = request.GET.get('format')
+        if export_format in ('csv', 'xlsx'):
+            filename = f"tax-report-{'-'.join(str(report['tax_year']) for report in reports)}.{export_format}"
+            if export_format == 'xlsx':
+                return xlsx_response(EXPORT_HEADERS, export_rows(reports), filename, sheet_title="Tax report")
+            return csv_response(EXPORT_HEADERS, export_rows(reports), filename)
+        return JsonResponse({"reports": reports})
+
+
+def _month(value):
+    return date.fromisoformat(f"{value}-01") if value else None
+
+
+class BondAmortizationView(CompanyRequiredMixin, CompanyViewMixin, View):
+    """A bond's amortization schedule and its outstanding balance on a date"""
+
+    def get(self, request, *args, **kwargs):
+        bond = get_object_or_404(PropertyBond, pk=kwargs['pk'], company=self.get_company())
+        try:
+            as_of = date.fromisoformat(request.GET['as_of']) if request.GET.get('as_of') else date.today()
+        except ValueError:
+            return JsonResponse({"error": "as_of must be a date (YYYY-MM-DD)"}, status=400)
+
+        schedule = schedule_for(bond)
+        return JsonResponse({
+            "bond_id": bond.pk,
+            "as_of": as_of,
+            "outstanding_balance": schedule.balance_as_of(as_of),
+            "schedule": schedule.rows(),
+        })
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ListingsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'myrealestate.listings'
+
+    def ready(self):
+        # Import signal handlers
+        import myrealestate.listings.signals
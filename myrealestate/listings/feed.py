@@ -0,0 +1,223 @@
+"""
+Public listings of available units.
+
+Unit, image and amenity changes append the affected unit ids to ListingChange and
+replace the units' version tokens (see listings.signals). Nothing is serialized at
+that point: apply_changes() later rebuilds the Listing row of just the units in the
+log, and the pages and feeds render straight from those stored payloads.
+
+Every public response is cached whole under its version token, and carries an ETag
+and Last-Modified derived from the same token, so unchanged listings cost a cache
+read (or a 304) and a change invalidates only the responses that include it.
+"""
+import json
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from myrealestate.common.fragment_cache import bump_versions, get_versions
+from myrealestate.properties.models import Unit, PropertyImage, prefetch_unit_catalog
+
+from .models import Listing, ListingChange
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNIT_VERSION = 'listing'
+FEED_VERSION = 'listings'
+RESPONSE_TIMEOUT = 60 * 60 * 24
+MAX_AGE = 60
+DEFAULT_BATCH_SIZE = 1000
+
+
+def log_changes(unit_ids):
+    """Queue units for a listing rebuild and invalidate every response that shows them"""
+    unit_ids = {pk for pk in unit_ids if pk is not None}
+    if not unit_ids:
+        return
+    ListingChange.objects.bulk_create([ListingChange(unit_id=pk) for pk in unit_ids], batch_size=DEFAULT_BATCH_SIZE)
+    bump_versions(UNIT_VERSION, unit_ids)
+    bump_versions(FEED_VERSION, ['all'])
+
+
+def unit_version(unit_id):
+    return get_versions((UNIT_VERSION, unit_id))[0]
+
+
+def feed_version():
+    return get_versions((FEED_VERSION, 'all'))[0]
+
+
+def _images_by_unit(unit_ids):
+    images = {}
+    for image in PropertyImage.objects.filter(
+        content_type=ContentType.objects.get_for_model(Unit), object_id__in=unit_ids
+    ).order_by('-is_primary', 'order', 'pk'):
+        images.setdefault(image.object_id, []).append(image.image.url)
+    return images
+
+
+def serialize(unit, images):
+    building = unit.building
+    return {
+        'id': unit.pk,
+        'url': reverse('listings:detail', args=[unit.pk]),
+        'title': f"{unit.bedrooms} bedroom {unit.get_unit_type_display()} in {building.name}",
+        'company': unit.company.name,
+        'building': building.name,
+        'estate': building.estate.name if building.estate else None,
+        'address': building.address or (building.estate.address if building.estate else None),
+        'unit_type': unit.get_unit_type_display(),
+        'bedrooms': unit.bedrooms,
+        'bathrooms': str(unit.bathrooms),
+        'square_footage': None if unit.square_footage is None else str(unit.square_footage),
+        'furnished': unit.furnished,
+        'parking_spots': unit.parking_spots,
+        'base_rent': None if unit.base_rent is None else str(unit.base_rent),
+        'deposit_amount': None if unit.deposit_amount is None else str(unit.deposit_amount),
+        'available_from': unit.available_from.isoformat() if unit.available_from else None,
+        'amenities': [relation.amenity.name for relation in unit.amenity_relations.all()],
+        'images': images,
+    }
+
+
+def refresh_listings(unit_ids):
+    """Rebuild the Listing rows of these units: upsert the available ones, drop the rest"""
+    units = prefetch_unit_catalog(list(
+        Unit.objects.available().filter(pk__in=unit_ids).select_related('building__estate', 'company')
+    ))
+    images = _images_by_unit([unit.pk for unit in units])
+    now = timezone.now()
+    Listing.objects.bulk_create(
+        [
+            Listing(unit_id=unit.pk, company_id=unit.company_id, payload=serialize(unit, images.get(unit.pk, [])), updated_at=now)
+            for unit in units
+        ],
+        update_conflicts=True,
+        unique_fields=['unit_id'],
+        update_fields=['company', 'payload', 'updated_at'],
+    )
+    Listing.objects.filter(unit_id__in=unit_ids).exclude(unit_id__in=[unit.pk for unit in units]).delete()
+    # Responses cached while these changes were queued showed the old rows
+    bump_versions(UNIT_VERSION, unit_ids)
+    bump_versions(FEED_VERSION, ['all'])
+
+
+def apply_changes(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Drain the change log a batch at a time. Batches are claimed with SKIP LOCKED, so
+    concurrent callers share the work. Returns the number of log entries applied.
+    """
+    applied = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            changes = list(
+                ListingChange.objects.select_for_update(skip_locked=True)
+                .order_by('pk').values_list('pk', 'unit_id')[:batch_size]
+            )
+            if not changes:
+                break
+            refresh_listings({unit_id for _, unit_id in changes})
+            ListingChange.objects.filter(pk__in=[pk for pk, _ in changes]).delete()
+        applied += len(changes)
+        batches += 1
+    if applied:
+        logger.info(f"Applied {applied} listing changes")
+    return applied
+
+
+def reconcile(full=False):
+    """
+    Queue every unit whose availability no longer matches the published listings,
+    e.g. once an available_from date has passed. With full=True, queue every
+    available unit. Returns the number of units queued.
+    """
+    available = set(Unit.objects.available().values_list('pk', flat=True))
+    listed = set(Listing.objects.values_list('unit_id', flat=True))
+    stale = available | listed if full else available ^ listed
+    log_changes(stale)
+    return len(stale)
+
+
+def render_json_feed(listings):
+    return json.dumps({
+        'generated': timezone.now().isoformat(),
+        'listings': [listing.payload for listing in listings],
+    })
+
+
+XML_LIST_ITEMS = {'amenities': 'amenity', 'images': 'image'}
+
+
+def _xml_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def render_xml_feed(listings):
+    stream = StringIO()
+    xml = SimplerXMLGenerator(stream, 'utf-8')
+    xml.startDocument()
+    xml.startElement('listings', {'generated': timezone.now().isoformat()})
+    for listing in listings:
+        payload = listing.payload
+        xml.startElement('listing', {'id': str(payload['id'])})
+        for key, value in payload.items():
+            if key == 'id':
+                continue
+            if key in XML_LIST_ITEMS:
+                xml.startElement(key, {})
+                for item in value:
+                    xml.addQuickElement(XML_LIST_ITEMS[key], _xml_text(item))
+                xml.endElement(key)
+            else:
+                xml.addQuickElement(key, _xml_text(value))
+        xml.endElement('listing')
+    xml.endElement('listings')
+    xml.endDocument()
+    return stream.getvalue()
+
+
+def cached_response(request, name, scope, get_version, build, content_type='text/html; charset=utf-8'):
+    """
+    Serve a public response from the cache under its version token, answering
+    conditional GETs with 304. `build` returns the body, or None for a 404. It may
+    apply queued changes and so move the token, which is read again before caching.
+    """
+    def etag_for(version):
+        return f'"{name}-{scope}-{version}"'
+
+    def key_for(version):
+        return f"listing_response:{name}:{scope}:{version}"
+
+    version = get_version()
+    response = get_conditional_response(request, etag=etag_for(version), last_modified=version // 1_000_000_000)
+    if response is not None:
+        return response
+
+    content = cache.get(key_for(version))
+    if content is None:
+        content = build()
+        if content is None:
+            return None
+        version = get_version()
+        cache.set(key_for(version), content, RESPONSE_TIMEOUT)
+
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag_for(version)
+    response['Last-Modified'] = http_date(version // 1_000_000_000)
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
+
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from ...feed import apply_changes, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Queue units whose availability changed with the date (or every unit with --full) and rebuild their public listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every published and available listing')
+
+    def handle(self, *args, **options):
+        queued = reconcile(full=options['full'])
+        applied = apply_changes()
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} units, applied {applied} listing changes"))
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def queue_available_units(apps, schema_editor):
+    Unit = apps.get_model('properties', 'Unit')
+    ListingChange = apps.get_model('listings', 'ListingChange')
+    unit_ids = Unit.objects.filter(is_vacant=True, available_from__lte=timezone.now().date()).values_list('pk', flat=True)
+    ListingChange.objects.bulk_create([ListingChange(unit_id=pk) for pk in unit_ids], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0015_occupancy_interval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Listing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_id', models.BigIntegerField(unique=True)),
+                ('payload', models.JSONField()),
+                ('updated_at', models.DateTimeField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listings', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['updated_at'], name='listings_li_updated_28d1ab_idx')],
+            },
+        ),
+        migrations.RunPython(queue_available_units, migrations.RunPython.noop),
+    ]
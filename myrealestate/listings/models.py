@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class ListingChange(models.Model):
+    """
+    Append-only log of units whose public listing may have changed. Written by the
+    signals in listings.signals and drained by listings.feed.apply_changes.
+    """
+    unit_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Listing change for unit {self.unit_id}"
+
+
+class Listing(models.Model):
+    """
+    The published form of an available unit. `payload` is the serialized entry the
+    pages and feeds render, rebuilt only for units named in the change log.
+    """
+    unit_id = models.BigIntegerField(unique=True)
+    company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="listings")
+    payload = models.JSONField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Listing for unit {self.unit_id}"
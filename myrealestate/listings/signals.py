@@ -0,0 +1,62 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from myrealestate.companies.models import Company
+from myrealestate.properties.models import (
+    Building, Unit, Amenity, PropertyImage, UnitAmenityRelation, units_bulk_changed,
+)
+
+from .feed import log_changes
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def unit_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        log_changes([instance.pk])
+
+
+@receiver(units_bulk_changed)
+def units_changed_in_bulk(sender, unit_ids, **kwargs):
+    log_changes(unit_ids)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def unit_image_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.content_type_id == ContentType.objects.get_for_model(Unit).pk:
+        log_changes([instance.object_id])
+
+
+@receiver(post_save, sender=UnitAmenityRelation)
+@receiver(post_delete, sender=UnitAmenityRelation)
+def unit_amenity_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        log_changes([instance.unit_id])
+
+
+@receiver(m2m_changed, sender=Unit.amenities.through)
+def unit_amenities_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # The m2m managers add rows without post_save; removals arrive as post_delete above
+    if action == 'post_add' and pk_set:
+        log_changes(pk_set if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Amenity)
+def amenity_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        log_changes(Unit.objects.filter(amenity_ids__contains=[instance.pk]).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Building)
+def building_changed(sender, instance, created, raw=False, **kwargs):
+    # Name, address and estate are part of every listing in the building
+    if not created and not raw:
+        log_changes(Unit.objects.filter(building=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Company)
+def company_renamed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        log_changes(Unit.objects.filter(company=instance).values_list('pk', flat=True))
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from myrealestate.listings.feed import apply_changes, reconcile
+from myrealestate.listings.models import Listing, ListingChange
+from myrealestate.properties.bulk_operations import UnitBulkChange
+from myrealestate.properties.models import (
+    Building, Unit, Amenity, PropertyDeletionJob, BuildingTypeEnums, UnitTypeEnums,
+)
+from myrealestate.companies.models import Company
+
+
+class ListingFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name="Acme Rentals")
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company, address="1 Main St"
+        )
+        self.unit = Unit.objects.create(
+            building=self.building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT,
+            bedrooms=2, base_rent=1200, is_vacant=True, available_from=timezone.now().date(),
+        )
+        self.client = Client()
+        self.detail_url = reverse('listings:detail', args=[self.unit.pk])
+
+    def test_changes_are_logged_and_applied(self):
+        self.assertTrue(ListingChange.objects.filter(unit_id=self.unit.pk).exists())
+        apply_changes()
+        self.assertFalse(ListingChange.objects.exists())
+        listing = Listing.objects.get(unit_id=self.unit.pk)
+        self.assertEqual(listing.payload['base_rent'], '1200.00')
+        self.assertEqual(listing.payload['address'], "1 Main St")
+
+    def test_detail_page(self):
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, "2 bedroom Apartment in Block A")
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.unit.base_rent = 1300
+        self.unit.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "1300.00")
+
+    def test_cached_response_until_invalidated(self):
+        self.client.get(self.detail_url)
+        # A write that bypasses signals is not picked up...
+        Unit.objects.filter(pk=self.unit.pk).update(base_rent=999)
+        Listing.objects.filter(unit_id=self.unit.pk).update(payload={})
+        self.assertContains(self.client.get(self.detail_url), "1200.00")
+
+        # ...but a save replaces the cached page
+        self.unit.refresh_from_db()
+        self.unit.save()
+        self.assertContains(self.client.get(self.detail_url), "999.00")
+
+    def test_amenity_changes_refresh_listing(self):
+        self.client.get(self.detail_url)
+        self.unit.add_amenity(Amenity.objects.create(name="Pool", category="Recreation", icon="pool"))
+        self.assertContains(self.client.get(self.detail_url), "Pool")
+
+    def test_unavailable_units_are_withdrawn(self):
+        self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        self.unit.is_vacant = False
+        self.unit.save()
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+        self.assertFalse(Listing.objects.exists())
+
+    def test_bulk_change_is_logged(self):
+        apply_changes()
+        UnitBulkChange(set_vacant=False).apply(Unit.objects.all(), self.company)
+        apply_changes()
+        self.assertFalse(Listing.objects.exists())
+
+    def test_scheduled_deletion_withdraws_listings(self):
+        apply_changes()
+        PropertyDeletionJob.objects.schedule(self.building)
+        apply_changes()
+        self.assertFalse(Listing.objects.exists())
+
+    def test_reconcile_publishes_units_that_became_available(self):
+        future = Unit.objects.create(
+            building=self.building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT,
+            is_vacant=True, available_from=timezone.now().date() + timedelta(days=7),
+        )
+        apply_changes()
+        self.assertFalse(Listing.objects.filter(unit_id=future.pk).exists())
+
+        # The date passes without any write to the unit
+        Unit.objects.filter(pk=future.pk).update(available_from=timezone.now().date())
+        self.assertEqual(reconcile(), 1)
+        call_command('sync_listings', stdout=StringIO())
+        self.assertTrue(Listing.objects.filter(unit_id=future.pk).exists())
+
+    def test_list_and_feeds(self):
+        response = self.client.get(reverse('listings:list'))
+        self.assertContains(response, "Block A")
+
+        data = self.client.get(reverse('listings:feed', args=['json'])).json()
+        self.assertEqual([listing['id'] for listing in data['listings']], [self.unit.pk])
+
+        response = self.client.get(reverse('listings:feed', args=['xml']))
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        self.assertContains(response, f'<listing id="{self.unit.pk}">')
+        self.assertEqual(self.client.get(reverse('listings:feed', args=['csv'])).status_code, 404)
+
+    def test_out_of_range_page_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('listings:list'), {'page': 2}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('listings:list'), {'page': 'last'}).status_code, 200)
+
+    def test_request_applies_one_batch(self):
+        ListingChange.objects.bulk_create([ListingChange(unit_id=self.unit.pk) for _ in range(1500)])
+        self.client.get(reverse('listings:feed', args=['json']))
+        self.assertTrue(ListingChange.objects.exists())
+        call_command('sync_listings', stdout=StringIO())
+        self.assertFalse(ListingChange.objects.exists())
+
+    def test_feed_changes_once_backlog_is_drained(self):
+        ListingChange.objects.bulk_create([ListingChange(unit_id=self.unit.pk) for _ in range(1000)])
+        unit = Unit.objects.create(
+            building=self.building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT,
+            is_vacant=True, available_from=timezone.now().date(),
+        )
+        url = reverse('listings:feed', args=['json'])
+        response = self.client.get(url)
+        self.assertNotIn(unit.pk, [listing['id'] for listing in response.json()['listings']])
+
+        apply_changes()
+        drained = self.client.get(url)
+        self.assertNotEqual(drained['ETag'], response['ETag'])
+        self.assertIn(unit.pk, [listing['id'] for listing in drained.json()['listings']])
+
+    def test_feed_follows_new_units(self):
+        self.client.get(reverse('listings:feed', args=['json']))
+        Unit.objects.create(
+            building=self.building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT,
+            is_vacant=True, available_from=timezone.now().date(),
+        )
+        data = self.client.get(reverse('listings:feed', args=['json'])).json()
+        self.assertEqual(len(data['listings']), 2)
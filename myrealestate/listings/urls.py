@@ -0,0 +1,11 @@
+from django.urls import path
+from myrealestate.listings.views import ListingListView, ListingDetailView, ListingFeedView
+
+
+app_name = "listings"
+
+urlpatterns = [
+    path("", ListingListView.as_view(), name="list"),
+    path("<int:unit_id>/", ListingDetailView.as_view(), name="detail"),
+    path("feed.<str:format>", ListingFeedView.as_view(), name="feed"),
+]
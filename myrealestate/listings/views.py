@@ -0,0 +1,71 @@
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.views import View
+
+from .feed import apply_changes, cached_response, feed_version, unit_version, render_json_feed, render_xml_feed
+from .models import Listing
+
+# Public pages are rendered without the request so nothing user-specific ends up in the cache.
+# A cache miss applies at most one batch of the change log so a backlog never stalls a
+# request; `manage.py sync_listings` drains the rest.
+
+
+class ListingListView(View):
+    paginate_by = 24
+
+    def get(self, request, *args, **kwargs):
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+
+        def build():
+            apply_changes(max_batches=1)
+            paginator = Paginator(Listing.objects.order_by('-updated_at', 'unit_id'), self.paginate_by)
+            try:
+                page_obj = paginator.page(page)
+            except InvalidPage:
+                # Not cached, so out of range page numbers cannot fill the cache with copies
+                return None
+            return render_to_string('listings/listing_list.html', {'page_obj': page_obj})
+
+        response = cached_response(request, 'list', f"page-{page}", feed_version, build)
+        if response is None:
+            raise Http404("No such page")
+        return response
+
+
+class ListingDetailView(View):
+    def get(self, request, *args, **kwargs):
+        unit_id = kwargs['unit_id']
+
+        def build():
+            apply_changes(max_batches=1)
+            listing = Listing.objects.filter(unit_id=unit_id).first()
+            if listing is None:
+                return None
+            return render_to_string('listings/listing_detail.html', {'unit': listing.payload})
+
+        response = cached_response(request, 'detail', unit_id, lambda: unit_version(unit_id), build)
+        if response is None:
+            raise Http404("No such listing")
+        return response
+
+
+class ListingFeedView(View):
+    formats = {
+        'json': (render_json_feed, 'application/json'),
+        'xml': (render_xml_feed, 'application/xml; charset=utf-8'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        if kwargs['format'] not in self.formats:
+            raise Http404("Unknown feed format")
+        render, content_type = self.formats[kwargs['format']]
+
+        def build():
+            apply_changes(max_batches=1)
+            return render(Listing.objects.order_by('unit_id'))
+
+        return cached_response(request, 'feed', kwargs['format'], feed_version, build, content_type=content_type)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PropertiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myrealestate.properties'
+
+    def ready(self):
+        # Import signal handlers
+        import myrealestate.properties.signals
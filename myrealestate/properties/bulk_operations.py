@@ -0,0 +1,165 @@
+"""
+Set-based rent, deposit and vacancy changes across a filtered set of units.
+
+A change is turned into column expressions, so applying it is a single
+UPDATE ... SET base_rent = ROUND(base_rent * 1.08 / step) * step, and the dry-run
+preview is one aggregate over the same expressions. Queryset updates skip the model
+signals, so occupancy rollups are adjusted with per-building deltas taken from a
+grouped aggregate before the UPDATE, and one audit record is written per batch.
+The selected rows are locked before anything reads them and the UPDATE filters by
+a subquery, so no id list is sent back to the database.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+
+from . import comparables
+from .models import (
+    Unit, PortfolioNode, OccupancyRollup, OccupancyInterval, UnitBulkOperation,
+    BulkChangeTypeEnums, RentRoundingEnums, PortfolioNodeTypeEnums, units_bulk_changed,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MONEY = models.DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=MONEY)
+
+
+class UnitBulkChange:
+    """
+    A rent/deposit adjustment (percentage or absolute, then rounded to a step) and/or
+    a new vacancy flag, to be applied to every unit of a queryset.
+    """
+    def __init__(self, rent_change_type=None, rent_change=None, deposit_change_type=None,
+                 deposit_change=None, set_vacant=None, rounding=RentRoundingEnums.CENT):
+        self.rent_change_type = rent_change_type if rent_change is not None else None
+        self.rent_change = rent_change if rent_change_type else None
+        self.deposit_change_type = deposit_change_type if deposit_change is not None else None
+        self.deposit_change = deposit_change if deposit_change_type else None
+        self.set_vacant = set_vacant
+        self.rounding = rounding
+
+        if not self.assignments():
+            raise ValidationError("Choose a rent, deposit or vacancy change to apply")
+
+    def _adjusted(self, field, change_type, change):
+        if change_type is None:
+            return None
+        if change_type == BulkChangeTypeEnums.PERCENTAGE:
+            value = F(field) * Value(Decimal('1') + Decimal(change) / 100, output_field=MONEY)
+        else:
+            value = F(field) + Value(Decimal(change), output_field=MONEY)
+        step = Value(Decimal(self.rounding), output_field=MONEY)
+        rounded = Round(value / step, output_field=MONEY) * step
+        # GREATEST() skips NULLs, so units without a rent would otherwise get 0
+        return Case(
+            When(**{f'{field}__isnull': True}, then=Value(None, output_field=MONEY)),
+            default=Greatest(rounded, ZERO, output_field=MONEY),
+        )
+
+    def assignments(self):
+        """Column -> expression for the UPDATE"""
+        values = {}
+        rent = self._adjusted('base_rent', self.rent_change_type, self.rent_change)
+        if rent is not None:
+            values['base_rent'] = rent
+        deposit = self._adjusted('deposit_amount', self.deposit_change_type, self.deposit_change)
+        if deposit is not None:
+            values['deposit_amount'] = deposit
+        if self.set_vacant is not None:
+            values['is_vacant'] = Value(self.set_vacant)
+        return values
+
+    def new_value(self, field):
+        return self.assignments().get(field, F(field))
+
+    def preview(self, units):
+        """Dry run: before/after totals for the selected units, computed in one aggregate"""
+        totals = {
+            'units': Count('pk'),
+            'rent_before': Coalesce(Sum('base_rent'), ZERO),
+            'rent_after': Coalesce(Sum(self.new_value('base_rent')), ZERO),
+            'deposit_before': Coalesce(Sum('deposit_amount'), ZERO),
+            'deposit_after': Coalesce(Sum(self.new_value('deposit_amount')), ZERO),
+            'vacant_before': Count('pk', filter=Q(is_vacant=True)),
+        }
+        summary = units.aggregate(**totals)
+        summary['vacant_after'] = {
+            None: summary['vacant_before'], True: summary['units'], False: 0,
+        }[self.set_vacant]
+        return summary
+
+    def building_deltas(self, units):
+        """Rollup deltas per building: how potential/actual rent and vacancy will move"""
+        new_rent = self.new_value('base_rent')
+        rows = units.values('company_id', 'building__estate_id', 'building_id').annotate(
+            units=Count('pk'),
+            rent_before=Coalesce(Sum('base_rent'), ZERO),
+            rent_after=Coalesce(Sum(new_rent), ZERO),
+            actual_before=Coalesce(Sum('base_rent', filter=Q(is_vacant=False)), ZERO),
+            occupied_rent_after=Coalesce(Sum(new_rent, filter=Q(is_vacant=False)), ZERO),
+            vacant_before=Count('pk', filter=Q(is_vacant=True)),
+        ).order_by()
+
+        for row in rows:
+            if self.set_vacant is None:
+                actual_after, vacant_after = row['occupied_rent_after'], row['vacant_before']
+            elif self.set_vacant:
+                actual_after, vacant_after = Decimal('0'), row['units']
+            else:
+                actual_after, vacant_after = row['rent_after'], 0
+            yield row['company_id'], row['building__estate_id'], row['building_id'], {
+                'potential_rent': row['rent_after'] - row['rent_before'],
+                'actual_rent': actual_after - row['actual_before'],
+                'vacant_units': vacant_after - row['vacant_before'],
+            }
+
+    def apply(self, units, company, performed_by=None, filters=None):
+        """Apply the change to the company's units in one UPDATE and record the batch"""
+        units = units.filter(company=company)
+        with transaction.atomic():
+            # Lock the selection first so the preview and rollup deltas read exactly the
+            # rows the UPDATE changes. The UPDATE filters by subquery; the locked ids are
+            # kept for the steps after it, when the filter may no longer match them
+            unit_ids = list(units.select_for_update(of=('self',)).values_list('pk', flat=True))
+            selected = units.values('pk')
+            # Everything that reads the selection runs before the UPDATE, which may
+            # change the columns the selection was filtered on (e.g. is_vacant)
+            summary = self.preview(units)
+            deltas = list(self.building_deltas(units))
+            if self.set_vacant is not None:
+                PortfolioNode.objects.filter(
+                    node_type=PortfolioNodeTypeEnums.UNIT, object_id__in=selected
+                ).update(is_vacant=self.set_vacant)
+
+            updated = Unit.objects.filter(pk__in=selected).update(updated_at=timezone.now(), **self.assignments())
+            OccupancyRollup.objects.apply_building_deltas(deltas)
+            if self.set_vacant is not None:
+                OccupancyInterval.objects.sync(company.pk, unit_ids=unit_ids)
+            comparables.invalidate(company.pk)
+            units_bulk_changed.send(sender=Unit, unit_ids=unit_ids)
+
+            operation = UnitBulkOperation.objects.create(
+                company=company,
+                performed_by=performed_by,
+                filters=filters or {},
+                rent_change_type=self.rent_change_type,
+                rent_change=self.rent_change,
+                deposit_change_type=self.deposit_change_type,
+                deposit_change=self.deposit_change,
+                set_vacant=self.set_vacant,
+                rounding=self.rounding,
+                units_affected=updated,
+                rent_before=summary['rent_before'],
+                rent_after=summary['rent_after'],
+                deposit_before=summary['deposit_before'],
+                deposit_after=summary['deposit_after'],
+            )
+        logger.info(f"Bulk updated {updated} units for company {company.pk} (operation {operation.pk})")
+        return operation
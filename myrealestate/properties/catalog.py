@@ -0,0 +1,74 @@
+"""
+In-process cache of the Amenity and PropertyFeature catalogs.
+
+Both tables are tiny and change rarely, yet every estate/unit form used to load them
+(once for the template, again for each form field). Each process keeps its own copy,
+pre-grouped by category, tagged with the version it was loaded at. The current
+version lives in the shared Django cache and is replaced whenever a catalog row is
+saved or deleted (see properties.signals), so every worker reloads on its next access.
+"""
+import threading
+import time
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Amenity, PropertyFeature
+
+
+class CatalogCache:
+    def __init__(self, model, ordering=('category', 'name')):
+        self.model = model
+        self.ordering = ordering
+        self.version_key = f"catalog_version:{model._meta.label_lower}"
+        self._lock = threading.Lock()
+        self._state = (None, (), {}, ())  # version, items, by pk, groups
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # First use, or evicted: any fresh token differs from what processes hold
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _load(self):
+        version = self.current_version()
+        state = self._state
+        if state[0] == version:
+            return state
+        with self._lock:
+            if self._state[0] != version:
+                items = tuple(self.model.objects.order_by(*self.ordering))
+                groups = tuple(
+                    (category, tuple(members))
+                    for category, members in groupby(items, key=lambda item: item.category)
+                )
+                self._state = (version, items, {item.pk: item for item in items}, groups)
+            return self._state
+
+    def all(self):
+        return self._load()[1]
+
+    def get(self, pk):
+        return self._load()[2].get(pk)
+
+    def grouped(self):
+        """((category, (items...)), ...) in display order"""
+        return self._load()[3]
+
+    def invalidate(self):
+        cache.set(self.version_key, time.time_ns(), timeout=None)
+        # Bump again once the change is visible to other connections, in case another
+        # worker reloaded in between and cached the old rows under the new version
+        transaction.on_commit(lambda: cache.set(self.version_key, time.time_ns(), timeout=None))
+
+
+amenity_catalog = CatalogCache(Amenity)
+feature_catalog = CatalogCache(PropertyFeature)
+
+CATALOGS = {
+    Amenity: amenity_catalog,
+    PropertyFeature: feature_catalog,
+}
@@ -0,0 +1,202 @@
+"""
+Comparable-rent search over a company's units.
+
+Each process keeps one ComparableIndex per company: the units' attributes packed into
+NumPy arrays (numeric features, an amenity membership matrix, building/estate ids and
+rents). A lookup scores every unit against the target in a handful of vectorized
+operations and picks the nearest with argpartition, so it stays in the low
+milliseconds even for 100k units. The index is rebuilt lazily when the company's
+version token in the shared cache moves; unit and amenity changes replace it (see
+properties.signals, bulk_operations, importers and deletion).
+"""
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Unit
+
+DEFAULT_LIMIT = 10
+PERCENTILES = (25, 50, 75)
+
+# Relative importance of each attribute in the distance
+WEIGHTS = {
+    'bedrooms': 3.0,
+    'bathrooms': 1.5,
+    'square_footage': 2.0,
+    'furnished': 1.0,
+    'amenities': 1.0,
+    'location': 2.0,
+}
+NUMERIC_FIELDS = ('bedrooms', 'bathrooms', 'square_footage')
+# Unit columns the index is built from: saving a unit only invalidates it when one changes
+INDEXED_FIELDS = NUMERIC_FIELDS + ('furnished', 'base_rent', 'building_id', 'company_id', 'amenity_ids')
+
+
+def version_key(company_id):
+    return f"comparables_version:{company_id}"
+
+
+def current_version(company_id):
+    key = version_key(company_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(company_id):
+    """Make every process rebuild the company's index on its next lookup"""
+    if company_id is None:
+        return
+    key = version_key(company_id)
+    cache.set(key, time.time_ns(), timeout=None)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), timeout=None))
+
+
+class ComparableIndex:
+    def __init__(self, rows):
+        count = len(rows)
+        self.unit_ids = np.empty(count, dtype=np.int64)
+        self.building_ids = np.full(count, -1, dtype=np.int64)
+        self.estate_ids = np.full(count, -1, dtype=np.int64)
+        self.numeric = np.full((count, len(NUMERIC_FIELDS)), np.nan)
+        self.furnished = np.zeros(count, dtype=bool)
+        self.rents = np.full(count, np.nan)
+        amenity_lists = []
+        for i, (pk, building_id, estate_id, bedrooms, bathrooms, square_footage, furnished, base_rent, amenity_ids) in enumerate(rows):
+            self.unit_ids[i] = pk
+            self.building_ids[i] = building_id
+            self.estate_ids[i] = -1 if estate_id is None else estate_id
+            self.numeric[i] = [
+                np.nan if value is None else float(value) for value in (bedrooms, bathrooms, square_footage)
+            ]
+            self.furnished[i] = furnished
+            if base_rent is not None:
+                self.rents[i] = float(base_rent)
+            amenity_lists.append(amenity_ids or ())
+
+        # Amenity membership as a dense 0/1 matrix over the amenities in use
+        self.amenity_columns = {
+            amenity_id: column
+            for column, amenity_id in enumerate(sorted({a for amenities in amenity_lists for a in amenities}))
+        }
+        self.amenities = np.zeros((count, len(self.amenity_columns)), dtype=np.float32)
+        for i, amenities in enumerate(amenity_lists):
+            self.amenities[i, [self.amenity_columns[a] for a in amenities]] = 1
+        self.amenity_counts = self.amenities.sum(axis=1)
+
+        # Numeric differences are measured in standard deviations of the portfolio
+        with np.errstate(invalid='ignore'):
+            scales = np.nanstd(self.numeric, axis=0) if count else np.ones(len(NUMERIC_FIELDS))
+        self.scales = np.where(np.isnan(scales) | (scales == 0), 1.0, scales)
+
+    def __len__(self):
+        return len(self.unit_ids)
+
+    def _target_amenities(self, amenity_ids):
+        vector = np.zeros(len(self.amenity_columns), dtype=np.float32)
+        columns = [self.amenity_columns[a] for a in amenity_ids if a in self.amenity_columns]
+        vector[columns] = 1
+        # Amenities no other unit has still count towards the union
+        return vector, len(set(amenity_ids))
+
+    def distances(self, unit):
+        """Weighted distance from `unit` (any Unit instance, saved or not) to every indexed unit"""
+        target = np.array([
+            np.nan if value is None else float(value)
+            for value in (unit.bedrooms, unit.bathrooms, unit.square_footage)
+        ])
+        differences = np.abs(self.numeric - target) / self.scales
+        # A missing value on either side counts as one standard deviation away
+        differences = np.where(np.isnan(differences), 1.0, differences)
+        total = differences @ np.array([WEIGHTS[field] for field in NUMERIC_FIELDS])
+
+        total += WEIGHTS['furnished'] * (self.furnished != bool(unit.furnished))
+
+        amenities, amenity_count = self._target_amenities(unit.amenity_ids or ())
+        shared = self.amenities @ amenities
+        union = self.amenity_counts + amenity_count - shared
+        with np.errstate(invalid='ignore', divide='ignore'):
+            similarity = np.where(union > 0, shared / union, 1.0)
+        total += WEIGHTS['amenities'] * (1 - similarity)
+
+        estate_id = getattr(unit.building, 'estate_id', None) if unit.building_id else None
+        location = np.where(
+            self.building_ids == unit.building_id, 0.0,
+            np.where((self.estate_ids == estate_id) & (self.estate_ids != -1), 0.5, 1.0),
+        )
+        total += WEIGHTS['location'] * location
+        return total
+
+    def nearest(self, unit, limit=DEFAULT_LIMIT):
+        """(unit ids, distances, rents) of the `limit` closest units with a rent, nearest first"""
+        distances = self.distances(unit)
+        candidates = ~np.isnan(self.rents)
+        if unit.pk is not None:
+            candidates &= self.unit_ids != unit.pk
+        positions = np.flatnonzero(candidates)
+        if not len(positions) or limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        if len(positions) > limit:
+            closest = np.argpartition(distances[positions], limit - 1)[:limit]
+            positions = positions[closest]
+        positions = positions[np.argsort(distances[positions], kind='stable')]
+        return self.unit_ids[positions], distances[positions], self.rents[positions]
+
+
+class ComparablesCache:
+    def __init__(self):
+        self._locks = {}  # company id -> lock, so one company's rebuild never blocks another's lookups
+        self._indexes = {}  # company id -> (version, ComparableIndex)
+
+    def build(self, company_id):
+        rows = list(
+            Unit.objects.filter(company_id=company_id)
+            .values_list(
+                'pk', 'building_id', 'building__estate_id', 'bedrooms', 'bathrooms',
+                'square_footage', 'furnished', 'base_rent', 'amenity_ids',
+            )
+            .order_by()
+        )
+        return ComparableIndex(rows)
+
+    def get(self, company_id):
+        version = current_version(company_id)
+        cached = self._indexes.get(company_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # dict.setdefault is atomic, so concurrent first lookups share one lock
+        with self._locks.setdefault(company_id, threading.Lock()):
+            cached = self._indexes.get(company_id)
+            if cached is None or cached[0] != version:
+                cached = (version, self.build(company_id))
+                self._indexes[company_id] = cached
+            return cached[1]
+
+
+comparables_cache = ComparablesCache()
+
+
+def find_comparables(unit, limit=DEFAULT_LIMIT):
+    """
+    The `limit` units of the same company most similar to `unit`, with the percentiles
+    of their rents: {'comparables': [{'unit_id', 'distance', 'base_rent'}, ...],
+    'rent_percentiles': {25: ..., 50: ..., 75: ...}} (percentiles are None without comparables).
+    """
+    index = comparables_cache.get(unit.company_id)
+    unit_ids, distances, rents = index.nearest(unit, limit=limit)
+    percentiles = np.percentile(rents, PERCENTILES) if len(rents) else [None] * len(PERCENTILES)
+    return {
+        'comparables': [
+            {'unit_id': int(unit_id), 'distance': round(float(distance), 4), 'base_rent': float(rent)}
+            for unit_id, distance, rent in zip(unit_ids, distances, rents)
+        ],
+        'rent_percentiles': {
+            percentile: None if value is None else round(float(value), 2)
+            for percentile, value in zip(PERCENTILES, percentiles)
+        },
+    }
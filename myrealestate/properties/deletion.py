@@ -0,0 +1,145 @@
+"""
+Background deletion of estate and building subtrees.
+
+Deleting a large estate through Model.delete() makes Django's collector load every
+building, unit, subunit, relation row and image into memory first. Instead the view
+flags the subtree as deleted (hiding it at once) and queues a PropertyDeletionJob.
+The job removes the rows bottom-up in bounded batches of raw DELETEs, each batch in
+its own transaction, so it can be interrupted and resumed at any point. Image files
+are queued as PendingFileDeletion rows and removed from storage separately.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import comparables
+from .models import (
+    Estate, Building, Unit, SubUnit, PropertyImage, PortfolioNode, OccupancyRollup, OccupancyInterval,
+    UnitAmenityRelation, UnitFeatureRelation, EstateAmenityRelation,
+    PropertyDeletionJob, PendingFileDeletion, DeletionJobStatusEnums, PortfolioNodeTypeEnums,
+    recompute_counter_caches,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def subtree_querysets(job):
+    """Querysets for everything under the job's target, leaves first"""
+    if job.target_type == PortfolioNodeTypeEnums.ESTATE:
+        estates = Estate.all_objects.filter(pk=job.object_id)
+        buildings = Building.all_objects.filter(estate_id=job.object_id)
+    else:
+        estates = Estate.all_objects.none()
+        buildings = Building.all_objects.filter(pk=job.object_id)
+    units = Unit.all_objects.filter(building__in=buildings.values('pk'))
+    subunits = SubUnit.all_objects.filter(parent_unit__in=units.values('pk'))
+
+    images = [
+        PropertyImage.objects.filter(
+            content_type=ContentType.objects.get_for_model(queryset.model),
+            object_id__in=queryset.values('pk'),
+        )
+        for queryset in (subunits, units, buildings, estates)
+    ]
+    return images + [
+        UnitAmenityRelation.objects.filter(unit__in=units.values('pk')),
+        UnitFeatureRelation.objects.filter(unit__in=units.values('pk')),
+        subunits,
+        units,
+        buildings,
+        EstateAmenityRelation.objects.filter(estate__in=estates.values('pk')),
+        estates,
+    ]
+
+
+def delete_in_batches(job, queryset, batch_size):
+    """Raw-delete the rows of a queryset a batch at a time, recording progress on the job"""
+    model = queryset.model
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return total
+            if model is PropertyImage:
+                PendingFileDeletion.objects.bulk_create([
+                    PendingFileDeletion(name=name)
+                    for name in PropertyImage.objects.filter(pk__in=batch).values_list('image', flat=True) if name
+                ])
+            # _raw_delete is what the collector uses for its fast path: a plain DELETE
+            # with no instances loaded and no signals sent
+            deleted = model._base_manager.filter(pk__in=batch)._raw_delete(queryset.db)
+            PropertyDeletionJob.objects.filter(pk=job.pk).update(
+                rows_deleted=F('rows_deleted') + deleted, heartbeat_at=timezone.now()
+            )
+        total += deleted
+
+
+def run_deletion_job(job, batch_size=DEFAULT_BATCH_SIZE):
+    """Delete a claimed job's subtree, then bring the company's aggregates back in line"""
+    try:
+        node_path = PortfolioNode.objects.filter(
+            node_type=job.target_type, object_id=job.object_id
+        ).values_list('path', flat=True).first()
+
+        for queryset in subtree_querysets(job):
+            delete_in_batches(job, queryset, batch_size)
+        if node_path:
+            delete_in_batches(job, PortfolioNode.objects.filter(path__startswith=node_path), batch_size)
+
+        # The raw deletes skipped the signals that maintain rollups and counters
+        OccupancyRollup.objects.reconcile(company_id=job.company_id)
+        OccupancyInterval.objects.sync(job.company_id)
+        comparables.invalidate(job.company_id)
+        recompute_counter_caches(company_id=job.company_id)
+    except Exception as e:
+        logger.exception(f"Deletion job {job.pk} failed")
+        PropertyDeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJobStatusEnums.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return False
+
+    PropertyDeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJobStatusEnums.DONE, finished_at=timezone.now()
+    )
+    logger.info(f"Deletion job {job.pk} finished")
+    return True
+
+
+def process_deletion_jobs(limit=None, batch_size=DEFAULT_BATCH_SIZE, job_id=None):
+    """Claim and run jobs until none are left (or `limit` have run). Returns the number run."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = PropertyDeletionJob.objects.claim(job_id=job_id)
+        if job is None:
+            break
+        run_deletion_job(job, batch_size=batch_size)
+        processed += 1
+    return processed
+
+
+def delete_pending_files(limit=1000, max_attempts=5):
+    """Remove queued image files from storage. Failed attempts stay queued for a retry."""
+    storage = PropertyImage._meta.get_field('image').storage
+    removed = 0
+    with transaction.atomic():
+        pending = PendingFileDeletion.objects.select_for_update(skip_locked=True).filter(
+            attempts__lt=max_attempts
+        ).order_by('pk')[:limit]
+        for item in pending:
+            try:
+                storage.delete(item.name)
+            except Exception as e:
+                logger.warning(f"Could not delete {item.name} from storage: {e}")
+                PendingFileDeletion.objects.filter(pk=item.pk).update(
+                    attempts=F('attempts') + 1, last_error=str(e)
+                )
+                continue
+            item.delete()
+            removed += 1
+    return removed
@@ -1,6 +1,31 @@
 from django import forms
-from myrealestate.common.forms import BaseModelForm, BasePatchForm
-from myrealestate.properties.models import Estate, Building, Unit, Amenity, PropertyFeature
+from myrealestate.common.forms import BaseForm, BaseModelForm, BasePatchForm
+from myrealestate.properties.models import (
+    Estate, Building, Unit, Amenity, PropertyFeature, UnitTypeEnums, BulkChangeTypeEnums, RentRoundingEnums
+)
+from myrealestate.properties.bulk_operations import UnitBulkChange
+from myrealestate.properties.catalog import CATALOGS
+from django.forms.models import ModelChoiceIterator
+
+
+class CatalogChoiceIterator(ModelChoiceIterator):
+    """Choices from the in-process catalog cache instead of a query per render"""
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in CATALOGS[self.queryset.model].all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(CATALOGS[self.queryset.model].all()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(CATALOGS[self.queryset.model].all())
+
+
+class CatalogMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """Amenity/PropertyFeature picker rendered from the catalog cache"""
+    iterator = CatalogChoiceIterator
 
 class EstateForm(BaseModelForm):
     class Meta:
@@ -65,6 +90,10 @@ class UnitForm(BaseModelForm):
             'features': forms.CheckboxSelectMultiple(),
             'available_from': forms.DateInput(attrs={'type': 'date'})
         }
+        field_classes = {
+            'amenities': CatalogMultipleChoiceField,
+            'features': CatalogMultipleChoiceField,
+        }
 
 
 class UnitPatchForm(BasePatchForm, UnitForm):
@@ -87,3 +116,92 @@ class UnitPatchForm(BasePatchForm, UnitForm):
             'features': forms.CheckboxSelectMultiple(),
             'available_from': forms.DateInput(attrs={'type': 'date'})
         }
+        field_classes = {
+            'amenities': CatalogMultipleChoiceField,
+            'features': CatalogMultipleChoiceField,
+        }
+
+
+class PropertyImportForm(BaseForm):
+    kind = forms.ChoiceField(
+        choices=[('buildings', 'Buildings'), ('units', 'Units')],
+        label='What are you importing?'
+    )
+    file = forms.FileField(
+        help_text='CSV or XLSX with a header row. Buildings: name, building_type, estate, address, managing. '
+                  'Units: building, number, unit_type, bedrooms, bathrooms, square_footage, furnished, '
+                  'parking_spots, base_rent, deposit_amount, available_from, is_vacant.'
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Upload a .csv or .xlsx file")
+        return upload
+
+
+VACANCY_CHOICES = [('', 'Any'), ('vacant', 'Vacant'), ('occupied', 'Occupied')]
+
+
+class UnitBulkUpdateForm(BaseForm):
+    # Which units
+    estate = forms.ModelChoiceField(queryset=Estate.objects.none(), required=False)
+    building = forms.ModelChoiceField(queryset=Building.objects.none(), required=False)
+    unit_type = forms.ChoiceField(choices=[('', 'Any')] + UnitTypeEnums.choices, required=False)
+    vacancy = forms.ChoiceField(choices=VACANCY_CHOICES, required=False, label='Current vacancy')
+
+    # What to change
+    rent_change_type = forms.ChoiceField(choices=[('', 'No change')] + BulkChangeTypeEnums.choices, required=False)
+    rent_change = forms.DecimalField(max_digits=10, decimal_places=2, required=False,
+                                     help_text='e.g. 8 for +8%, or -250 to lower rent by 250')
+    deposit_change_type = forms.ChoiceField(choices=[('', 'No change')] + BulkChangeTypeEnums.choices, required=False)
+    deposit_change = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+    set_vacancy = forms.ChoiceField(choices=[('', 'No change'), ('vacant', 'Mark vacant'), ('occupied', 'Mark occupied')],
+                                    required=False)
+    rounding = forms.ChoiceField(choices=RentRoundingEnums.choices, initial=RentRoundingEnums.CENT)
+
+    def __init__(self, *args, company=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.company = company
+        self.fields['estate'].queryset = Estate.objects.filter(company=company).order_by('name')
+        self.fields['building'].queryset = Building.objects.filter(company=company).order_by('name')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for prefix in ('rent', 'deposit'):
+            if cleaned_data.get(f'{prefix}_change_type') and cleaned_data.get(f'{prefix}_change') is None:
+                self.add_error(f'{prefix}_change', 'Enter the amount to change by')
+        if not self.errors:
+            self.change = UnitBulkChange(
+                rent_change_type=cleaned_data.get('rent_change_type') or None,
+                rent_change=cleaned_data.get('rent_change'),
+                deposit_change_type=cleaned_data.get('deposit_change_type') or None,
+                deposit_change=cleaned_data.get('deposit_change'),
+                set_vacant={'vacant': True, 'occupied': False}.get(cleaned_data.get('set_vacancy')),
+                rounding=cleaned_data['rounding'],
+            )
+        return cleaned_data
+
+    def get_units(self):
+        units = Unit.objects.filter(company=self.company)
+        data = self.cleaned_data
+        if data.get('estate'):
+            units = units.filter(building__estate=data['estate'])
+        if data.get('building'):
+            units = units.filter(building=data['building'])
+        if data.get('unit_type'):
+            units = units.filter(unit_type=data['unit_type'])
+        if data.get('vacancy'):
+            units = units.filter(is_vacant=data['vacancy'] == 'vacant')
+        return units
+
+    def get_filters(self):
+        """The unit selection as plain values for the audit record"""
+        data = self.cleaned_data
+        filters = {
+            'estate': data['estate'].pk if data.get('estate') else None,
+            'building': data['building'].pk if data.get('building') else None,
+            'unit_type': data.get('unit_type'),
+            'vacancy': data.get('vacancy'),
+        }
+        return {key: value for key, value in filters.items() if value}
@@ -0,0 +1,306 @@
+"""
+Streaming bulk import of buildings and units from CSV or XLSX files.
+
+Rows are read lazily and processed in chunks: each chunk resolves its references
+with one query per referenced model, validates every row with the same rules as
+the model's clean(), and writes the accepted rows with bulk_create inside its own
+transaction. Rejected rows are collected for an error report instead of aborting
+the import.
+"""
+import csv
+import io
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import comparables
+from .models import (
+    Estate, Building, Unit, BuildingTypeEnums, UnitTypeEnums,
+    validate_unit_placement, refresh_property_aggregates, units_bulk_changed,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+def read_rows(file_obj, filename):
+    """Yield each data row of a CSV or XLSX file as a dict keyed by lower-cased header"""
+    if filename.lower().endswith('.xlsx'):
+        yield from _read_xlsx(file_obj)
+    else:
+        yield from _read_csv(file_obj)
+
+
+def _read_csv(file_obj):
+    if isinstance(file_obj.read(0), bytes):
+        file_obj = io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(file_obj)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for row in reader:
+        yield {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _read_xlsx(file_obj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, [])]
+        for values in rows:
+            if not any(value not in (None, '') for value in values):
+                continue
+            yield {
+                key: '' if value is None else str(value).strip()
+                for key, value in zip(header, values) if key
+            }
+    finally:
+        workbook.close()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_choice(value, choices, field_name):
+    """Accept either the stored code ('M') or the label ('Multi Unit') of a TextChoices value"""
+    for code, label in choices.choices:
+        if value.lower() in (code.lower(), str(label).lower()):
+            return code
+    raise ValidationError(f"Invalid {field_name}: '{value}'")
+
+
+def parse_bool(value, default=False):
+    if value == '':
+        return default
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ValidationError(f"Invalid yes/no value: '{value}'")
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (row number, row, message)
+
+    @property
+    def rejected(self):
+        return len(self.errors)
+
+    def reject(self, row_number, row, error):
+        messages = error.messages if isinstance(error, ValidationError) else [str(error)]
+        self.errors.append((row_number, row, '; '.join(messages)))
+
+    def write_error_report(self, file_obj):
+        """Write rejected rows with their row number and reason as CSV"""
+        columns = []
+        for _, row, _ in self.errors:
+            columns.extend(key for key in row if key not in columns)
+        writer = csv.writer(file_obj)
+        writer.writerow(['row', 'error'] + columns)
+        for row_number, row, message in self.errors:
+            writer.writerow([row_number, message] + [row.get(column, '') for column in columns])
+
+
+class BaseImporter(ABC):
+    model = None
+    required_columns = ()
+    clean_exclude = ()
+
+    def __init__(self, company, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.company = company
+        self.chunk_size = chunk_size
+        # Filled by after_create() so the refresh only touches what was imported
+        self.created_building_ids = set()
+        self.created_unit_ids = set()
+
+    def run(self, rows):
+        result = ImportResult()
+        numbered = enumerate(rows, start=2)  # row 1 is the header
+        for chunk in chunked(numbered, self.chunk_size):
+            self.import_chunk(chunk, result)
+        if result.created:
+            refresh_property_aggregates(
+                self.company.pk, building_ids=self.created_building_ids, unit_ids=self.created_unit_ids,
+            )
+            comparables.invalidate(self.company.pk)
+        return result
+
+    def import_chunk(self, chunk, result):
+        context = self.prefetch([row for _, row in chunk])
+        instances = []
+        for row_number, row in chunk:
+            try:
+                missing = [column for column in self.required_columns if not row.get(column)]
+                if missing:
+                    raise ValidationError(f"Missing required value(s): {', '.join(missing)}")
+                instance = self.build(row, context)
+                instance.clean_fields(exclude=self.clean_fields_exclude(instance))
+            except ValidationError as e:
+                result.reject(row_number, row, e)
+                continue
+            self.accept(instance, context)
+            instances.append(instance)
+
+        with transaction.atomic():
+            created = self.model.objects.bulk_create(instances)
+            self.after_create(created)
+        result.created += len(created)
+        logger.info(f"Imported {len(created)} {self.model._meta.verbose_name_plural} for company {self.company.pk}")
+
+    def clean_fields_exclude(self, instance):
+        # Unset nullable columns are allowed on import even where the form requires them
+        return set(self.clean_exclude) | {
+            field.name for field in self.model._meta.concrete_fields
+            if field.null and getattr(instance, field.attname) is None
+        }
+
+    def prefetch(self, rows):
+        return {}
+
+    @abstractmethod
+    def build(self, row, context):
+        """Return the unsaved instance for a row, or raise ValidationError"""
+
+    def accept(self, instance, context):
+        pass
+
+    def after_create(self, instances):
+        pass
+
+    def field_value(self, row, name):
+        """Convert a raw cell with the model field's own parser ('' means unset)"""
+        field = self.model._meta.get_field(name)
+        value = row.get(name, '')
+        if value == '':
+            return field.get_default()
+        return field.to_python(value)
+
+
+class BuildingImporter(BaseImporter):
+    """Columns: name, building_type, estate (name), address, managing"""
+    model = Building
+    required_columns = ('name',)
+    clean_exclude = ('company', 'estate')
+
+    def prefetch(self, rows):
+        names = {row['estate'] for row in rows if row.get('estate')}
+        estates = {}
+        for estate in Estate.objects.filter(company=self.company, name__in=names):
+            estates.setdefault(estate.name, []).append(estate)
+        return {'estates': estates}
+
+    def build(self, row, context):
+        estate = None
+        if row.get('estate'):
+            matches = context['estates'].get(row['estate'], [])
+            if len(matches) != 1:
+                raise ValidationError(
+                    f"Estate '{row['estate']}' not found" if not matches
+                    else f"Estate name '{row['estate']}' is ambiguous"
+                )
+            estate = matches[0]
+
+        building_type = BuildingTypeEnums.MULTI_UNIT
+        if row.get('building_type'):
+            building_type = parse_choice(row['building_type'], BuildingTypeEnums, 'building_type')
+
+        return Building(
+            company=self.company,
+            estate=estate,
+            name=row['name'],
+            building_type=building_type,
+            address=row.get('address') or None,
+            managing=parse_bool(row.get('managing', '')),
+        )
+
+    def after_create(self, buildings):
+        # Building.save() creates the house of a single unit building; bulk_create skips save()
+        houses = Unit.objects.bulk_create([
+            Unit(building=building, company=self.company, number=1, unit_type=UnitTypeEnums.HOUSE)
+            for building in buildings if building.building_type == BuildingTypeEnums.SINGLE_UNIT
+        ])
+        self.created_building_ids.update(building.pk for building in buildings)
+        self.created_unit_ids.update(house.pk for house in houses)
+        units_bulk_changed.send(sender=Unit, unit_ids=[house.pk for house in houses])
+
+
+class UnitImporter(BaseImporter):
+    """
+    Columns: building (name), number, unit_type, bedrooms, bathrooms, square_footage,
+    furnished, parking_spots, base_rent, deposit_amount, available_from, is_vacant
+    """
+    model = Unit
+    required_columns = ('building', 'number')
+    clean_exclude = ('company', 'building', 'amenities', 'features')
+    value_fields = (
+        'bedrooms', 'bathrooms', 'square_footage', 'parking_spots',
+        'base_rent', 'deposit_amount', 'available_from',
+    )
+
+    def prefetch(self, rows):
+        names = {row['building'] for row in rows if row.get('building')}
+        buildings = {}
+        for building in Building.objects.filter(company=self.company, name__in=names):
+            buildings.setdefault(building.name, []).append(building)
+
+        building_ids = [building.pk for matches in buildings.values() for building in matches]
+        taken_numbers = {}
+        for building_id, number in Unit.objects.filter(building_id__in=building_ids).values_list('building_id', 'number'):
+            taken_numbers.setdefault(building_id, set()).add(number)
+        return {'buildings': buildings, 'taken_numbers': taken_numbers}
+
+    def build(self, row, context):
+        matches = context['buildings'].get(row['building'], [])
+        if len(matches) != 1:
+            raise ValidationError(
+                f"Building '{row['building']}' not found" if not matches
+                else f"Building name '{row['building']}' is ambiguous"
+            )
+        building = matches[0]
+
+        default_type = UnitTypeEnums.HOUSE if building.is_standalone else UnitTypeEnums.APARTMENT
+        unit_type = default_type
+        if row.get('unit_type'):
+            unit_type = parse_choice(row['unit_type'], UnitTypeEnums, 'unit_type')
+
+        number = row['number']
+        building_numbers = context['taken_numbers'].get(building.pk, set())
+        validate_unit_placement(building.building_type, unit_type, building_has_other_units=bool(building_numbers))
+        if number in building_numbers:
+            raise ValidationError(f"Unit {number} already exists in {building.name}")
+
+        return Unit(
+            building=building,
+            company=self.company,
+            number=number,
+            unit_type=unit_type,
+            furnished=parse_bool(row.get('furnished', '')),
+            is_vacant=parse_bool(row.get('is_vacant', ''), default=True),
+            **{name: self.field_value(row, name) for name in self.value_fields},
+        )
+
+    def accept(self, unit, context):
+        # Later rows in the same file must see this unit number as taken
+        context['taken_numbers'].setdefault(unit.building_id, set()).add(unit.number)
+
+    def after_create(self, units):
+        self.created_unit_ids.update(unit.pk for unit in units)
+        units_bulk_changed.send(sender=Unit, unit_ids=[unit.pk for unit in units])
+
+
+IMPORTERS = {
+    'buildings': BuildingImporter,
+    'units': UnitImporter,
+}
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from myrealestate.companies.models import Company
+from ...importers import IMPORTERS, DEFAULT_CHUNK_SIZE, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import buildings or units for a company from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument('--company', type=int, required=True, help='Company id to import into')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--errors', help='Where to write the CSV report of rejected rows')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} does not exist")
+
+        importer = IMPORTERS[options['kind']](company, chunk_size=options['chunk_size'])
+        with open(options['path'], 'rb') as f:
+            result = importer.run(read_rows(f, options['path']))
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.created} {options['kind']}"))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected {result.rejected} rows"))
+            if options['errors']:
+                with open(options['errors'], 'w', newline='') as report:
+                    result.write_error_report(report)
+                self.stdout.write(f"Error report written to {options['errors']}")
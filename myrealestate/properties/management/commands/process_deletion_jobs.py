@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from ...deletion import DEFAULT_BATCH_SIZE, delete_pending_files, process_deletion_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued estate/building deletions and remove their image files from storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help='Stop after this many jobs')
+        parser.add_argument('--loop', type=int, metavar='SECONDS',
+                            help='Keep polling for new jobs, sleeping this long when idle')
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = process_deletion_jobs(limit=options.get('limit'), batch_size=options['batch_size'])
+            files = delete_pending_files()
+            if jobs or files:
+                self.stdout.write(self.style.SUCCESS(f"Processed {jobs} deletion jobs, removed {files} files"))
+            if not options.get('loop'):
+                break
+            if not jobs and not files:
+                time.sleep(options['loop'])
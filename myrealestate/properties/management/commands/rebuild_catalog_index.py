@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from ...models import Unit
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized amenity/feature id arrays on every unit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild units belonging to this company id')
+
+    def handle(self, *args, **options):
+        unit_ids = None
+        if options.get('company'):
+            unit_ids = Unit.objects.filter(company_id=options['company']).values('pk')
+
+        updated = Unit.objects.rebuild_catalog_index(unit_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt catalog index for {updated} units"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from ...models import PortfolioNode
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized Estate -> Building -> Unit -> SubUnit hierarchy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild nodes belonging to this company id')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        created = PortfolioNode.objects.rebuild(
+            company_id=options.get('company'),
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} portfolio nodes"))
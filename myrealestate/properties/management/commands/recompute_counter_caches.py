@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from ...models import recompute_counter_caches
+
+
+class Command(BaseCommand):
+    help = 'Recompute the building, unit and subunit counter caches with set-based updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only recompute counters for this company id')
+
+    def handle(self, *args, **options):
+        updated = recompute_counter_caches(company_id=options.get('company'))
+        for model, count in updated.items():
+            self.stdout.write(f"{model._meta.verbose_name_plural}: recomputed {count} rows")
+        self.stdout.write(self.style.SUCCESS("Counter caches recomputed"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...models import OccupancyRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per company, estate and building occupancy rollups from the unit tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only reconcile rollups belonging to this company id')
+
+    def handle(self, *args, **options):
+        created = OccupancyRollup.objects.reconcile(company_id=options.get('company'))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {created} occupancy rollups"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from myrealestate.companies.models import Company
+from ...models import OccupancyInterval
+
+
+class Command(BaseCommand):
+    help = 'Close and open occupancy history spans so they match the current unit and subunit state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only sync the history of this company id')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options.get('company'):
+            companies = companies.filter(pk=options['company'])
+        opened = sum(OccupancyInterval.objects.sync(company_id) for company_id in companies.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Opened {opened} occupancy history spans"))
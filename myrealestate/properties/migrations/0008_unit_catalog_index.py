@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:10
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0007_auto_20250224_1937'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unit',
+            name='amenity_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='feature_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['amenity_ids'], name='unit_amenity_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['feature_ids'], name='unit_feature_ids_gin'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+INSERT INTO properties_portfolionode (company_id, node_type, object_id, path, depth, is_vacant)
+SELECT company_id, 'E', id, 'e' || id || '/', 1, NULL
+FROM properties_estate;
+
+INSERT INTO properties_portfolionode (company_id, node_type, object_id, path, depth, is_vacant)
+SELECT company_id, 'B', id, path, length(path) - length(replace(path, '/', '')), NULL
+FROM (
+    SELECT company_id, id, COALESCE('e' || estate_id || '/', '') || 'b' || id || '/' AS path
+    FROM properties_building
+) buildings;
+
+INSERT INTO properties_portfolionode (company_id, node_type, object_id, path, depth, is_vacant)
+SELECT company_id, 'U', id, path, length(path) - length(replace(path, '/', '')), is_vacant
+FROM (
+    SELECT u.company_id, u.id, u.is_vacant,
+           COALESCE('e' || b.estate_id || '/', '') || 'b' || b.id || '/u' || u.id || '/' AS path
+    FROM properties_unit u
+    JOIN properties_building b ON b.id = u.building_id
+) units;
+
+INSERT INTO properties_portfolionode (company_id, node_type, object_id, path, depth, is_vacant)
+SELECT company_id, 'S', id, path, length(path) - length(replace(path, '/', '')), is_vacant
+FROM (
+    SELECT u.company_id, s.id, s.is_vacant,
+           COALESCE('e' || b.estate_id || '/', '') || 'b' || b.id || '/u' || u.id || '/s' || s.id || '/' AS path
+    FROM properties_subunit s
+    JOIN properties_unit u ON u.id = s.parent_unit_id
+    JOIN properties_building b ON b.id = u.building_id
+) subunits;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0008_unit_catalog_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_type', models.CharField(choices=[('E', 'Estate'), ('B', 'Building'), ('U', 'Unit'), ('S', 'SubUnit')], max_length=1)),
+                ('object_id', models.BigIntegerField()),
+                ('path', models.CharField(max_length=255)),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('is_vacant', models.BooleanField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_nodes', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['path'], name='portfolio_node_path_like', opclasses=['varchar_pattern_ops']), models.Index(fields=['company', 'node_type'], name='properties__company_68d454_idx')],
+                'constraints': [models.UniqueConstraint(fields=('node_type', 'object_id'), name='unique_portfolio_node')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# One statement per scope (company, estate, building), combining the unit and the
+# subunit aggregates of each scope the way OccupancyRollupManager.reconcile() does
+BACKFILL_TEMPLATE = """
+INSERT INTO properties_occupancyrollup (
+    company_id, scope_type, scope_id, total_units, vacant_units, tenanted_units,
+    total_subunits, vacant_subunits, potential_rent, actual_rent
+)
+SELECT COALESCE(units.company_id, subunits.company_id), '{scope_type}', COALESCE(units.scope_id, subunits.scope_id),
+       COALESCE(units.total, 0), COALESCE(units.vacant, 0), COALESCE(units.tenanted, 0),
+       COALESCE(subunits.total, 0), COALESCE(subunits.vacant, 0),
+       COALESCE(units.potential_rent, 0), COALESCE(units.actual_rent, 0)
+FROM (
+    SELECT {unit_scope} AS scope_id, MIN(u.company_id) AS company_id, COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE u.is_vacant) AS vacant, COUNT(u.main_tenant_id) AS tenanted,
+           SUM(u.base_rent) AS potential_rent, SUM(u.base_rent) FILTER (WHERE NOT u.is_vacant) AS actual_rent
+    FROM properties_unit u
+    JOIN properties_building b ON b.id = u.building_id
+    GROUP BY {unit_scope}
+) units
+FULL OUTER JOIN (
+    SELECT {unit_scope} AS scope_id, MIN(u.company_id) AS company_id, COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE s.is_vacant) AS vacant
+    FROM properties_subunit s
+    JOIN properties_unit u ON u.id = s.parent_unit_id
+    JOIN properties_building b ON b.id = u.building_id
+    GROUP BY {unit_scope}
+) subunits ON subunits.scope_id = units.scope_id
+WHERE COALESCE(units.scope_id, subunits.scope_id) IS NOT NULL;
+"""
+
+BACKFILL_SQL = ''.join(
+    BACKFILL_TEMPLATE.format(scope_type=scope_type, unit_scope=unit_scope)
+    for scope_type, unit_scope in (('C', 'u.company_id'), ('E', 'b.estate_id'), ('B', 'u.building_id'))
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0009_portfolio_node'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope_type', models.CharField(choices=[('C', 'Company'), ('E', 'Estate'), ('B', 'Building')], max_length=1)),
+                ('scope_id', models.BigIntegerField()),
+                ('total_units', models.IntegerField(default=0)),
+                ('vacant_units', models.IntegerField(default=0)),
+                ('tenanted_units', models.IntegerField(default=0)),
+                ('total_subunits', models.IntegerField(default=0)),
+                ('vacant_subunits', models.IntegerField(default=0)),
+                ('potential_rent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actual_rent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_rollups', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'scope_type'], name='properties__company_bee9ac_idx')],
+                'constraints': [models.UniqueConstraint(fields=('scope_type', 'scope_id'), name='unique_occupancy_rollup_scope')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:17
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+UPDATE properties_estate e
+SET total_buildings = (SELECT COUNT(*) FROM properties_building b WHERE b.estate_id = e.id);
+
+UPDATE properties_building b
+SET total_units = (SELECT COUNT(*) FROM properties_unit u WHERE u.building_id = b.id);
+
+UPDATE properties_unit u
+SET total_subunits = (SELECT COUNT(*) FROM properties_subunit s WHERE s.parent_unit_id = u.id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_occupancy_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='total_units',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='total_subunits',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='estate',
+            name='total_buildings',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
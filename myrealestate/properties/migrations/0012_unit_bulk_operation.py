@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0011_counter_caches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitBulkOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('filters', models.JSONField(blank=True, default=dict, help_text='Filters that selected the units')),
+                ('rent_change_type', models.CharField(blank=True, choices=[('P', 'Percentage'), ('A', 'Absolute Amount')], max_length=1, null=True)),
+                ('rent_change', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('deposit_change_type', models.CharField(blank=True, choices=[('P', 'Percentage'), ('A', 'Absolute Amount')], max_length=1, null=True)),
+                ('deposit_change', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('set_vacant', models.BooleanField(blank=True, null=True)),
+                ('rounding', models.CharField(choices=[('0.01', 'Nearest cent'), ('1', 'Nearest 1'), ('10', 'Nearest 10'), ('50', 'Nearest 50'), ('100', 'Nearest 100')], default='0.01', max_length=4)),
+                ('units_affected', models.IntegerField(default=0)),
+                ('rent_before', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rent_after', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deposit_before', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deposit_after', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unit_bulk_operations', to='companies.company')),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unit_bulk_operations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+UPDATE properties_subunit s
+SET company_id = u.company_id
+FROM properties_unit u
+WHERE u.id = s.parent_unit_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0012_unit_bulk_operation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subunit',
+            name='company',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='owned_subunits', to='companies.company'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='subunit',
+            name='company',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='owned_subunits', to='companies.company'),
+        ),
+        migrations.AddIndex(
+            model_name='subunit',
+            index=models.Index(fields=['company', 'is_vacant'], name='properties__company_13e190_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subunit',
+            index=models.Index(fields=['company', 'base_rent'], name='properties__company_0f8b1d_idx'),
+        ),
+    ]
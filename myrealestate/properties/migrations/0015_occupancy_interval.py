@@ -0,0 +1,59 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:55
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Open a span for the current state of every unit and subunit, dated from when it was created
+BACKFILL_SQL = """
+INSERT INTO properties_occupancyinterval
+    (company_id, node_type, object_id, building_id, estate_id, is_vacant, tenant_id, period)
+SELECT u.company_id, 'U', u.id, u.building_id, b.estate_id, u.is_vacant, u.main_tenant_id,
+       daterange(u.created_at::date, NULL)
+FROM properties_unit u
+JOIN properties_building b ON b.id = u.building_id
+WHERE NOT u.is_deleted;
+
+INSERT INTO properties_occupancyinterval
+    (company_id, node_type, object_id, building_id, estate_id, is_vacant, tenant_id, period)
+SELECT s.company_id, 'S', s.id, u.building_id, b.estate_id, s.is_vacant, s.sublet_tenant_id,
+       daterange(s.created_at::date, NULL)
+FROM properties_subunit s
+JOIN properties_unit u ON u.id = s.parent_unit_id
+JOIN properties_building b ON b.id = u.building_id
+WHERE NOT s.is_deleted;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_remove_company_contact_email_and_more'),
+        ('properties', '0014_soft_delete_and_deletion_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_type', models.CharField(choices=[('E', 'Estate'), ('B', 'Building'), ('U', 'Unit'), ('S', 'SubUnit')], max_length=1)),
+                ('object_id', models.BigIntegerField()),
+                ('building_id', models.BigIntegerField(blank=True, null=True)),
+                ('estate_id', models.BigIntegerField(blank=True, null=True)),
+                ('is_vacant', models.BooleanField()),
+                ('period', django.contrib.postgres.fields.ranges.DateRangeField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_intervals', to='companies.company')),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['period'], name='occupancy_period_gist'), models.Index(fields=['company', 'node_type'], name='properties__company_877c78_idx'), models.Index(fields=['node_type', 'object_id'], name='properties__node_ty_b82f9c_idx'), models.Index(fields=['building_id'], name='properties__buildin_5a7c85_idx'), models.Index(fields=['estate_id'], name='properties__estate__46f5df_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('period__endswith__isnull', True)), fields=('node_type', 'object_id'), name='unique_open_occupancy_interval')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,20 @@
-from django.db import models
-from django.db.models import Q, Count, Exists, OuterRef
+from django.db import connection, models, transaction
+from django.db.models import Q, Count, Exists, OuterRef, F, Func, Prefetch, Subquery, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.contrib.postgres.fields import ArrayField, DateRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.expressions import ArraySubquery
+from django.dispatch import Signal
 from django.utils import timezone
+from django.db.backends.postgresql.psycopg_any import DateRange
 from django.core.exceptions import ValidationError
-from myrealestate.common.models import BaseModel
+from myrealestate.common.models import BaseModel, CounterCacheMixin, LoadedValuesMixin, SoftDeleteManager
 from myrealestate.accounts.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal
 
 from myrealestate.common.storage import CustomS3Boto3Storage
 import logging
@@ -34,13 +41,39 @@ class SubUnitTypeEnums(models.TextChoices):
    STORE = 'S', 'Store'
    OFFICE = 'O', 'Office'
 
-class BuildingManager(models.Manager):
-   def get_queryset(self):
-       return super().get_queryset()
+class RollupScopeEnums(models.TextChoices):
+   COMPANY = 'C', 'Company'
+   ESTATE = 'E', 'Estate'
+   BUILDING = 'B', 'Building'
+
+class PortfolioNodeTypeEnums(models.TextChoices):
+   ESTATE = 'E', 'Estate'
+   BUILDING = 'B', 'Building'
+   UNIT = 'U', 'Unit'
+   SUBUNIT = 'S', 'SubUnit'
+
+class BulkChangeTypeEnums(models.TextChoices):
+   PERCENTAGE = 'P', 'Percentage'
+   ABSOLUTE = 'A', 'Absolute Amount'
+
+class RentRoundingEnums(models.TextChoices):
+   CENT = '0.01', 'Nearest cent'
+   UNIT = '1', 'Nearest 1'
+   TEN = '10', 'Nearest 10'
+   FIFTY = '50', 'Nearest 50'
+   HUNDRED = '100', 'Nearest 100'
+
+class DeletionJobStatusEnums(models.TextChoices):
+   PENDING = 'P', 'Pending'
+   RUNNING = 'R', 'Running'
+   DONE = 'D', 'Done'
+   FAILED = 'F', 'Failed'
+
+class BuildingManager(SoftDeleteManager):
    
    def with_vacancy_status(self):
+       # total_units is a counter cache column, only the vacant count needs aggregating
        return self.annotate(
-           total_units=Count('units'),
            vacant_units=Count('units', filter=Q(units__is_vacant=True))
        )
    
@@ -53,11 +86,11 @@ class BuildingManager(models.Manager):
    def with_available_units(self):
        return self.filter(units__is_vacant=True).distinct()
 
-class Estate(BaseModel):
+class Estate(CounterCacheMixin, BaseModel):
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=500, null=True, blank=True)
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="owned_estates")
-    total_buildings = models.IntegerField(default=0)
+    total_buildings = models.IntegerField(default=0, editable=False)
     amenities = models.ManyToManyField(
         'Amenity',
         through='EstateAmenityRelation',
@@ -66,11 +99,17 @@ class Estate(BaseModel):
     estate_type = models.CharField(max_length=1, choices=EstateTypeEnums.choices, default=EstateTypeEnums.RESIDENTIAL)
     managing = models.BooleanField(default=False, help_text="Select if you or your company is managing this estate")
     images = GenericRelation('PropertyImage', related_query_name='estate')
+    is_deleted = models.BooleanField(default=False, editable=False)
+
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
+    counter_cache_fields = ('total_buildings',)
 
     def __str__(self):
         return self.name
 
-class Building(BaseModel):
+class Building(CounterCacheMixin, LoadedValuesMixin, BaseModel):
     estate = models.ForeignKey(Estate, on_delete=models.CASCADE, related_name="buildings", null=True, blank=True)
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="owned_buildings")
     name = models.CharField(max_length=255)
@@ -78,8 +117,13 @@ class Building(BaseModel):
     address = models.CharField(max_length=500, null=True, blank=True)
     managing = models.BooleanField(default=False, help_text="Select if you or your company is managing this building")
     images = GenericRelation('PropertyImage', related_query_name='building')
+    total_units = models.IntegerField(default=0, editable=False)
+    is_deleted = models.BooleanField(default=False, editable=False)
 
     objects = BuildingManager()
+    all_objects = models.Manager()
+
+    counter_cache_fields = ('total_units',)
 
     class Meta:
        indexes = [
@@ -99,9 +143,9 @@ class Building(BaseModel):
         '''
         Ensure that when object is created and unit type is multi unit, a unit is created
         '''
-        instance_exists = Building.objects.filter(pk=self.pk).exists()
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        if not instance_exists and self.building_type == BuildingTypeEnums.SINGLE_UNIT:
+        if adding and self.building_type == BuildingTypeEnums.SINGLE_UNIT:
             Unit.objects.create(building=self, company=self.company, number=1, unit_type=UnitTypeEnums.HOUSE)
 
 
@@ -118,9 +162,7 @@ class Building(BaseModel):
             return f"{self.name} in {self.estate.name}"
         return self.name
 
-class UnitManager(models.Manager):
-   def get_queryset(self):
-       return super().get_queryset()
+class UnitManager(SoftDeleteManager):
    
    def available(self):
        return self.filter(
@@ -129,8 +171,8 @@ class UnitManager(models.Manager):
        )
    
    def with_subletting_info(self):
+       # total_subunits is a counter cache column, only the vacant count needs aggregating
        return self.annotate(
-           total_subunits=Count('subunits'),
            vacant_subunits=Count('subunits', filter=Q(subunits__is_vacant=True))
        )
    
@@ -154,7 +196,83 @@ class UnitManager(models.Manager):
            query = query.filter(base_rent__lte=max_price)
        return query
 
-class Unit(BaseModel):
+   def with_grouped_amenities(self):
+       """Units with amenity and feature relations prefetched, see prefetch_unit_catalog()"""
+       return prefetch_unit_catalog(self.all())
+
+   def with_all_amenities(self, amenities):
+       """Units that have every one of the given amenities (objects or ids)"""
+       return self.filter(amenity_ids__contains=_catalog_ids(amenities))
+
+   def with_all_features(self, features):
+       """Units that have every one of the given features (objects or ids)"""
+       return self.filter(feature_ids__contains=_catalog_ids(features))
+
+   def rebuild_catalog_index(self, unit_ids=None):
+       """
+       Recompute amenity_ids/feature_ids from the relation tables in a single UPDATE.
+       Pass unit_ids to limit the rebuild, otherwise every unit is rebuilt.
+       """
+       query = self.all()
+       if unit_ids is not None:
+           query = query.filter(pk__in=unit_ids)
+       return query.update(
+           amenity_ids=ArraySubquery(
+               UnitAmenityRelation.objects.filter(unit=OuterRef('pk')).order_by('amenity_id').values('amenity_id')
+           ),
+           feature_ids=ArraySubquery(
+               UnitFeatureRelation.objects.filter(unit=OuterRef('pk')).order_by('feature_id').values('feature_id')
+           ),
+       )
+
+
+def validate_unit_placement(building_type, unit_type, building_has_other_units=False):
+    """
+    Rules for which units a building may hold. Shared by Unit.clean and the bulk importer,
+    which checks many rows against prefetched building data.
+    """
+    if building_type == BuildingTypeEnums.SINGLE_UNIT and building_has_other_units:
+        raise ValidationError("Single unit buildings can only have one unit")
+
+    if building_type == BuildingTypeEnums.MULTI_UNIT:
+        if unit_type != UnitTypeEnums.APARTMENT:
+            raise ValidationError("Multi-unit buildings can only have apartment units")
+    elif building_type == BuildingTypeEnums.SINGLE_UNIT:
+        if unit_type != UnitTypeEnums.HOUSE:
+            raise ValidationError("Single unit buildings can only be houses")
+
+
+def prefetch_unit_catalog(units):
+   """
+   Load the amenity and feature relations (with their catalog rows) of many units in
+   two queries, so get_amenities_by_category/get_features_by_category group in memory.
+   Takes a queryset (returned with the prefetch added) or a list of units (prefetched in place).
+   """
+   lookups = [
+       Prefetch('amenity_relations', queryset=UnitAmenityRelation.objects.select_related('amenity').order_by('amenity__category', 'amenity__name')),
+       Prefetch('feature_relations', queryset=UnitFeatureRelation.objects.select_related('feature').order_by('feature__category', 'feature__name')),
+   ]
+   if isinstance(units, models.QuerySet):
+       return units.prefetch_related(*lookups)
+   prefetch_related_objects(units, *lookups)
+   return units
+
+
+def _catalog_ids(items):
+    return sorted({getattr(item, 'pk', item) for item in items})
+
+
+class ArrayAppend(Func):
+    function = 'array_append'
+    arity = 2
+
+
+class ArrayRemove(Func):
+    function = 'array_remove'
+    arity = 2
+
+
+class Unit(CounterCacheMixin, LoadedValuesMixin, BaseModel):
     building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name="units")
     company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="owned_units")
 
@@ -182,7 +300,18 @@ class Unit(BaseModel):
     images = GenericRelation('PropertyImage', related_query_name='unit')
     parking_spots = models.IntegerField(default=0)
 
+    # Denormalized copies of the amenity/feature relations so that "has all of X, Y, Z"
+    # is a single GIN-backed containment check. Maintained by add_amenity/add_feature
+    # and the signals in properties.signals; rebuild with `manage.py rebuild_catalog_index`.
+    amenity_ids = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    feature_ids = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    total_subunits = models.IntegerField(default=0, editable=False)
+    is_deleted = models.BooleanField(default=False, editable=False)
+
     objects = UnitManager()
+    all_objects = models.Manager()
+
+    counter_cache_fields = ('total_subunits', 'amenity_ids', 'feature_ids')
 
     class Meta:
        indexes = [
@@ -192,21 +321,20 @@ class Unit(BaseModel):
            models.Index(fields=['building', 'is_vacant']),
            models.Index(fields=['available_from']),
            models.Index(fields=['bedrooms']),
+           GinIndex(fields=['amenity_ids'], name='unit_amenity_ids_gin'),
+           GinIndex(fields=['feature_ids'], name='unit_feature_ids_gin'),
        ]
        unique_together = ['building', 'number']
 
     def clean(self):
-       if self.building.building_type == BuildingTypeEnums.SINGLE_UNIT:
-           if self.building.units.exclude(pk=self.pk).exists():
-               raise ValidationError("Single unit buildings can only have one unit")
-           # self.number = self.building.name
-           
-       if self.building.building_type == BuildingTypeEnums.MULTI_UNIT:
-           if self.unit_type != UnitTypeEnums.APARTMENT:
-               raise ValidationError("Multi-unit buildings can only have apartment units")
-       elif self.building.building_type == BuildingTypeEnums.SINGLE_UNIT:
-           if self.unit_type != UnitTypeEnums.HOUSE:
-               raise ValidationError("Single unit buildings can only be houses")
+       validate_unit_placement(
+           self.building.building_type,
+           self.unit_type,
+           building_has_other_units=(
+               self.building.building_type == BuildingTypeEnums.SINGLE_UNIT
+               and self.building.units.exclude(pk=self.pk).exists()
+           ),
+       )
 
     @property
     def is_standalone_house(self):
@@ -224,45 +352,61 @@ class Unit(BaseModel):
 
     def add_amenity(self, amenity, details=''):
         """Add an amenity with optional details"""
-        return UnitAmenityRelation.objects.create(
+        relation = UnitAmenityRelation.objects.create(
             unit=self,
             amenity=amenity,
             details=details
         )
+        self._append_catalog_id('amenity_ids', relation.amenity_id)
+        return relation
 
     def add_feature(self, feature, details=''):
         """Add a feature with optional details"""
-        return UnitFeatureRelation.objects.create(
+        relation = UnitFeatureRelation.objects.create(
             unit=self,
             feature=feature,
             details=details
         )
+        self._append_catalog_id('feature_ids', relation.feature_id)
+        return relation
+
+    def _append_catalog_id(self, field_name, item_id):
+        """Append an id to one of the catalog index arrays without a read-modify-write"""
+        Unit.objects.filter(pk=self.pk).exclude(**{f'{field_name}__contains': [item_id]}).update(**{
+            field_name: ArrayAppend(F(field_name), Value(item_id), output_field=ArrayField(models.BigIntegerField()))
+        })
+        current = getattr(self, field_name) or []
+        if item_id not in current:
+            setattr(self, field_name, sorted(current + [item_id]))
 
     def get_amenities_by_category(self):
         """Get amenities grouped by category"""
-        from itertools import groupby
-        return {
-            category: list(amenities) 
-            for category, amenities in groupby(
-                self.amenity_relations.select_related('amenity').order_by('amenity__category'),
-                key=lambda x: x.amenity.category
-            )
-        }
+        return self._relations_by_category('amenity_relations', 'amenity')
 
     def get_features_by_category(self):
         """Get features grouped by category"""
-        from itertools import groupby
-        return {
-            category: list(features)
-            for category, features in groupby(
-                self.feature_relations.select_related('feature').order_by('feature__category'),
-                key=lambda x: x.feature.category
+        return self._relations_by_category('feature_relations', 'feature')
+
+    def _relations_by_category(self, relation_name, item_name):
+        # Relations prefetched by prefetch_unit_catalog() are grouped once and kept on the unit
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get(relation_name)
+        if prefetched is None:
+            return self._group_by_category(
+                getattr(self, relation_name).select_related(item_name).order_by(f'{item_name}__category'), item_name
             )
-        }
+        groups = self.__dict__.setdefault('_grouped_relations', {})
+        if relation_name not in groups:
+            groups[relation_name] = self._group_by_category(prefetched, item_name)
+        return groups[relation_name]
 
-class SubUnitManager(models.Manager):
-   def get_queryset(self):
-       return super().get_queryset()
+    @staticmethod
+    def _group_by_category(relations, item_name):
+        grouped = {}
+        for relation in relations:
+            grouped.setdefault(getattr(relation, item_name).category, []).append(relation)
+        return grouped
+
+class SubUnitManager(SoftDeleteManager):
    
    def available(self):
        return self.filter(
@@ -278,8 +422,10 @@ class SubUnitManager(models.Manager):
            query = query.filter(base_rent__lte=max_price)
        return query
 
-class SubUnit(BaseModel):
+class SubUnit(LoadedValuesMixin, BaseModel):
    parent_unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name="subunits")
+   # Denormalized from parent_unit so tenant filtering is a single-table index scan
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="owned_subunits", editable=False)
    number = models.CharField(max_length=50)
    subunit_type = models.CharField(max_length=1, choices=SubUnitTypeEnums.choices, default=SubUnitTypeEnums.ROOM)
    sublet_tenant = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="subunits")
@@ -289,8 +435,10 @@ class SubUnit(BaseModel):
    deposit_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True)
    is_vacant = models.BooleanField(default=True)
    images = GenericRelation('PropertyImage', related_query_name='subunit')
+   is_deleted = models.BooleanField(default=False, editable=False)
 
    objects = SubUnitManager()
+   all_objects = models.Manager()
 
    class Meta:
        indexes = [
@@ -298,13 +446,865 @@ class SubUnit(BaseModel):
            models.Index(fields=['base_rent']),
            models.Index(fields=['available_from']),
            models.Index(fields=['parent_unit', 'is_vacant']),
+           models.Index(fields=['company', 'is_vacant']),
+           models.Index(fields=['company', 'base_rent']),
        ]
 
+   def save(self, *args, **kwargs):
+       self.company_id = self.parent_unit.company_id
+       super().save(*args, **kwargs)
+
    def __str__(self):
        return f"SubUnit {self.number} in {self.parent_unit}"
    
 
 
+class PortfolioNodeManager(models.Manager):
+   def node_type_for(self, obj):
+       return PORTFOLIO_NODE_TYPES[obj.__class__]
+
+   def path_for(self, obj):
+       """
+       Build the materialized path of a property, e.g. 'e4/b12/u90/s301/'.
+       Uses the parent's stored node when there is one so that a save costs one lookup.
+       """
+       node_type = self.node_type_for(obj)
+       segment = f"{node_type.lower()}{obj.pk}/"
+       if node_type == PortfolioNodeTypeEnums.ESTATE:
+           return segment
+       if node_type == PortfolioNodeTypeEnums.BUILDING:
+           return f"e{obj.estate_id}/{segment}" if obj.estate_id else segment
+
+       if node_type == PortfolioNodeTypeEnums.UNIT:
+           parent_type, parent_id = PortfolioNodeTypeEnums.BUILDING, obj.building_id
+       else:
+           parent_type, parent_id = PortfolioNodeTypeEnums.UNIT, obj.parent_unit_id
+       parent_path = self.filter(node_type=parent_type, object_id=parent_id).values_list('path', flat=True).first()
+       if parent_path is None:
+           parent = obj.building if node_type == PortfolioNodeTypeEnums.UNIT else obj.parent_unit
+           parent_path = self.path_for(parent)
+       return parent_path + segment
+
+   def sync(self, obj):
+       """Create or move the node for a saved property, re-rooting its subtree if the parent changed"""
+       node_type = self.node_type_for(obj)
+       path = self.path_for(obj)
+       values = {
+           'company_id': obj.company_id,
+           'depth': path.count('/'),
+           'is_vacant': getattr(obj, 'is_vacant', None),
+       }
+       old_path = self.filter(node_type=node_type, object_id=obj.pk).values_list('path', flat=True).first()
+       if old_path is None:
+           return self.create(node_type=node_type, object_id=obj.pk, path=path, **values)
+
+       if old_path != path:
+           # Rewrite the prefix of every descendant in one UPDATE
+           self.filter(path__startswith=old_path).update(
+               path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+               depth=F('depth') + (path.count('/') - old_path.count('/')),
+           )
+       self.filter(node_type=node_type, object_id=obj.pk).update(**values)
+
+   def remove(self, obj):
+       """Drop the node of a deleted property together with its whole subtree"""
+       path = self.filter(node_type=self.node_type_for(obj), object_id=obj.pk).values_list('path', flat=True).first()
+       if path is not None:
+           self.filter(path__startswith=path).delete()
+
+   def rebuild(self, company_id=None, batch_size=2000, building_ids=None, unit_ids=None):
+       """
+       Recreate all nodes from the property tables. Paths are derived from joined ids
+       so each level is one streamed query followed by batched inserts.
+       Pass building_ids and/or unit_ids to recreate only the nodes of those buildings
+       and of those units with their subunits, e.g. after they were bulk created.
+       """
+       def scoped(queryset):
+           return queryset.filter(company_id=company_id) if company_id else queryset
+
+       estates = scoped(Estate.objects.all())
+       buildings = scoped(Building.objects.all())
+       units = scoped(Unit.objects.all())
+       subunits = scoped(SubUnit.objects.all())
+       nodes = scoped(self.all())
+       if building_ids is not None or unit_ids is not None:
+           estates = estates.none()
+           buildings = buildings.filter(pk__in=building_ids or [])
+           units = units.filter(pk__in=unit_ids or [])
+           subunits = subunits.filter(parent_unit_id__in=unit_ids or [])
+           nodes = nodes.filter(
+               Q(node_type=PortfolioNodeTypeEnums.BUILDING, object_id__in=building_ids or [])
+               | Q(node_type=PortfolioNodeTypeEnums.UNIT, object_id__in=unit_ids or [])
+               | Q(node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id__in=subunits.values('pk'))
+           )
+
+       sources = [
+           (PortfolioNodeTypeEnums.ESTATE, estates.values_list(
+               'pk', 'company_id', Value(None, output_field=models.BooleanField()))),
+           (PortfolioNodeTypeEnums.BUILDING, buildings.values_list(
+               'pk', 'company_id', Value(None, output_field=models.BooleanField()), 'estate_id')),
+           (PortfolioNodeTypeEnums.UNIT, units.values_list(
+               'pk', 'company_id', 'is_vacant', 'building__estate_id', 'building_id')),
+           (PortfolioNodeTypeEnums.SUBUNIT, subunits.values_list(
+               'pk', 'company_id', 'is_vacant',
+               'parent_unit__building__estate_id', 'parent_unit__building_id', 'parent_unit_id')),
+       ]
+       with transaction.atomic():
+           nodes.delete()
+           created = 0
+           for node_type, rows in sources:
+               batch = []
+               for pk, row_company_id, is_vacant, *ancestors in rows.iterator(chunk_size=batch_size):
+                   path = ''.join(
+                       f"{prefix}{ancestor_id}/"
+                       for prefix, ancestor_id in zip('ebu', ancestors) if ancestor_id is not None
+                   ) + f"{node_type.lower()}{pk}/"
+                   batch.append(self.model(
+                       company_id=row_company_id, node_type=node_type, object_id=pk,
+                       path=path, depth=path.count('/'), is_vacant=is_vacant,
+                   ))
+                   if len(batch) >= batch_size:
+                       created += len(self.bulk_create(batch))
+                       batch = []
+               created += len(self.bulk_create(batch))
+       return created
+
+   def subtree(self, obj, include_self=False):
+       """All nodes under a property, found with a single prefix scan"""
+       path = self.path_for(obj)
+       query = self.filter(path__startswith=path)
+       if not include_self:
+           query = query.exclude(path=path)
+       return query
+
+   def descendant_ids(self, obj, node_type):
+       """Ids of descendants of one type, usable as a pk__in subquery"""
+       return self.subtree(obj).filter(node_type=node_type).values('object_id')
+
+   def rollup(self, obj):
+       """Building, unit and subunit counts (with vacancy) for everything under a property"""
+       nodes = self.subtree(obj)
+       return nodes.aggregate(
+           total_buildings=Count('pk', filter=Q(node_type=PortfolioNodeTypeEnums.BUILDING)),
+           total_units=Count('pk', filter=Q(node_type=PortfolioNodeTypeEnums.UNIT)),
+           vacant_units=Count('pk', filter=Q(node_type=PortfolioNodeTypeEnums.UNIT, is_vacant=True)),
+           total_subunits=Count('pk', filter=Q(node_type=PortfolioNodeTypeEnums.SUBUNIT)),
+           vacant_subunits=Count('pk', filter=Q(node_type=PortfolioNodeTypeEnums.SUBUNIT, is_vacant=True)),
+       )
+
+class PortfolioNode(models.Model):
+   """
+   Materialized path of the Estate -> Building -> Unit -> SubUnit hierarchy.
+   Every property has one node whose path is prefixed by its ancestors' paths,
+   so subtree queries and rollups are a single indexed LIKE 'prefix%' scan.
+   Maintained from model signals, rebuild with `manage.py rebuild_portfolio_hierarchy`.
+   """
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="portfolio_nodes")
+   node_type = models.CharField(max_length=1, choices=PortfolioNodeTypeEnums.choices)
+   object_id = models.BigIntegerField()
+   path = models.CharField(max_length=255)
+   depth = models.PositiveSmallIntegerField()
+   is_vacant = models.BooleanField(null=True, blank=True)
+
+   objects = PortfolioNodeManager()
+
+   class Meta:
+       indexes = [
+           models.Index(fields=['path'], name='portfolio_node_path_like', opclasses=['varchar_pattern_ops']),
+           models.Index(fields=['company', 'node_type']),
+       ]
+       constraints = [
+           models.UniqueConstraint(fields=['node_type', 'object_id'], name='unique_portfolio_node'),
+       ]
+
+   def __str__(self):
+       return f"{self.get_node_type_display()} {self.object_id} ({self.path})"
+
+
+PORTFOLIO_NODE_TYPES = {
+   Estate: PortfolioNodeTypeEnums.ESTATE,
+   Building: PortfolioNodeTypeEnums.BUILDING,
+   Unit: PortfolioNodeTypeEnums.UNIT,
+   SubUnit: PortfolioNodeTypeEnums.SUBUNIT,
+}
+
+
+UNIT_OCCUPANCY_FIELDS = ('company_id', 'building_id', 'is_vacant', 'main_tenant_id', 'base_rent')
+SUBUNIT_OCCUPANCY_FIELDS = ('parent_unit_id', 'is_vacant', 'sublet_tenant_id')
+ROLLUP_COUNTERS = (
+   'total_units', 'vacant_units', 'tenanted_units',
+   'total_subunits', 'vacant_subunits', 'potential_rent', 'actual_rent',
+)
+
+
+UNIT_ROLLUP_TOTALS = {
+   'total_units': Count('pk'),
+   'vacant_units': Count('pk', filter=Q(is_vacant=True)),
+   'tenanted_units': Count('pk', filter=Q(main_tenant__isnull=False)),
+   'potential_rent': Coalesce(Sum('base_rent'), Value(Decimal('0'))),
+   'actual_rent': Coalesce(Sum('base_rent', filter=Q(is_vacant=False)), Value(Decimal('0'))),
+}
+SUBUNIT_ROLLUP_TOTALS = {
+   'total_subunits': Count('pk'),
+   'vacant_subunits': Count('pk', filter=Q(is_vacant=True)),
+}
+
+
+def unit_occupancy_contribution(values):
+   """What one unit adds to the rollups of every scope it belongs to"""
+   if values is None:
+       return {}
+   base_rent = values['base_rent'] or Decimal('0')
+   return {
+       'total_units': 1,
+       'vacant_units': int(values['is_vacant']),
+       'tenanted_units': int(values['main_tenant_id'] is not None),
+       'potential_rent': base_rent,
+       'actual_rent': Decimal('0') if values['is_vacant'] else base_rent,
+   }
+
+
+def subunit_occupancy_contribution(values):
+   """What one subunit adds to the rollups of every scope it belongs to"""
+   if values is None:
+       return {}
+   return {'total_subunits': 1, 'vacant_subunits': int(values['is_vacant'])}
+
+
+class OccupancyRollupManager(models.Manager):
+   def for_object(self, obj):
+       """Rollup row for a Company, Estate or Building (None if nothing has been recorded)"""
+       scope_type = {
+           'company': RollupScopeEnums.COMPANY,
+           'estate': RollupScopeEnums.ESTATE,
+           'building': RollupScopeEnums.BUILDING,
+       }[obj._meta.model_name]
+       return self.filter(scope_type=scope_type, scope_id=obj.pk).first()
+
+   def apply_deltas(self, deltas):
+       """
+       Apply {(scope_type, scope_id, company_id): {counter: delta}} with F-expression
+       updates, creating missing rows on first touch.
+       """
+       for (scope_type, scope_id, company_id), delta in deltas.items():
+           delta = {field: value for field, value in delta.items() if value}
+           if not delta or scope_id is None:
+               continue
+           changes = {field: F(field) + value for field, value in delta.items()}
+           if not self.filter(scope_type=scope_type, scope_id=scope_id).update(**changes):
+               self.get_or_create(scope_type=scope_type, scope_id=scope_id, defaults={'company_id': company_id})
+               self.filter(scope_type=scope_type, scope_id=scope_id).update(**changes)
+
+   def _scopes(self, company_id, estate_id, building_id):
+       return [
+           (RollupScopeEnums.COMPANY, company_id, company_id),
+           (RollupScopeEnums.ESTATE, estate_id, company_id),
+           (RollupScopeEnums.BUILDING, building_id, company_id),
+       ]
+
+   def _unit_scopes(self, unit_values):
+       estate_id = Building.objects.filter(pk=unit_values['building_id']).values_list('estate_id', flat=True).first()
+       return self._scopes(unit_values['company_id'], estate_id, unit_values['building_id'])
+
+   def _subunit_scopes(self, subunit_values):
+       parent = Unit.objects.filter(pk=subunit_values['parent_unit_id']).values(
+           'company_id', 'building_id', 'building__estate_id'
+       ).first()
+       if parent is None:
+           return []
+       return self._scopes(parent['company_id'], parent['building__estate_id'], parent['building_id'])
+
+   def _record(self, old, new, scopes_for, contribution):
+       deltas = {}
+       if old is not None:
+           for scope in scopes_for(old):
+               for field, value in contribution(old).items():
+                   deltas.setdefault(scope, {}).setdefault(field, 0)
+                   deltas[scope][field] -= value
+       if new is not None:
+           for scope in scopes_for(new):
+               for field, value in contribution(new).items():
+                   deltas.setdefault(scope, {}).setdefault(field, 0)
+                   deltas[scope][field] += value
+       with transaction.atomic():
+           self.apply_deltas(deltas)
+
+   def record_unit(self, old=None, new=None):
+       """Move a unit's contribution from its old values to its new values (None = absent)"""
+       self._record(old, new, self._unit_scopes, unit_occupancy_contribution)
+
+   def record_subunit(self, old=None, new=None):
+       self._record(old, new, self._subunit_scopes, subunit_occupancy_contribution)
+
+   def move_subunits(self, unit_id, old, new):
+       """
+       Move the subunit totals of a unit that changed company or building from the
+       scopes of its old values to those of its new values (record_unit() only moves
+       the unit's own contribution)
+       """
+       totals = SubUnit.objects.filter(parent_unit_id=unit_id).aggregate(**SUBUNIT_ROLLUP_TOTALS)
+       deltas = {}
+       for values, sign in ((old, -1), (new, 1)):
+           for scope in self._unit_scopes(values):
+               for field, value in totals.items():
+                   deltas.setdefault(scope, {}).setdefault(field, 0)
+                   deltas[scope][field] += sign * value
+       with transaction.atomic():
+           self.apply_deltas(deltas)
+
+   def apply_building_deltas(self, rows):
+       """
+       Apply per-building deltas from a bulk change, given as
+       (company_id, estate_id, building_id, {counter: delta}) tuples, to every scope.
+       """
+       deltas = {}
+       for company_id, estate_id, building_id, delta in rows:
+           for scope in self._scopes(company_id, estate_id, building_id):
+               for field, value in delta.items():
+                   deltas.setdefault(scope, {}).setdefault(field, 0)
+                   deltas[scope][field] += value
+       with transaction.atomic():
+           self.apply_deltas(deltas)
+
+   def move_building(self, building, old_estate_id):
+       """Shift a building's totals from its previous estate to its current one"""
+       row = self.filter(scope_type=RollupScopeEnums.BUILDING, scope_id=building.pk).values(*ROLLUP_COUNTERS).first()
+       if row is None:
+           return
+       with transaction.atomic():
+           self.apply_deltas({
+               (RollupScopeEnums.ESTATE, old_estate_id, building.company_id): {f: -v for f, v in row.items()},
+               (RollupScopeEnums.ESTATE, building.estate_id, building.company_id): row,
+           })
+
+   def reconcile(self, company_id=None):
+       """Recompute every rollup row from the property tables with grouped aggregates"""
+       units = Unit.objects.all()
+       subunits = SubUnit.objects.all()
+       rollups = self.all()
+       if company_id:
+           units = units.filter(company_id=company_id)
+           subunits = subunits.filter(company_id=company_id)
+           rollups = rollups.filter(company_id=company_id)
+
+       unit_totals, subunit_totals = UNIT_ROLLUP_TOTALS, SUBUNIT_ROLLUP_TOTALS
+       groupings = [
+           (RollupScopeEnums.COMPANY, 'company_id', 'company_id'),
+           (RollupScopeEnums.ESTATE, 'building__estate_id', 'parent_unit__building__estate_id'),
+           (RollupScopeEnums.BUILDING, 'building_id', 'parent_unit__building_id'),
+       ]
+       rows = {}
+       for scope_type, unit_key, subunit_key in groupings:
+           for values in units.values(unit_key, 'company_id').annotate(**unit_totals).order_by():
+               if values[unit_key] is not None:
+                   rows.setdefault((scope_type, values[unit_key]), {'company_id': values['company_id']}).update(
+                       {field: values[field] for field in unit_totals}
+                   )
+           for values in subunits.values(subunit_key, 'company_id').annotate(**subunit_totals).order_by():
+               if values[subunit_key] is not None:
+                   rows.setdefault((scope_type, values[subunit_key]), {'company_id': values['company_id']}).update(
+                       {field: values[field] for field in subunit_totals}
+                   )
+
+       with transaction.atomic():
+           rollups.delete()
+           return len(self.bulk_create(
+               [self.model(scope_type=scope_type, scope_id=scope_id, **values) for (scope_type, scope_id), values in rows.items()],
+               batch_size=1000,
+           ))
+
+   def reconcile_buildings(self, company_id, building_ids):
+       """
+       Recompute the rollups of some buildings of a company from their units, then the
+       rollups of their estates and of the company as sums over building rollups (every
+       unit sits in a building), so the cost follows the buildings touched rather than
+       the size of the portfolio
+       """
+       building_ids = set(building_ids)
+       if not building_ids:
+           return
+       buildings = Building.objects.filter(company_id=company_id)
+       estate_ids = set(
+           buildings.filter(pk__in=building_ids, estate__isnull=False).values_list('estate_id', flat=True)
+       )
+       rows = {}
+       units = Unit.objects.filter(building_id__in=building_ids)
+       for values in units.values('building_id').annotate(**UNIT_ROLLUP_TOTALS).order_by():
+           rows.setdefault(values.pop('building_id'), {}).update(values)
+       subunits = SubUnit.objects.filter(parent_unit__building_id__in=building_ids)
+       for values in subunits.values('parent_unit__building_id').annotate(**SUBUNIT_ROLLUP_TOTALS).order_by():
+           rows.setdefault(values.pop('parent_unit__building_id'), {}).update(values)
+
+       sums = {
+           field: Coalesce(Sum(field), Value(Decimal('0') if field.endswith('_rent') else 0))
+           for field in ROLLUP_COUNTERS
+       }
+       building_rollups = self.filter(scope_type=RollupScopeEnums.BUILDING, scope_id__in=buildings.values('pk'))
+       with transaction.atomic():
+           self.filter(scope_type=RollupScopeEnums.BUILDING, scope_id__in=building_ids).delete()
+           self.bulk_create([
+               self.model(company_id=company_id, scope_type=RollupScopeEnums.BUILDING, scope_id=building_id, **values)
+               for building_id, values in rows.items()
+           ])
+           scopes = [(RollupScopeEnums.COMPANY, company_id, building_rollups)] + [
+               (RollupScopeEnums.ESTATE, estate_id,
+                building_rollups.filter(scope_id__in=buildings.filter(estate_id=estate_id).values('pk')))
+               for estate_id in estate_ids
+           ]
+           for scope_type, scope_id, source in scopes:
+               self.update_or_create(
+                   scope_type=scope_type, scope_id=scope_id,
+                   defaults={'company_id': company_id, **source.aggregate(**sums)},
+               )
+
+class OccupancyRollup(models.Model):
+   """
+   Pre-aggregated occupancy per company, estate and building. Updated with deltas from
+   Unit/SubUnit save and delete signals; `manage.py reconcile_occupancy_rollups` rebuilds it.
+   """
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="occupancy_rollups")
+   scope_type = models.CharField(max_length=1, choices=RollupScopeEnums.choices)
+   scope_id = models.BigIntegerField()
+   total_units = models.IntegerField(default=0)
+   vacant_units = models.IntegerField(default=0)
+   tenanted_units = models.IntegerField(default=0)
+   total_subunits = models.IntegerField(default=0)
+   vacant_subunits = models.IntegerField(default=0)
+   potential_rent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+   actual_rent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+   objects = OccupancyRollupManager()
+
+   class Meta:
+       indexes = [
+           models.Index(fields=['company', 'scope_type']),
+       ]
+       constraints = [
+           models.UniqueConstraint(fields=['scope_type', 'scope_id'], name='unique_occupancy_rollup_scope'),
+       ]
+
+   def __str__(self):
+       return f"{self.get_scope_type_display()} {self.scope_id} occupancy"
+
+   @property
+   def occupied_units(self):
+       return self.total_units - self.vacant_units
+
+   @property
+   def vacancy_rate(self):
+       if not self.total_units:
+           return 0
+       return self.vacant_units / self.total_units
+
+
+def _child_count(model, parent_field):
+   """Correlated COUNT(*) of children pointing at the outer row"""
+   counts = (
+       model.objects.filter(**{parent_field: OuterRef('pk')})
+       .order_by()
+       .values(parent_field)
+       .annotate(total=Count('pk'))
+       .values('total')
+   )
+   return Coalesce(Subquery(counts), Value(0))
+
+
+def recompute_counter_caches(company_id=None, estate_ids=None, building_ids=None, unit_ids=None):
+   """
+   Recompute total_buildings/total_units/total_subunits with one UPDATE per table.
+   Pass estate_ids, building_ids and/or unit_ids to recompute only those rows.
+   """
+   targets = [
+       (Estate, 'total_buildings', Building, 'estate', estate_ids),
+       (Building, 'total_units', Unit, 'building', building_ids),
+       (Unit, 'total_subunits', SubUnit, 'parent_unit', unit_ids),
+   ]
+   scoped_to_ids = any(ids is not None for *_, ids in targets)
+   updated = {}
+   with transaction.atomic():
+       for model, field_name, child_model, parent_field, ids in targets:
+           query = model.objects.all()
+           if company_id:
+               query = query.filter(company_id=company_id)
+           if scoped_to_ids:
+               query = query.filter(pk__in=ids or [])
+           updated[model] = query.update(**{field_name: _child_count(child_model, parent_field)})
+   return updated
+
+
+# Sent with `unit_ids` after writes that change units without saving them one by one
+# (set-based bulk updates, imports, scheduled deletions), so that other apps can
+# refresh what they derive from units.
+units_bulk_changed = Signal()
+
+
+def refresh_portfolio_aggregates(company_id):
+   """
+   Bring every denormalized structure of a company back in line after writes that
+   bypass model signals (bulk_create, queryset.update, raw deletes).
+   """
+   Unit.objects.rebuild_catalog_index(Unit.objects.filter(company_id=company_id).values('pk'))
+   PortfolioNode.objects.rebuild(company_id=company_id)
+   OccupancyRollup.objects.reconcile(company_id=company_id)
+   OccupancyInterval.objects.sync(company_id)
+   recompute_counter_caches(company_id=company_id)
+
+
+def refresh_property_aggregates(company_id, building_ids=(), unit_ids=()):
+   """
+   refresh_portfolio_aggregates() for some buildings and units of a company that
+   were created without signals (bulk_create): only their catalog arrays, nodes,
+   occupancy spans and counters, and the rollups and counters of the buildings and
+   estates they belong to, so the cost follows the rows written.
+   """
+   building_ids, unit_ids = set(building_ids), set(unit_ids)
+   parent_ids = building_ids | set(Unit.objects.filter(pk__in=unit_ids).values_list('building_id', flat=True))
+   estate_ids = set(
+       Building.objects.filter(pk__in=parent_ids, estate__isnull=False).values_list('estate_id', flat=True)
+   )
+   Unit.objects.rebuild_catalog_index(unit_ids)
+   PortfolioNode.objects.rebuild(company_id=company_id, building_ids=building_ids, unit_ids=unit_ids)
+   OccupancyRollup.objects.reconcile_buildings(company_id, parent_ids)
+   OccupancyInterval.objects.sync(company_id, unit_ids=unit_ids)
+   recompute_counter_caches(company_id=company_id, estate_ids=estate_ids, building_ids=parent_ids, unit_ids=unit_ids)
+
+
+
+OCCUPANCY_STATE_FIELDS = ('company_id', 'building_id', 'estate_id', 'is_vacant', 'tenant_id')
+OCCUPANCY_SCOPE_FIELDS = ('company_id', 'building_id', 'estate_id')
+
+
+def unit_occupancy_state(unit):
+   return {
+       'company_id': unit.company_id,
+       'building_id': unit.building_id,
+       'estate_id': Building.objects.filter(pk=unit.building_id).values_list('estate_id', flat=True).first(),
+       'is_vacant': unit.is_vacant,
+       'tenant_id': unit.main_tenant_id,
+   }
+
+
+def subunit_occupancy_state(subunit):
+   parent = Unit.all_objects.filter(pk=subunit.parent_unit_id).values('building_id', 'building__estate_id').first() or {}
+   return {
+       'company_id': subunit.company_id,
+       'building_id': parent.get('building_id'),
+       'estate_id': parent.get('building__estate_id'),
+       'is_vacant': subunit.is_vacant,
+       'tenant_id': subunit.sublet_tenant_id,
+   }
+
+
+class OccupancyIntervalManager(models.Manager):
+   def open_spans(self):
+       return self.filter(period__endswith__isnull=True)
+
+   def _close(self, spans, on):
+       """
+       End open spans the day before `on`. A span that only started on `on` is ended
+       after that day instead, so no row is ever deleted.
+       """
+       spans.filter(period__startswith__lt=on).update(period=Func(
+           Func(F('period'), function='lower'), Value(on), function='daterange', output_field=DateRangeField()
+       ))
+       spans.filter(period__startswith__gte=on).update(period=Func(
+           F('period'), template="daterange(lower(%(expressions)s), lower(%(expressions)s) + 1)",
+           output_field=DateRangeField(),
+       ))
+
+   def record(self, node_type, object_id, state, on=None):
+       """
+       Record the current state of a unit or subunit (see unit_occupancy_state), or
+       None once it is gone. History is append-only: any change of company, building,
+       estate, vacancy or tenant closes the open span and starts a new one. An open
+       span that only started on `on` holds no finished day yet and takes the new
+       state in place.
+       """
+       on = on or timezone.localdate()
+       with transaction.atomic():
+           current = self.open_spans().filter(node_type=node_type, object_id=object_id).select_for_update().first()
+           if current is not None and state is not None:
+               if all(getattr(current, field) == value for field, value in state.items()):
+                   return current
+               if current.period.lower >= on:
+                   self.filter(pk=current.pk).update(**state)
+                   current.refresh_from_db()
+                   return current
+           if current is not None:
+               self._close(self.filter(pk=current.pk), on)
+           if state is not None:
+               return self.create(node_type=node_type, object_id=object_id, period=DateRange(on, None), **state)
+
+   def sync(self, company_id, on=None, unit_ids=None):
+       """
+       Bring the open spans of a company (or of some of its units and their subunits)
+       in line with the property tables after writes that bypassed signals.
+       Returns the number of spans opened.
+       """
+       on = on or timezone.localdate()
+       units = Unit.objects.filter(company_id=company_id)
+       subunits = SubUnit.objects.filter(company_id=company_id)
+       spans = self.open_spans()
+       if unit_ids is not None:
+           units = units.filter(pk__in=unit_ids)
+           subunits = subunits.filter(parent_unit_id__in=unit_ids)
+           # Not limited to the company: spans of units moved in from another one are closed too
+           spans = spans.filter(
+               Q(node_type=PortfolioNodeTypeEnums.UNIT, object_id__in=unit_ids)
+               | Q(node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id__in=subunits.values('pk'))
+           )
+       else:
+           spans = spans.filter(company_id=company_id)
+
+       current = {}
+       for pk, *values in units.values_list('pk', 'company_id', 'building_id', 'building__estate_id', 'is_vacant', 'main_tenant_id'):
+           current[(PortfolioNodeTypeEnums.UNIT, pk)] = dict(zip(OCCUPANCY_STATE_FIELDS, values))
+       for pk, *values in subunits.values_list(
+           'pk', 'company_id', 'parent_unit__building_id', 'parent_unit__building__estate_id', 'is_vacant', 'sublet_tenant_id'
+       ):
+           current[(PortfolioNodeTypeEnums.SUBUNIT, pk)] = dict(zip(OCCUPANCY_STATE_FIELDS, values))
+
+       stale, restated = [], {}
+       for pk, node_type, object_id, period, *values in spans.values_list(
+           'pk', 'node_type', 'object_id', 'period', *OCCUPANCY_STATE_FIELDS
+       ):
+           state = current.get((node_type, object_id))
+           if state == dict(zip(OCCUPANCY_STATE_FIELDS, values)):
+               del current[(node_type, object_id)]
+           elif state is not None and period.lower >= on:
+               # Started on `on`: no finished day to keep, so it takes the new state (see record)
+               restated[pk] = current.pop((node_type, object_id))
+           else:
+               stale.append(pk)
+
+       with transaction.atomic():
+           self._close(self.filter(pk__in=stale), on)
+           for pk, state in restated.items():
+               self.filter(pk=pk).update(**state)
+           return len(self.bulk_create([
+               self.model(node_type=node_type, object_id=object_id, period=DateRange(on, None), **state)
+               for (node_type, object_id), state in current.items()
+           ], batch_size=1000))
+
+   def monthly_rates(self, scope, start, end=None):
+       """
+       Occupancy of a Company, Estate or Building for every calendar month from `start`
+       to `end` (default: the current month), computed in one query over the spans.
+       Each month counts unit-days up to today, so units that only existed for part of
+       it are weighted accordingly.
+       """
+       today = timezone.localdate()
+       start = start.replace(day=1)
+       end = min(end or today, today).replace(day=1)
+       scope_column, company_id = {
+           'company': ('company_id', scope.pk),
+           'estate': ('estate_id', getattr(scope, 'company_id', None)),
+           'building': ('building_id', getattr(scope, 'company_id', None)),
+       }[scope._meta.model_name]
+
+       sql = f"""
+           WITH months AS (
+               SELECT month::date AS month,
+                      daterange(month::date, LEAST((month + interval '1 month')::date, %(until)s)) AS period
+               FROM generate_series(%(start)s::date, %(end)s::date, interval '1 month') AS month
+           ),
+           month_spans AS (
+               SELECT m.month, i.node_type, i.is_vacant,
+                      upper(i.period * m.period) - lower(i.period * m.period) AS days
+               FROM months m
+               JOIN {self.model._meta.db_table} i ON i.period && m.period
+               WHERE i.company_id = %(company_id)s AND i.{scope_column} = %(scope_id)s
+           )
+           SELECT m.month,
+                  COALESCE(SUM(o.days) FILTER (WHERE o.node_type = %(unit)s), 0),
+                  COALESCE(SUM(o.days) FILTER (WHERE o.node_type = %(unit)s AND o.is_vacant), 0),
+                  COALESCE(SUM(o.days) FILTER (WHERE o.node_type = %(subunit)s), 0),
+                  COALESCE(SUM(o.days) FILTER (WHERE o.node_type = %(subunit)s AND o.is_vacant), 0)
+           FROM months m
+           LEFT JOIN month_spans o ON o.month = m.month
+           GROUP BY m.month
+           ORDER BY m.month
+       """
+       params = {
+           'start': start, 'end': end, 'until': today + timedelta(days=1),
+           'company_id': company_id, 'scope_id': scope.pk,
+           'unit': PortfolioNodeTypeEnums.UNIT, 'subunit': PortfolioNodeTypeEnums.SUBUNIT,
+       }
+       with connection.cursor() as cursor:
+           cursor.execute(sql, params)
+           rows = cursor.fetchall()
+
+       months = []
+       for month, unit_days, vacant_unit_days, subunit_days, vacant_subunit_days in rows:
+           vacancy_rate = vacant_unit_days / unit_days if unit_days else 0
+           months.append({
+               'month': month,
+               'unit_days': unit_days,
+               'vacant_unit_days': vacant_unit_days,
+               'subunit_days': subunit_days,
+               'vacant_subunit_days': vacant_subunit_days,
+               'vacancy_rate': vacancy_rate,
+               'occupancy_rate': 1 - vacancy_rate if unit_days else 0,
+               'subunit_vacancy_rate': vacant_subunit_days / subunit_days if subunit_days else 0,
+           })
+       return months
+
+
+class OccupancyInterval(models.Model):
+   """
+   Append-only occupancy history: one row per span of days a unit or subunit spent
+   vacant or let to one tenant. The current span is open-ended; a transition closes it
+   and opens the next. Kept by the Unit/SubUnit signals and by `sync` after bulk writes.
+   """
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="occupancy_intervals")
+   node_type = models.CharField(max_length=1, choices=PortfolioNodeTypeEnums.choices)
+   object_id = models.BigIntegerField()
+   # Plain ids rather than foreign keys: history outlives deleted buildings and estates
+   building_id = models.BigIntegerField(null=True, blank=True)
+   estate_id = models.BigIntegerField(null=True, blank=True)
+   is_vacant = models.BooleanField()
+   tenant = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+   period = DateRangeField()
+
+   objects = OccupancyIntervalManager()
+
+   class Meta:
+       indexes = [
+           GistIndex(fields=['period'], name='occupancy_period_gist'),
+           models.Index(fields=['company', 'node_type']),
+           models.Index(fields=['node_type', 'object_id']),
+           models.Index(fields=['building_id']),
+           models.Index(fields=['estate_id']),
+       ]
+       constraints = [
+           models.UniqueConstraint(
+               fields=['node_type', 'object_id'],
+               condition=Q(period__endswith__isnull=True),
+               name='unique_open_occupancy_interval',
+           ),
+       ]
+
+   def __str__(self):
+       state = 'vacant' if self.is_vacant else 'occupied'
+       return f"{self.get_node_type_display()} {self.object_id} {state} {self.period}"
+
+
+class UnitBulkOperation(BaseModel):
+   """
+   Audit record of one set-based rent/deposit/vacancy change, written once per batch
+   with before and after totals rather than per unit.
+   """
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="unit_bulk_operations")
+   performed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="unit_bulk_operations")
+   filters = models.JSONField(default=dict, blank=True, help_text="Filters that selected the units")
+   rent_change_type = models.CharField(max_length=1, choices=BulkChangeTypeEnums.choices, null=True, blank=True)
+   rent_change = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+   deposit_change_type = models.CharField(max_length=1, choices=BulkChangeTypeEnums.choices, null=True, blank=True)
+   deposit_change = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+   set_vacant = models.BooleanField(null=True, blank=True)
+   rounding = models.CharField(max_length=4, choices=RentRoundingEnums.choices, default=RentRoundingEnums.CENT)
+   units_affected = models.IntegerField(default=0)
+   rent_before = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+   rent_after = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+   deposit_before = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+   deposit_after = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+   class Meta:
+       ordering = ['-created_at']
+
+   def __str__(self):
+       return f"Bulk update of {self.units_affected} units on {self.created_at:%Y-%m-%d}"
+
+
+class PropertyDeletionJobManager(models.Manager):
+   STALE_AFTER = timedelta(minutes=10)
+
+   def schedule(self, obj, requested_by=None):
+       """
+       Hide an estate or building and everything under it with one UPDATE per level,
+       and queue the actual delete. Returns the job to poll.
+       """
+       target_type = PORTFOLIO_NODE_TYPES[obj.__class__]
+       if obj.__class__ is Estate:
+           estates = Estate.all_objects.filter(pk=obj.pk)
+           buildings = Building.all_objects.filter(estate_id=obj.pk)
+       else:
+           estates = Estate.all_objects.none()
+           buildings = Building.all_objects.filter(pk=obj.pk)
+       units = Unit.all_objects.filter(building__in=buildings.values('pk'))
+       subunits = SubUnit.all_objects.filter(parent_unit__in=units.values('pk'))
+
+       with transaction.atomic():
+           unit_ids = list(units.values_list('pk', flat=True))
+           for queryset in (subunits, units, buildings, estates):
+               queryset.update(is_deleted=True)
+           units_bulk_changed.send(sender=Unit, unit_ids=unit_ids)
+           return self.create(
+               company_id=obj.company_id, target_type=target_type, object_id=obj.pk,
+               target_name=str(obj)[:255], requested_by=requested_by,
+           )
+
+   def claim(self, job_id=None):
+       """
+       Lock the next runnable job with SKIP LOCKED, so concurrent workers never pick up
+       the same one, and mark it running. Jobs left running by a crashed worker are
+       picked up again once their heartbeat is stale.
+       """
+       stale = timezone.now() - self.STALE_AFTER
+       with transaction.atomic():
+           jobs = self.select_for_update(skip_locked=True).filter(
+               Q(status=DeletionJobStatusEnums.PENDING)
+               | Q(status=DeletionJobStatusEnums.RUNNING, heartbeat_at__lt=stale)
+           ).order_by('created_at')
+           if job_id is not None:
+               jobs = jobs.filter(pk=job_id)
+           job = jobs.first()
+           if job is None:
+               return None
+           job.status = DeletionJobStatusEnums.RUNNING
+           job.started_at = job.started_at or timezone.now()
+           job.heartbeat_at = timezone.now()
+           job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'updated_at'])
+           return job
+
+class PropertyDeletionJob(BaseModel):
+   """
+   Background delete of an estate or building subtree, run by
+   `manage.py process_deletion_jobs`; a stale heartbeat lets another run take it over.
+   """
+   company = models.ForeignKey('companies.Company', on_delete=models.CASCADE, related_name="property_deletion_jobs")
+   requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="property_deletion_jobs")
+   target_type = models.CharField(max_length=1, choices=PortfolioNodeTypeEnums.choices)
+   object_id = models.BigIntegerField()
+   target_name = models.CharField(max_length=255, blank=True)
+   status = models.CharField(max_length=1, choices=DeletionJobStatusEnums.choices, default=DeletionJobStatusEnums.PENDING)
+   rows_deleted = models.IntegerField(default=0)
+   error = models.TextField(blank=True)
+   started_at = models.DateTimeField(null=True, blank=True)
+   heartbeat_at = models.DateTimeField(null=True, blank=True)
+   finished_at = models.DateTimeField(null=True, blank=True)
+
+   objects = PropertyDeletionJobManager()
+
+   class Meta:
+       indexes = [
+           models.Index(fields=['status', 'created_at']),
+       ]
+
+   def __str__(self):
+       return f"Delete {self.get_target_type_display()} {self.target_name} ({self.get_status_display()})"
+
+
+class PendingFileDeletion(models.Model):
+   """A storage object whose database row is already gone, queued for removal from storage"""
+   name = models.CharField(max_length=500)
+   attempts = models.PositiveSmallIntegerField(default=0)
+   last_error = models.TextField(blank=True)
+   created_at = models.DateTimeField(auto_now_add=True)
+
+   def __str__(self):
+       return self.name
+
 
 # TODO: Address model. Keep addresses simple for now. We are gonna intergrate with google maps api
 #class Address(BaseModel):
@@ -0,0 +1,221 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import comparables
+from .catalog import CATALOGS
+from .models import (
+    Estate, Building, Unit, SubUnit, Amenity, PropertyFeature, UnitAmenityRelation, UnitFeatureRelation,
+    PortfolioNode, OccupancyRollup, OccupancyInterval, RollupScopeEnums, PortfolioNodeTypeEnums, ArrayRemove,
+    UNIT_OCCUPANCY_FIELDS, SUBUNIT_OCCUPANCY_FIELDS, unit_occupancy_state, subunit_occupancy_state,
+)
+
+# Changes to these start a new occupancy history span
+UNIT_HISTORY_FIELDS = ('company_id', 'building_id', 'is_vacant', 'main_tenant_id')
+SUBUNIT_HISTORY_FIELDS = ('parent_unit_id', 'is_vacant', 'sublet_tenant_id')
+
+TRACKED_FIELDS = {
+    Building: ('company_id', 'estate_id'),
+    Unit: tuple(dict.fromkeys(UNIT_OCCUPANCY_FIELDS + comparables.INDEXED_FIELDS)),
+    SubUnit: SUBUNIT_OCCUPANCY_FIELDS,
+}
+
+
+@receiver(m2m_changed, sender=Unit.amenities.through)
+@receiver(m2m_changed, sender=Unit.features.through)
+def sync_unit_catalog_index_on_add(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Unit.amenity_ids/feature_ids in step with relations added through the
+    m2m managers (form save_m2m, unit.amenities.add(), amenity.units.add()).
+    Removals go through the relation rows' post_delete below.
+    """
+    if action != 'post_add' or not pk_set:
+        return
+    unit_ids = pk_set if reverse else [instance.pk]
+    Unit.objects.rebuild_catalog_index(unit_ids)
+    for company_id in Unit.objects.filter(pk__in=unit_ids).values_list('company_id', flat=True).distinct():
+        comparables.invalidate(company_id)
+
+
+@receiver(post_save, sender=UnitAmenityRelation)
+def invalidate_comparables_on_amenity_added(sender, instance, created, raw=False, **kwargs):
+    # Unit.add_amenity() creates the relation row directly, without m2m_changed
+    if created and not raw:
+        comparables.invalidate(Unit.all_objects.filter(pk=instance.unit_id).values_list('company_id', flat=True).first())
+
+
+@receiver(post_delete, sender=UnitAmenityRelation)
+def remove_amenity_from_unit_index(sender, instance, **kwargs):
+    _remove_catalog_id(instance.unit_id, 'amenity_ids', instance.amenity_id)
+
+
+@receiver(post_delete, sender=UnitFeatureRelation)
+def remove_feature_from_unit_index(sender, instance, **kwargs):
+    _remove_catalog_id(instance.unit_id, 'feature_ids', instance.feature_id)
+
+
+def _remove_catalog_id(unit_id, field_name, item_id):
+    Unit.objects.filter(pk=unit_id).update(**{
+        field_name: ArrayRemove(F(field_name), Value(item_id), output_field=ArrayField(models.BigIntegerField()))
+    })
+    comparables.invalidate(Unit.all_objects.filter(pk=unit_id).values_list('company_id', flat=True).first())
+
+
+@receiver(post_save, sender=Estate)
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=Unit)
+@receiver(post_save, sender=SubUnit)
+def sync_portfolio_node(sender, instance, raw=False, **kwargs):
+    """Keep the materialized hierarchy path of a property current"""
+    if raw:
+        return
+    PortfolioNode.objects.sync(instance)
+
+
+@receiver(post_delete, sender=Estate)
+@receiver(post_delete, sender=Building)
+@receiver(post_delete, sender=Unit)
+@receiver(post_delete, sender=SubUnit)
+def remove_portfolio_node(sender, instance, **kwargs):
+    PortfolioNode.objects.remove(instance)
+
+
+def _current_values(instance, field_names):
+    return {field: getattr(instance, field) for field in field_names}
+
+
+def _stored_values(instance, field_names):
+    loaded = instance.get_loaded_values()
+    if loaded is None:
+        return None
+    return {field: loaded[field] if field in loaded else getattr(instance, field) for field in field_names}
+
+
+@receiver(pre_save, sender=Building)
+@receiver(pre_save, sender=Unit)
+@receiver(pre_save, sender=SubUnit)
+def ensure_loaded_values(sender, instance, raw=False, **kwargs):
+    """
+    Occupancy deltas need the previously stored values. Instances loaded normally already
+    carry them; re-read only when the instance was built by hand or loaded with .only()/.defer().
+    """
+    if raw or instance._state.adding:
+        return
+    field_names = TRACKED_FIELDS[sender]
+    loaded = instance.get_loaded_values() or {}
+    if all(field in loaded for field in field_names):
+        return
+    stored = sender.objects.filter(pk=instance.pk).values(*field_names).first()
+    if stored is not None:
+        instance._loaded_values = {**loaded, **stored}
+
+
+def _history_changed(old, new, field_names):
+    return old is None or any(old[field] != new[field] for field in field_names)
+
+
+def _move_counter(model, field_name, old_id, new_id):
+    """Decrement the counter cache on the old parent and increment it on the new one"""
+    if old_id == new_id:
+        return
+    if old_id is not None:
+        model.objects.filter(pk=old_id).update(**{field_name: F(field_name) - 1})
+    if new_id is not None:
+        model.objects.filter(pk=new_id).update(**{field_name: F(field_name) + 1})
+
+
+@receiver(post_save, sender=Unit)
+def on_unit_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else _stored_values(instance, UNIT_OCCUPANCY_FIELDS)
+    new = _current_values(instance, UNIT_OCCUPANCY_FIELDS)
+    indexed = None if created else _stored_values(instance, comparables.INDEXED_FIELDS)
+    if indexed != _current_values(instance, comparables.INDEXED_FIELDS):
+        comparables.invalidate(new['company_id'])
+        if old and old['company_id'] != new['company_id']:
+            comparables.invalidate(old['company_id'])
+    if old != new:
+        OccupancyRollup.objects.record_unit(old=old, new=new)
+        _move_counter(Building, 'total_units', old and old['building_id'], new['building_id'])
+        if old and (old['company_id'], old['building_id']) != (new['company_id'], new['building_id']):
+            OccupancyRollup.objects.move_subunits(instance.pk, old, new)
+        if old and old['company_id'] != new['company_id']:
+            SubUnit.objects.filter(parent_unit=instance).update(company_id=new['company_id'])
+    if _history_changed(old, new, UNIT_HISTORY_FIELDS):
+        state = unit_occupancy_state(instance)
+        OccupancyInterval.objects.record(PortfolioNodeTypeEnums.UNIT, instance.pk, state)
+        if old and (old['company_id'], old['building_id']) != (new['company_id'], new['building_id']):
+            # The subunits' open spans are closed and restarted under the new scope
+            OccupancyInterval.objects.sync(state['company_id'], unit_ids=[instance.pk])
+    instance.reset_loaded_values()
+
+
+@receiver(post_save, sender=SubUnit)
+def on_subunit_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else _stored_values(instance, SUBUNIT_OCCUPANCY_FIELDS)
+    new = _current_values(instance, SUBUNIT_OCCUPANCY_FIELDS)
+    if old != new:
+        OccupancyRollup.objects.record_subunit(old=old, new=new)
+        _move_counter(Unit, 'total_subunits', old and old['parent_unit_id'], new['parent_unit_id'])
+    if _history_changed(old, new, SUBUNIT_HISTORY_FIELDS):
+        OccupancyInterval.objects.record(PortfolioNodeTypeEnums.SUBUNIT, instance.pk, subunit_occupancy_state(instance))
+    instance.reset_loaded_values()
+
+
+@receiver(post_save, sender=Building)
+def on_building_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = None if created else _stored_values(instance, ('estate_id',))
+    old_estate_id = stored['estate_id'] if stored else None
+    if old_estate_id != instance.estate_id:
+        if not created:
+            OccupancyRollup.objects.move_building(instance, old_estate_id)
+        _move_counter(Estate, 'total_buildings', old_estate_id, instance.estate_id)
+        if not created:
+            OccupancyInterval.objects.sync(instance.company_id, unit_ids=instance.units.values('pk'))
+            comparables.invalidate(instance.company_id)
+    instance.reset_loaded_values()
+
+
+@receiver(post_delete, sender=Unit)
+def on_unit_deleted(sender, instance, **kwargs):
+    old = _stored_values(instance, UNIT_OCCUPANCY_FIELDS) or _current_values(instance, UNIT_OCCUPANCY_FIELDS)
+    OccupancyRollup.objects.record_unit(old=old)
+    _move_counter(Building, 'total_units', old['building_id'], None)
+    OccupancyInterval.objects.record(PortfolioNodeTypeEnums.UNIT, instance.pk, None)
+    comparables.invalidate(old['company_id'])
+
+
+@receiver(post_delete, sender=SubUnit)
+def on_subunit_deleted(sender, instance, **kwargs):
+    old = _stored_values(instance, SUBUNIT_OCCUPANCY_FIELDS) or _current_values(instance, SUBUNIT_OCCUPANCY_FIELDS)
+    OccupancyRollup.objects.record_subunit(old=old)
+    _move_counter(Unit, 'total_subunits', old['parent_unit_id'], None)
+    OccupancyInterval.objects.record(PortfolioNodeTypeEnums.SUBUNIT, instance.pk, None)
+
+
+@receiver(post_delete, sender=Building)
+def on_building_deleted(sender, instance, **kwargs):
+    stored = _stored_values(instance, ('estate_id',)) or _current_values(instance, ('estate_id',))
+    old_estate_id = stored['estate_id']
+    _move_counter(Estate, 'total_buildings', old_estate_id, None)
+    OccupancyRollup.objects.filter(scope_type=RollupScopeEnums.BUILDING, scope_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Estate)
+def remove_estate_occupancy(sender, instance, **kwargs):
+    OccupancyRollup.objects.filter(scope_type=RollupScopeEnums.ESTATE, scope_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Amenity)
+@receiver(post_save, sender=PropertyFeature)
+@receiver(post_delete, sender=Amenity)
+@receiver(post_delete, sender=PropertyFeature)
+def invalidate_catalog_cache(sender, **kwargs):
+    CATALOGS[sender].invalidate()
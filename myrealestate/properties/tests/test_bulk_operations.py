@@ -0,0 +1,157 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from myrealestate.properties.bulk_operations import UnitBulkChange
+from myrealestate.properties.models import (
+    Estate, Building, Unit, EstateTypeEnums, BuildingTypeEnums, UnitTypeEnums,
+    BulkChangeTypeEnums, RentRoundingEnums, OccupancyRollup, OccupancyInterval, PortfolioNode,
+    PortfolioNodeTypeEnums, UnitBulkOperation,
+)
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+class UnitBulkChangeTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(
+            name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company
+        )
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=self.estate, company=self.company
+        )
+        self.units = [
+            Unit.objects.create(
+                building=self.building, company=self.company, number=str(number),
+                unit_type=UnitTypeEnums.APARTMENT, base_rent=rent, deposit_amount=rent, is_vacant=vacant
+            )
+            for number, rent, vacant in [(1, Decimal('1000'), False), (2, Decimal('1234'), True), (3, None, False)]
+        ]
+
+    def test_requires_a_change(self):
+        with self.assertRaises(ValidationError):
+            UnitBulkChange()
+
+    def test_preview_does_not_write(self):
+        change = UnitBulkChange(
+            rent_change_type=BulkChangeTypeEnums.PERCENTAGE, rent_change=Decimal('8'),
+            rounding=RentRoundingEnums.TEN,
+        )
+        preview = change.preview(Unit.objects.filter(company=self.company))
+        self.assertEqual(preview['units'], 3)
+        self.assertEqual(preview['rent_before'], Decimal('2234'))
+        # 1080 and 1332.72 -> 1330 once rounded to the nearest 10
+        self.assertEqual(preview['rent_after'], Decimal('2410'))
+        self.assertEqual(Unit.objects.get(pk=self.units[0].pk).base_rent, Decimal('1000'))
+
+    def test_percentage_escalation_with_rounding(self):
+        change = UnitBulkChange(
+            rent_change_type=BulkChangeTypeEnums.PERCENTAGE, rent_change=Decimal('8'),
+            rounding=RentRoundingEnums.TEN,
+        )
+        operation = change.apply(Unit.objects.filter(building__estate=self.estate), self.company)
+
+        rents = dict(Unit.objects.values_list('number', 'base_rent'))
+        self.assertEqual(rents, {'1': Decimal('1080.00'), '2': Decimal('1330.00'), '3': None})
+        self.assertEqual(operation.units_affected, 3)
+        self.assertEqual(operation.rent_after, Decimal('2410'))
+        self.assertEqual(UnitBulkOperation.objects.count(), 1)
+
+        rollup = OccupancyRollup.objects.for_object(self.building)
+        self.assertEqual(rollup.potential_rent, Decimal('2410'))
+        self.assertEqual(rollup.actual_rent, Decimal('1080'))
+
+    def test_absolute_change_never_goes_negative(self):
+        change = UnitBulkChange(deposit_change_type=BulkChangeTypeEnums.ABSOLUTE, deposit_change=Decimal('-1100'))
+        change.apply(Unit.objects.all(), self.company)
+        deposits = dict(Unit.objects.values_list('number', 'deposit_amount'))
+        self.assertEqual(deposits, {'1': Decimal('0.00'), '2': Decimal('134.00'), '3': None})
+
+    def test_vacancy_change_updates_rollups_and_hierarchy(self):
+        change = UnitBulkChange(set_vacant=True)
+        # Selecting on the column being changed must still update exactly the selected rows
+        operation = change.apply(Unit.objects.filter(is_vacant=False), self.company)
+        self.assertEqual(operation.units_affected, 2)
+        self.assertFalse(Unit.objects.filter(is_vacant=False).exists())
+
+        self.assertFalse(PortfolioNode.objects.filter(node_type=PortfolioNodeTypeEnums.UNIT, is_vacant=False).exists())
+        self.assertFalse(OccupancyInterval.objects.open_spans().filter(is_vacant=False).exists())
+        rollup = OccupancyRollup.objects.for_object(self.estate)
+        self.assertEqual(rollup.vacant_units, 3)
+        self.assertEqual(rollup.actual_rent, 0)
+
+        incremental = list(OccupancyRollup.objects.order_by('scope_type', 'scope_id').values())
+        OccupancyRollup.objects.reconcile(self.company.pk)
+        reconciled = list(OccupancyRollup.objects.order_by('scope_type', 'scope_id').values())
+        strip = lambda rows: [{k: v for k, v in row.items() if k != 'id'} for row in rows]
+        self.assertEqual(strip(incremental), strip(reconciled))
+
+    def test_locks_selection_and_updates_by_subquery(self):
+        change = UnitBulkChange(rent_change_type=BulkChangeTypeEnums.ABSOLUTE, rent_change=Decimal('10'))
+        with CaptureQueriesContext(connection) as queries:
+            change.apply(Unit.objects.filter(building=self.building), self.company)
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertTrue(any('FOR UPDATE' in statement for statement in sql))
+        unit_update = next(statement for statement in sql if statement.startswith('UPDATE "properties_unit"'))
+        self.assertIn('IN (SELECT', unit_update)
+
+    def test_only_touches_own_company(self):
+        other = Company.objects.create(name="Other Company")
+        other_building = Building.objects.create(name="Other", company=other)
+        other_unit = Unit.objects.create(
+            building=other_building, company=other, number="9", unit_type=UnitTypeEnums.APARTMENT, base_rent=500
+        )
+        UnitBulkChange(rent_change_type=BulkChangeTypeEnums.ABSOLUTE, rent_change=Decimal('100')).apply(
+            Unit.objects.all(), self.company
+        )
+        other_unit.refresh_from_db()
+        self.assertEqual(other_unit.base_rent, Decimal('500'))
+
+
+class UnitBulkUpdateViewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Test Company")
+        self.company.users.add(self.user)
+        self.user.active_company = self.company
+        self.user.save()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.building = Building.objects.create(name="Block A", company=self.company)
+        self.unit = Unit.objects.create(
+            building=self.building, company=self.company, number="1",
+            unit_type=UnitTypeEnums.APARTMENT, base_rent=1000
+        )
+        self.url = reverse('properties:bulk-update-units')
+        self.data = {
+            'building': self.building.pk,
+            'rent_change_type': BulkChangeTypeEnums.PERCENTAGE,
+            'rent_change': '5',
+            'rounding': RentRoundingEnums.UNIT,
+        }
+
+    def test_preview(self):
+        response = self.client.post(self.url, {**self.data, 'preview': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['preview']['rent_after'], Decimal('1050'))
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.base_rent, Decimal('1000'))
+
+    def test_apply(self):
+        response = self.client.post(self.url, {**self.data, 'apply': ''})
+        self.assertRedirects(response, reverse('properties:unit-list'), fetch_redirect_response=False)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.base_rent, Decimal('1050'))
+        operation = UnitBulkOperation.objects.get()
+        self.assertEqual(operation.performed_by, self.user)
+        self.assertEqual(operation.filters, {'building': self.building.pk})
+
+    def test_nothing_to_change(self):
+        response = self.client.post(self.url, {'rounding': RentRoundingEnums.CENT, 'preview': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from myrealestate.properties.catalog import amenity_catalog, feature_catalog
+from myrealestate.properties.forms import UnitForm
+from myrealestate.properties.models import Amenity, PropertyFeature
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+def catalog_queries(queries):
+    tables = (Amenity._meta.db_table, PropertyFeature._meta.db_table)
+    return [query['sql'] for query in queries if any(f'FROM "{table}"' in query['sql'] for table in tables)]
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        self.pool = Amenity.objects.create(name="Pool", category="Recreation", icon="pool")
+        self.gym = Amenity.objects.create(name="Gym", category="Recreation", icon="gym")
+        self.lift = Amenity.objects.create(name="Lift", category="Access", icon="lift")
+
+    def test_grouped_by_category(self):
+        groups = dict(amenity_catalog.grouped())
+        self.assertEqual(groups["Recreation"], (self.gym, self.pool))
+        categories = list(groups)
+        self.assertLess(categories.index("Access"), categories.index("Recreation"))
+        self.assertEqual(amenity_catalog.get(self.lift.pk), self.lift)
+
+    def test_served_from_memory(self):
+        amenity_catalog.all()
+        with self.assertNumQueries(0):
+            amenity_catalog.all()
+            amenity_catalog.grouped()
+
+    def test_save_and_delete_invalidate(self):
+        amenity_catalog.all()
+        self.pool.name = "Heated Pool"
+        self.pool.save()
+        self.assertEqual(amenity_catalog.get(self.pool.pk).name, "Heated Pool")
+
+        self.gym.delete()
+        self.assertNotIn(self.gym.pk, [amenity.pk for amenity in amenity_catalog.all()])
+
+    def test_version_change_from_another_worker_reloads(self):
+        amenity_catalog.all()
+        # Another process saved a row: only the shared version moves
+        Amenity.objects.filter(pk=self.lift.pk).update(name="Elevator")
+        self.assertEqual(amenity_catalog.get(self.lift.pk).name, "Lift")
+        amenity_catalog.invalidate()
+        self.assertEqual(amenity_catalog.get(self.lift.pk).name, "Elevator")
+
+    def test_unit_form_renders_without_catalog_queries(self):
+        PropertyFeature.objects.create(name="Air Conditioning", category="Climate", icon="ac")
+        amenity_catalog.all()
+        feature_catalog.all()
+        form = UnitForm()
+        with CaptureQueriesContext(connection) as queries:
+            str(form['amenities'])
+            str(form['features'])
+        self.assertEqual(catalog_queries(queries.captured_queries), [])
+
+
+class CatalogViewTest(TestCase):
+    def test_unit_create_page_issues_no_catalog_queries(self):
+        user = UserFactory(email_verified=True)
+        company = Company.objects.create(name="Test Company")
+        company.users.add(user)
+        user.active_company = company
+        user.save()
+        client = Client()
+        client.force_login(user)
+
+        client.get(reverse('properties:create-unit'))  # warm the cache
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('properties:create-unit'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(catalog_queries(queries.captured_queries), [])
+        self.assertTrue(response.context['amenity_groups'])
@@ -0,0 +1,131 @@
+from decimal import Decimal
+
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from myrealestate.properties.comparables import ComparableIndex, comparables_cache, find_comparables
+from myrealestate.properties.models import (
+    Estate, Building, Unit, Amenity, EstateTypeEnums, BuildingTypeEnums, UnitTypeEnums,
+)
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+class ComparablesTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        estate = Estate.objects.create(name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company)
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=estate, company=self.company
+        )
+        self.far_building = Building.objects.create(
+            name="Far Away", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company
+        )
+        self.pool = Amenity.objects.create(name="Pool", category="Recreation", icon="pool")
+        self.target = self.unit("1", bedrooms=2, square_footage=80, base_rent=None)
+        self.twin = self.unit("2", bedrooms=2, square_footage=80, base_rent=9000)
+        self.similar = self.unit("3", bedrooms=2, square_footage=95, base_rent=10000)
+        self.bigger = self.unit("4", bedrooms=4, square_footage=200, base_rent=20000)
+        self.elsewhere = self.unit("5", building=self.far_building, bedrooms=2, square_footage=80, base_rent=7000)
+        self.unpriced = self.unit("6", bedrooms=2, square_footage=80, base_rent=None)
+
+    def unit(self, number, building=None, **values):
+        return Unit.objects.create(
+            building=building or self.building, company=self.company, number=number,
+            unit_type=UnitTypeEnums.APARTMENT, **values
+        )
+
+    def comparable_ids(self, unit, limit=10):
+        return [row['unit_id'] for row in find_comparables(unit, limit=limit)['comparables']]
+
+    def test_nearest_first_and_excludes_self_and_unpriced(self):
+        ids = self.comparable_ids(self.target)
+        self.assertEqual(ids[0], self.twin.pk)
+        self.assertEqual(ids[-1], self.bigger.pk)
+        self.assertNotIn(self.target.pk, ids)
+        self.assertNotIn(self.unpriced.pk, ids)
+        self.assertLess(ids.index(self.similar.pk), ids.index(self.elsewhere.pk))
+
+    def test_rent_percentiles(self):
+        result = find_comparables(self.target, limit=2)
+        self.assertEqual(len(result['comparables']), 2)
+        self.assertEqual(result['rent_percentiles'][50], 9500.0)
+
+    def test_amenities_break_ties(self):
+        self.similar.add_amenity(self.pool)
+        self.twin.square_footage = Decimal('95')
+        self.twin.save()
+        self.target.add_amenity(self.pool)
+        self.target.refresh_from_db()
+        self.assertEqual(self.comparable_ids(self.target)[0], self.similar.pk)
+
+    def test_unit_changes_rebuild_index(self):
+        index = comparables_cache.get(self.company.pk)
+        self.assertIs(comparables_cache.get(self.company.pk), index)
+        self.bigger.bedrooms = 2
+        self.bigger.save()
+        self.assertIsNot(comparables_cache.get(self.company.pk), index)
+
+    def test_unindexed_changes_keep_index(self):
+        index = comparables_cache.get(self.company.pk)
+        self.bigger.is_vacant = False
+        self.bigger.parking_spots = 2
+        self.bigger.save()
+        self.assertIs(comparables_cache.get(self.company.pk), index)
+
+    def test_other_companies_are_not_compared(self):
+        other = Company.objects.create(name="Other Company")
+        building = Building.objects.create(name="Theirs", company=other)
+        Unit.objects.filter(building=building).update(base_rent=1)
+        self.assertFalse(set(self.comparable_ids(self.target)) & set(building.units.values_list('pk', flat=True)))
+
+    def test_index_scales_to_many_units(self):
+        count = 100_000
+        rows = [
+            (pk, pk % 500, pk % 50, pk % 5 + 1, Decimal(pk % 3 + 1), Decimal(40 + pk % 160), bool(pk % 2),
+             Decimal(5000 + pk % 20000), [pk % 30, pk % 7 + 30])
+            for pk in range(1, count + 1)
+        ]
+        index = ComparableIndex(rows)
+        unit = Unit(pk=1, building=Building(pk=1, estate_id=1), bedrooms=2, bathrooms=1, square_footage=80, furnished=False, amenity_ids=[1, 31])
+        unit_ids, distances, rents = index.nearest(unit, limit=20)
+        self.assertEqual(len(unit_ids), 20)
+        self.assertTrue((distances[:-1] <= distances[1:]).all())
+        self.assertNotIn(1, unit_ids)
+
+
+class UnitComparablesViewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Test Company")
+        self.company.users.add(self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company
+        )
+        self.unit = Unit.objects.create(
+            building=building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT
+        )
+        self.comparable = Unit.objects.create(
+            building=building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT, base_rent=8000
+        )
+
+    def test_json(self):
+        response = self.client.get(reverse('properties:unit-comparables', args=[self.unit.pk]), {'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['unit_id'] for row in data['comparables']], [self.comparable.pk])
+        self.assertEqual(data['rent_percentiles']['p50'], 8000.0)
+
+    def test_other_company_unit_not_found(self):
+        other = Company.objects.create(name="Other Company")
+        building = Building.objects.create(name="Theirs", building_type=BuildingTypeEnums.MULTI_UNIT, company=other)
+        unit = Unit.objects.create(building=building, company=other, number="1", unit_type=UnitTypeEnums.APARTMENT)
+        response = self.client.get(reverse('properties:unit-comparables', args=[unit.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_update_page_lists_comparables(self):
+        response = self.client.get(reverse('properties:update-unit', args=[self.unit.pk]))
+        self.assertContains(response, "Comparable Units")
+        self.assertEqual(response.context['comparables']['comparables'][0]['unit'], self.comparable)
@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from myrealestate.properties.deletion import delete_pending_files, process_deletion_jobs
+from myrealestate.properties.models import (
+    Estate, Building, Unit, SubUnit, Amenity, PropertyImage, PortfolioNode, OccupancyRollup,
+    PropertyDeletionJob, PendingFileDeletion, DeletionJobStatusEnums, EstateTypeEnums,
+    BuildingTypeEnums, UnitTypeEnums,
+)
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+class PropertyDeletionJobTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(
+            name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company
+        )
+        self.buildings = [
+            Building.objects.create(
+                name=f"Block {name}", building_type=BuildingTypeEnums.MULTI_UNIT,
+                estate=self.estate, company=self.company
+            )
+            for name in "AB"
+        ]
+        amenity = Amenity.objects.create(name="Pool", category="Recreation", icon="pool")
+        for building in self.buildings:
+            for number in range(3):
+                unit = Unit.objects.create(
+                    building=building, company=self.company, number=str(number),
+                    unit_type=UnitTypeEnums.APARTMENT, base_rent=1000
+                )
+                unit.add_amenity(amenity)
+                SubUnit.objects.create(parent_unit=unit, number=f"{number}A")
+        PropertyImage.objects.create(
+            content_type=ContentType.objects.get_for_model(Unit), object_id=unit.pk, image="property_images/unit.jpg"
+        )
+        self.other_building = Building.objects.create(name="Standalone", company=self.company)
+
+    def test_schedule_hides_subtree(self):
+        job = PropertyDeletionJob.objects.schedule(self.estate)
+        self.assertEqual(job.status, DeletionJobStatusEnums.PENDING)
+        self.assertFalse(Estate.objects.filter(pk=self.estate.pk).exists())
+        self.assertEqual(list(Building.objects.all()), [self.other_building])
+        self.assertFalse(Unit.objects.exists())
+        self.assertFalse(SubUnit.objects.exists())
+        # Nothing is deleted yet
+        self.assertEqual(Unit.all_objects.count(), 6)
+
+    def test_job_deletes_subtree_in_batches(self):
+        job = PropertyDeletionJob.objects.schedule(self.estate)
+        self.assertEqual(process_deletion_jobs(batch_size=2), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJobStatusEnums.DONE)
+        self.assertFalse(Estate.all_objects.exists())
+        self.assertEqual(list(Building.all_objects.all()), [self.other_building])
+        self.assertFalse(Unit.all_objects.exists())
+        self.assertFalse(SubUnit.all_objects.exists())
+        self.assertFalse(PropertyImage.objects.exists())
+        self.assertEqual(list(PendingFileDeletion.objects.values_list('name', flat=True)), ["property_images/unit.jpg"])
+        self.assertEqual(
+            list(PortfolioNode.objects.values_list('object_id', flat=True)), [self.other_building.pk]
+        )
+        self.assertIsNone(OccupancyRollup.objects.for_object(self.estate))
+        self.assertIsNone(OccupancyRollup.objects.for_object(self.company))
+        # 6 subunits, 6 units, 6 amenity relations, 2 buildings, the estate, 1 image and 15 nodes
+        self.assertEqual(job.rows_deleted, 37)
+
+    def test_building_job_updates_estate_counter(self):
+        PropertyDeletionJob.objects.schedule(self.buildings[0])
+        process_deletion_jobs()
+        self.estate.refresh_from_db()
+        self.assertEqual(self.estate.total_buildings, 1)
+        self.assertEqual(Unit.all_objects.count(), 3)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        job = PropertyDeletionJob.objects.schedule(self.estate)
+        self.assertEqual(PropertyDeletionJob.objects.claim(), job)
+        self.assertIsNone(PropertyDeletionJob.objects.claim())
+
+    def test_pending_files_are_removed_from_storage(self):
+        PendingFileDeletion.objects.create(name="a.jpg")
+        PendingFileDeletion.objects.create(name="b.jpg")
+        storage = PropertyImage._meta.get_field('image').storage
+        with mock.patch.object(storage, 'delete', side_effect=[None, OSError("unavailable")]):
+            self.assertEqual(delete_pending_files(), 1)
+        remaining = PendingFileDeletion.objects.get()
+        self.assertEqual((remaining.name, remaining.attempts), ("b.jpg", 1))
+
+
+class PropertyDeleteViewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Test Company")
+        self.company.users.add(self.user)
+        self.user.active_company = self.company
+        self.user.save()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.estate = Estate.objects.create(name="Green Park", company=self.company)
+
+    def test_delete_returns_job(self):
+        response = self.client.delete(reverse('properties:delete-estate', args=[self.estate.pk]))
+        self.assertEqual(response.status_code, 202)
+        job = PropertyDeletionJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.requested_by, self.user)
+        self.assertFalse(Estate.objects.exists())
+
+        status = self.client.get(response.json()['job_url']).json()
+        self.assertEqual(status['status'], 'pending')
+
+        # Already hidden, so a second delete finds nothing
+        response = self.client.delete(reverse('properties:delete-estate', args=[self.estate.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cannot_delete_other_company_property(self):
+        other = Building.objects.create(name="Other", company=Company.objects.create(name="Other Company"))
+        response = self.client.delete(reverse('properties:delete-building', args=[other.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Building.objects.filter(pk=other.pk).exists())
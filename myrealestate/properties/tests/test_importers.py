@@ -0,0 +1,149 @@
+import io
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from myrealestate.properties.importers import BuildingImporter, UnitImporter, read_rows
+from myrealestate.properties.models import (
+    Estate, Building, Unit, EstateTypeEnums, BuildingTypeEnums, UnitTypeEnums, OccupancyRollup,
+    OccupancyInterval, PortfolioNode, PortfolioNodeTypeEnums,
+)
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+def csv_rows(text):
+    return read_rows(io.BytesIO(text.encode()), 'import.csv')
+
+
+class PropertyImporterTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(
+            name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company
+        )
+
+    def test_import_buildings(self):
+        result = BuildingImporter(self.company).run(csv_rows(
+            "Name,Building_Type,Estate,Address\n"
+            "Block A,Multi Unit,Green Park,1 Main St\n"
+            "Cottage,S,,2 Side St\n"
+            "Block B,Multi Unit,Unknown Estate,\n"
+        ))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.rejected, 1)
+        self.assertIn("Unknown Estate", result.errors[0][2])
+        self.assertEqual(result.errors[0][0], 4)
+
+        block = Building.objects.get(name="Block A")
+        self.assertEqual(block.estate, self.estate)
+        self.estate.refresh_from_db()
+        self.assertEqual(self.estate.total_buildings, 1)
+
+        # Single unit buildings get their house like they do through save()
+        cottage = Building.objects.get(name="Cottage")
+        self.assertEqual(cottage.units.get().unit_type, UnitTypeEnums.HOUSE)
+
+    def test_import_units_validates_rows(self):
+        building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company
+        )
+        Unit.objects.create(building=building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT)
+
+        result = UnitImporter(self.company, chunk_size=2).run(csv_rows(
+            "building,number,unit_type,bedrooms,base_rent,is_vacant\n"
+            "Block A,2,Apartment,2,1200.00,no\n"
+            "Block A,1,Apartment,1,900,yes\n"
+            "Block A,3,House,,,\n"
+            "Block A,2,Apartment,,,\n"
+            "Block A,4,Apartment,many,,\n"
+            "Nowhere,1,,,,\n"
+        ))
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.rejected, 5)
+        self.assertEqual([row for row, _, _ in result.errors], [3, 4, 5, 6, 7])
+
+        unit = Unit.objects.get(building=building, number="2")
+        self.assertFalse(unit.is_vacant)
+        self.assertEqual(unit.bedrooms, 2)
+        building.refresh_from_db()
+        self.assertEqual(building.total_units, 2)
+        rollup = OccupancyRollup.objects.for_object(building)
+        self.assertEqual(rollup.total_units, 2)
+        self.assertEqual(rollup.tenanted_units, 0)
+
+    def test_refresh_is_limited_to_imported_rows(self):
+        Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company, estate=self.estate
+        )
+        other = Building.objects.create(name="Other", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company)
+        Building.objects.filter(pk=other.pk).update(total_units=7)
+
+        UnitImporter(self.company).run(csv_rows(
+            "building,number,base_rent,is_vacant\n"
+            "Block A,1,1000,no\n"
+            "Block A,2,800,yes\n"
+        ))
+        BuildingImporter(self.company).run(csv_rows("name,building_type,estate\nCottage,S,Green Park\n"))
+
+        # Rows outside the import are left as they were
+        other.refresh_from_db()
+        self.assertEqual(other.total_units, 7)
+
+        units = Unit.objects.filter(company=self.company)
+        self.assertEqual(OccupancyInterval.objects.filter(node_type=PortfolioNodeTypeEnums.UNIT, object_id__in=units.values("pk")).count(), 3)
+        self.assertEqual(PortfolioNode.objects.filter(company_id=self.company.pk).count(), 7)
+        self.estate.refresh_from_db()
+        self.assertEqual(self.estate.total_buildings, 2)
+
+        # Estate and company rollups agree with a full rebuild
+        scoped = set(OccupancyRollup.objects.values_list('scope_type', 'scope_id', 'total_units', 'actual_rent'))
+        OccupancyRollup.objects.reconcile(self.company.pk)
+        rebuilt = set(OccupancyRollup.objects.values_list('scope_type', 'scope_id', 'total_units', 'actual_rent'))
+        self.assertEqual(scoped, rebuilt)
+
+    def test_error_report(self):
+        result = BuildingImporter(self.company).run(csv_rows("name,estate\nBlock A,Missing\n"))
+        report = io.StringIO()
+        result.write_error_report(report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(lines[0], "row,error,name,estate")
+        self.assertTrue(lines[1].startswith("2,"))
+
+
+class PropertyImportViewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(email_verified=True)
+        self.company = Company.objects.create(name="Test Company")
+        self.company.users.add(self.user)
+        self.user.active_company = self.company
+        self.user.save()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('properties:import-properties')
+
+    def upload(self, content, name='buildings.csv'):
+        return self.client.post(self.url, {
+            'kind': 'buildings',
+            'file': SimpleUploadedFile(name, content.encode(), content_type='text/csv'),
+        })
+
+    def test_import_redirects_on_success(self):
+        response = self.upload("name\nBlock A\nBlock B\n")
+        self.assertRedirects(response, reverse('properties:building-list'), fetch_redirect_response=False)
+        self.assertEqual(Building.objects.filter(company=self.company).count(), 2)
+
+    def test_import_returns_error_report(self):
+        response = self.upload("name,estate\nBlock A,\nBlock B,Missing\n")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(b"Missing", response.content)
+        self.assertEqual(Building.objects.filter(company=self.company).count(), 1)
+
+    def test_rejects_unsupported_file_type(self):
+        response = self.upload("name\nBlock A\n", name='buildings.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Building.objects.exists())
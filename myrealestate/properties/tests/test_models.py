@@ -2,11 +2,14 @@ from django.test import TestCase
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import timedelta
+from django.core.management import call_command
+from io import StringIO
 
 from myrealestate.properties.models import (
     Estate, Building, Unit, SubUnit, 
     BuildingTypeEnums, UnitTypeEnums, EstateTypeEnums, SubUnitTypeEnums,
-    Amenity, PropertyFeature, PropertyImage
+    Amenity, PropertyFeature, PropertyImage, PortfolioNode, PortfolioNodeTypeEnums, OccupancyRollup,
+    prefetch_unit_catalog
 )
 from myrealestate.companies.tests.factories import CompanyFactory
 from myrealestate.accounts.tests.factories import UserFactory
@@ -89,6 +92,11 @@ class BuildingModelTest(TestCase):
         unit = self.single_building.units.first()
         self.assertEqual(unit.unit_type, UnitTypeEnums.HOUSE)
         self.assertEqual(unit.number, "1")
+
+    def test_saving_soft_deleted_building_keeps_its_house(self):
+        Building.all_objects.filter(pk=self.single_building.pk).update(is_deleted=True)
+        Building.all_objects.get(pk=self.single_building.pk).save()
+        self.assertEqual(Unit.all_objects.filter(building=self.single_building).count(), 1)
     
     def test_building_manager_methods(self):
         """Test the custom manager methods for Building"""
@@ -357,4 +365,377 @@ class SubUnitModelTest(TestCase):
         )
         
         # Should not be in available units (future date)
-        self.assertNotIn(future_subunit, SubUnit.objects.available())
\ No newline at end of file
+        self.assertNotIn(future_subunit, SubUnit.objects.available())
+
+    def test_subunit_company_follows_parent_unit(self):
+        """Test that the denormalized company always matches the parent unit's"""
+        self.assertEqual(self.subunit.company, self.company)
+
+        other_company = CompanyFactory()
+        self.unit.company = other_company
+        self.unit.save()
+        self.assertEqual(
+            set(SubUnit.objects.filter(parent_unit=self.unit).values_list('company', flat=True)),
+            {other_company.pk}
+        )
+
+class UnitCatalogIndexTest(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.building = Building.objects.create(
+            company=self.company,
+            name="Multi Unit Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        self.unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="101",
+            unit_type=UnitTypeEnums.APARTMENT
+        )
+        self.other_unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="102",
+            unit_type=UnitTypeEnums.APARTMENT
+        )
+        self.pool = Amenity.objects.create(name="Pool", icon="pool", category="Recreation")
+        self.parking = Amenity.objects.create(name="Parking", icon="car", category="Parking")
+        self.aircon = PropertyFeature.objects.create(name="Aircon", icon="wind", category="Climate")
+
+    def test_add_amenity_and_feature_update_index(self):
+        """add_amenity/add_feature keep the id arrays in sync"""
+        self.unit.add_amenity(self.pool)
+        self.unit.add_feature(self.aircon)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.amenity_ids, [self.pool.pk])
+        self.assertEqual(self.unit.feature_ids, [self.aircon.pk])
+
+    def test_m2m_changes_update_index(self):
+        """Adding and removing through the m2m managers keeps the arrays in sync"""
+        self.unit.amenities.add(self.pool, self.parking)
+        self.parking.units.add(self.other_unit)
+        self.unit.refresh_from_db()
+        self.other_unit.refresh_from_db()
+        self.assertEqual(self.unit.amenity_ids, sorted([self.pool.pk, self.parking.pk]))
+        self.assertEqual(self.other_unit.amenity_ids, [self.parking.pk])
+
+        self.unit.amenities.remove(self.pool)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.amenity_ids, [self.parking.pk])
+
+        self.parking.delete()
+        self.other_unit.refresh_from_db()
+        self.assertEqual(self.other_unit.amenity_ids, [])
+
+    def test_with_all_amenities(self):
+        """Containment filter only returns units with every requested amenity"""
+        self.unit.add_amenity(self.pool)
+        self.unit.add_amenity(self.parking)
+        self.other_unit.add_amenity(self.pool)
+
+        matches = Unit.objects.with_all_amenities([self.pool, self.parking])
+        self.assertEqual(list(matches), [self.unit])
+        self.assertEqual(Unit.objects.with_all_amenities([self.pool.pk]).count(), 2)
+
+    def test_rebuild_catalog_index(self):
+        """rebuild_catalog_index recomputes the arrays from the relation tables"""
+        self.unit.add_amenity(self.pool)
+        Unit.objects.filter(pk=self.unit.pk).update(amenity_ids=[], feature_ids=[999])
+
+        Unit.objects.rebuild_catalog_index()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.amenity_ids, [self.pool.pk])
+        self.assertEqual(self.unit.feature_ids, [])
+
+
+class UnitCatalogGroupingTest(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.building = Building.objects.create(
+            company=self.company,
+            name="Multi Unit Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        pool = Amenity.objects.create(name="Pool", icon="pool", category="Recreation")
+        gym = Amenity.objects.create(name="Gym", icon="gym", category="Fitness")
+        floors = PropertyFeature.objects.create(name="Hardwood Floors", icon="floor", category="Interior")
+        for number in range(5):
+            unit = Unit.objects.create(
+                building=self.building, company=self.company, number=str(number), unit_type=UnitTypeEnums.APARTMENT
+            )
+            unit.add_amenity(pool)
+            unit.add_amenity(gym)
+            unit.add_feature(floors)
+
+    def test_grouping_many_units_takes_three_queries(self):
+        with self.assertNumQueries(3):
+            units = list(Unit.objects.with_grouped_amenities())
+            for unit in units:
+                amenities = unit.get_amenities_by_category()
+                features = unit.get_features_by_category()
+        self.assertEqual(list(amenities), ["Fitness", "Recreation"])
+        self.assertEqual([relation.feature.name for relation in features["Interior"]], ["Hardwood Floors"])
+
+    def test_prefetch_list_of_units(self):
+        units = list(Unit.objects.filter(building=self.building))
+        prefetch_unit_catalog(units)
+        with self.assertNumQueries(0):
+            grouped = [unit.get_amenities_by_category() for unit in units]
+        self.assertEqual(grouped[0], units[0].get_amenities_by_category())
+        self.assertEqual(len(grouped[0]["Recreation"]), 1)
+
+    def test_matches_unprefetched_grouping(self):
+        unit = Unit.objects.first()
+        prefetched = Unit.objects.with_grouped_amenities().get(pk=unit.pk)
+        self.assertEqual(
+            {category: [r.pk for r in relations] for category, relations in unit.get_amenities_by_category().items()},
+            {category: [r.pk for r in relations] for category, relations in prefetched.get_amenities_by_category().items()},
+        )
+
+
+class PortfolioHierarchyTest(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.estate = Estate.objects.create(name="Test Estate", company=self.company)
+        self.other_estate = Estate.objects.create(name="Other Estate", company=self.company)
+        self.building = Building.objects.create(
+            estate=self.estate,
+            company=self.company,
+            name="Multi Unit Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        self.unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="101",
+            unit_type=UnitTypeEnums.APARTMENT,
+            is_vacant=False
+        )
+        self.vacant_unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="102",
+            unit_type=UnitTypeEnums.APARTMENT
+        )
+        self.subunit = SubUnit.objects.create(parent_unit=self.unit, number="101A")
+
+    def test_paths_follow_hierarchy(self):
+        """Each node path is prefixed by its ancestors' paths"""
+        node = PortfolioNode.objects.get(node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id=self.subunit.pk)
+        self.assertEqual(
+            node.path,
+            f"e{self.estate.pk}/b{self.building.pk}/u{self.unit.pk}/s{self.subunit.pk}/"
+        )
+        self.assertEqual(node.depth, 4)
+        self.assertEqual(node.company, self.company)
+
+    def test_rollup(self):
+        """rollup counts everything under an estate from the node table"""
+        rollup = PortfolioNode.objects.rollup(self.estate)
+        self.assertEqual(rollup, {
+            'total_buildings': 1,
+            'total_units': 2,
+            'vacant_units': 1,
+            'total_subunits': 1,
+            'vacant_subunits': 1,
+        })
+        unit_ids = PortfolioNode.objects.descendant_ids(self.estate, PortfolioNodeTypeEnums.UNIT)
+        self.assertEqual(Unit.objects.filter(pk__in=unit_ids).count(), 2)
+
+    def test_moving_building_moves_subtree(self):
+        """Reassigning a building's estate re-roots all of its descendants"""
+        self.building.estate = self.other_estate
+        self.building.save()
+
+        self.assertEqual(PortfolioNode.objects.rollup(self.estate)['total_units'], 0)
+        self.assertEqual(PortfolioNode.objects.rollup(self.other_estate)['total_subunits'], 1)
+
+    def test_delete_removes_subtree(self):
+        """Deleting a building drops its node and every descendant node"""
+        self.building.delete()
+        self.assertEqual(PortfolioNode.objects.subtree(self.estate).count(), 0)
+        self.assertTrue(PortfolioNode.objects.filter(node_type=PortfolioNodeTypeEnums.ESTATE).exists())
+
+    def test_rebuild(self):
+        """rebuild recreates the same nodes the signals maintain"""
+        expected = set(PortfolioNode.objects.values_list('node_type', 'object_id', 'path'))
+        PortfolioNode.objects.all().delete()
+
+        PortfolioNode.objects.rebuild(batch_size=2)
+        self.assertEqual(set(PortfolioNode.objects.values_list('node_type', 'object_id', 'path')), expected)
+
+
+class OccupancyRollupTest(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.estate = Estate.objects.create(name="Test Estate", company=self.company)
+        self.other_estate = Estate.objects.create(name="Other Estate", company=self.company)
+        self.building = Building.objects.create(
+            estate=self.estate,
+            company=self.company,
+            name="Multi Unit Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        self.unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="101",
+            unit_type=UnitTypeEnums.APARTMENT,
+            base_rent=1000
+        )
+        self.occupied_unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="102",
+            unit_type=UnitTypeEnums.APARTMENT,
+            is_vacant=False,
+            main_tenant=UserFactory(),
+            base_rent=1500
+        )
+        self.subunit = SubUnit.objects.create(parent_unit=self.unit, number="101A")
+
+    def assertRollup(self, obj, **expected):
+        rollup = OccupancyRollup.objects.for_object(obj)
+        for field, value in expected.items():
+            self.assertEqual(getattr(rollup, field), value, field)
+
+    def test_rollups_follow_creates(self):
+        """New units and subunits are added to building, estate and company rollups"""
+        for scope in (self.building, self.estate, self.company):
+            self.assertRollup(
+                scope, total_units=2, vacant_units=1, tenanted_units=1,
+                total_subunits=1, vacant_subunits=1,
+                potential_rent=2500, actual_rent=1500
+            )
+
+    def test_rollups_follow_updates(self):
+        """Changing vacancy, tenant or rent applies only the difference"""
+        unit = Unit.objects.get(pk=self.unit.pk)
+        unit.is_vacant = False
+        unit.base_rent = 1200
+        unit.save()
+        subunit = SubUnit.objects.get(pk=self.subunit.pk)
+        subunit.is_vacant = False
+        subunit.save()
+
+        self.assertRollup(
+            self.estate, total_units=2, vacant_units=0, vacant_subunits=0,
+            potential_rent=2700, actual_rent=2700
+        )
+
+    def test_rollups_follow_deletes_and_moves(self):
+        """Deleting units and moving buildings keep the rollups consistent"""
+        self.occupied_unit.delete()
+        self.assertRollup(self.company, total_units=1, tenanted_units=0, actual_rent=0)
+
+        self.building.estate = self.other_estate
+        self.building.save()
+        self.assertRollup(self.estate, total_units=0, total_subunits=0, potential_rent=0)
+        self.assertRollup(self.other_estate, total_units=1, total_subunits=1, potential_rent=1000)
+
+    def test_unit_move_carries_its_subunits(self):
+        """Moving a unit to another building moves its subunits' totals along with it"""
+        other_building = Building.objects.create(
+            estate=self.other_estate, company=self.company, name="Other Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        unit = Unit.objects.get(pk=self.unit.pk)
+        unit.building = other_building
+        unit.save()
+        self.assertRollup(self.building, total_subunits=0, vacant_subunits=0)
+        self.assertRollup(other_building, total_subunits=1, vacant_subunits=1)
+
+        incremental = list(OccupancyRollup.objects.order_by('scope_type', 'scope_id').values())
+        OccupancyRollup.objects.reconcile(self.company.pk)
+        reconciled = list(OccupancyRollup.objects.order_by('scope_type', 'scope_id').values())
+        strip = lambda rows: [{k: v for k, v in row.items() if k != 'id'} for row in rows]
+        self.assertEqual(strip(incremental), strip(reconciled))
+
+    def test_reconcile(self):
+        """reconcile rebuilds the same figures the deltas maintain"""
+        expected = {
+            (row['scope_type'], row['scope_id']): row
+            for row in OccupancyRollup.objects.values()
+        }
+        OccupancyRollup.objects.all().delete()
+
+        OccupancyRollup.objects.reconcile()
+        rebuilt = {
+            (row['scope_type'], row['scope_id']): row
+            for row in OccupancyRollup.objects.values()
+        }
+        self.assertEqual(
+            {key: {k: v for k, v in row.items() if k != 'id'} for key, row in rebuilt.items()},
+            {key: {k: v for k, v in row.items() if k != 'id'} for key, row in expected.items()},
+        )
+
+
+class CounterCacheTest(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.estate = Estate.objects.create(name="Test Estate", company=self.company)
+        self.other_estate = Estate.objects.create(name="Other Estate", company=self.company)
+        self.building = Building.objects.create(
+            estate=self.estate,
+            company=self.company,
+            name="Multi Unit Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        self.unit = Unit.objects.create(
+            building=self.building,
+            company=self.company,
+            number="101",
+            unit_type=UnitTypeEnums.APARTMENT
+        )
+        SubUnit.objects.create(parent_unit=self.unit, number="101A")
+        SubUnit.objects.create(parent_unit=self.unit, number="101B")
+
+    def refresh(self):
+        for obj in (self.estate, self.other_estate, self.building, self.unit):
+            obj.refresh_from_db()
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Creating and deleting children updates the parent counters"""
+        self.refresh()
+        self.assertEqual(self.estate.total_buildings, 1)
+        self.assertEqual(self.building.total_units, 1)
+        self.assertEqual(self.unit.total_subunits, 2)
+
+        self.unit.subunits.first().delete()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.total_subunits, 1)
+
+    def test_counters_follow_reassignment(self):
+        """Moving a building to another estate moves the count with it"""
+        self.building.estate = self.other_estate
+        self.building.save()
+        self.refresh()
+        self.assertEqual(self.estate.total_buildings, 0)
+        self.assertEqual(self.other_estate.total_buildings, 1)
+
+    def test_stale_instance_does_not_overwrite_counter(self):
+        """Saving an instance loaded before a child was added keeps the stored count"""
+        stale_estate = Estate.objects.get(pk=self.estate.pk)
+        Building.objects.create(
+            estate=self.estate,
+            company=self.company,
+            name="Second Building",
+            building_type=BuildingTypeEnums.MULTI_UNIT
+        )
+        stale_estate.name = "Renamed Estate"
+        stale_estate.save()
+        self.refresh()
+        self.assertEqual(self.estate.name, "Renamed Estate")
+        self.assertEqual(self.estate.total_buildings, 2)
+
+    def test_recompute_counter_caches_command(self):
+        """The management command restores drifted counters"""
+        Estate.objects.update(total_buildings=99)
+        Unit.objects.update(total_subunits=0)
+
+        call_command('recompute_counter_caches', stdout=StringIO())
+        self.refresh()
+        self.assertEqual(self.estate.total_buildings, 1)
+        self.assertEqual(self.other_estate.total_buildings, 0)
+        self.assertEqual(self.unit.total_subunits, 2)
@@ -0,0 +1,177 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from myrealestate.properties.bulk_operations import UnitBulkChange
+from myrealestate.properties.models import (
+    Estate, Building, Unit, SubUnit, OccupancyInterval, EstateTypeEnums, BuildingTypeEnums,
+    UnitTypeEnums, PortfolioNodeTypeEnums,
+)
+from myrealestate.companies.models import Company
+from myrealestate.accounts.tests.factories import UserFactory
+
+
+def on(day):
+    return mock.patch.object(timezone, 'localdate', return_value=day)
+
+
+class OccupancyIntervalTest(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name="Test Company")
+        self.estate = Estate.objects.create(
+            name="Green Park", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company
+        )
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, estate=self.estate, company=self.company
+        )
+        self.tenant = UserFactory()
+        with on(date(2026, 1, 1)):
+            self.unit = Unit.objects.create(
+                building=self.building, company=self.company, number="1", unit_type=UnitTypeEnums.APARTMENT
+            )
+        self.unit_id = self.unit.pk
+
+    def spans(self):
+        return list(OccupancyInterval.objects.filter(
+            node_type=PortfolioNodeTypeEnums.UNIT, object_id=self.unit_id
+        ).order_by('period'))
+
+    def let(self, day, tenant=None):
+        with on(day):
+            self.unit.is_vacant = False
+            self.unit.main_tenant = tenant or self.tenant
+            self.unit.save()
+
+    def test_creation_opens_span(self):
+        span, = self.spans()
+        self.assertTrue(span.is_vacant)
+        self.assertEqual(span.period.lower, date(2026, 1, 1))
+        self.assertIsNone(span.period.upper)
+        self.assertEqual((span.building_id, span.estate_id), (self.building.pk, self.estate.pk))
+
+    def test_transition_closes_and_opens(self):
+        self.let(date(2026, 2, 15))
+        vacant, occupied = self.spans()
+        self.assertEqual(vacant.period.upper, date(2026, 2, 15))
+        self.assertFalse(occupied.is_vacant)
+        self.assertEqual(occupied.tenant, self.tenant)
+        self.assertIsNone(occupied.period.upper)
+
+        # Saving without an occupancy change leaves the history alone
+        with on(date(2026, 3, 1)):
+            self.unit.base_rent = 1500
+            self.unit.save()
+        self.assertEqual(len(self.spans()), 2)
+
+    def test_same_day_change_replaces_span(self):
+        self.let(date(2026, 2, 15))
+        self.let(date(2026, 2, 15), tenant=UserFactory())
+        vacant, occupied = self.spans()
+        self.assertNotEqual(occupied.tenant, self.tenant)
+
+    def test_delete_closes_span(self):
+        with on(date(2026, 3, 1)):
+            self.unit.delete()
+        span, = self.spans()
+        self.assertEqual(span.period.upper, date(2026, 3, 1))
+
+    def test_same_day_delete_keeps_span(self):
+        with on(date(2026, 3, 1)):
+            unit = Unit.objects.create(
+                building=self.building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT
+            )
+            unit_id = unit.pk
+            unit.delete()
+        span = OccupancyInterval.objects.get(node_type=PortfolioNodeTypeEnums.UNIT, object_id=unit_id)
+        self.assertEqual((span.period.lower, span.period.upper), (date(2026, 3, 1), date(2026, 3, 2)))
+
+    def test_building_move_starts_new_spans(self):
+        with on(date(2026, 1, 10)):
+            subunit = SubUnit.objects.create(parent_unit=self.unit, number="1A")
+        other_estate = Estate.objects.create(
+            name="Oak Hill", estate_type=EstateTypeEnums.RESIDENTIAL, company=self.company
+        )
+        with on(date(2026, 4, 1)):
+            self.building.estate = other_estate
+            self.building.save()
+
+        # History is append-only: the closed span keeps the estate it was recorded under
+        before, after = self.spans()
+        self.assertEqual((before.estate_id, before.period.upper), (self.estate.pk, date(2026, 4, 1)))
+        self.assertEqual((after.estate_id, after.period.lower), (other_estate.pk, date(2026, 4, 1)))
+        subunit_spans = OccupancyInterval.objects.filter(
+            node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id=subunit.pk
+        ).order_by('period')
+        self.assertEqual([span.estate_id for span in subunit_spans], [self.estate.pk, other_estate.pk])
+
+    def test_unit_move_starts_new_subunit_spans(self):
+        with on(date(2026, 1, 10)):
+            subunit = SubUnit.objects.create(parent_unit=self.unit, number="1A")
+        other_building = Building.objects.create(
+            name="Block B", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company
+        )
+        with on(date(2026, 5, 1)):
+            self.unit.building = other_building
+            self.unit.save()
+        subunit_spans = OccupancyInterval.objects.filter(
+            node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id=subunit.pk
+        ).order_by('period')
+        self.assertEqual(
+            [(span.building_id, span.period.upper) for span in subunit_spans],
+            [(self.building.pk, date(2026, 5, 1)), (other_building.pk, None)],
+        )
+
+    def test_subunit_history(self):
+        with on(date(2026, 1, 10)):
+            subunit = SubUnit.objects.create(parent_unit=self.unit, number="1A")
+        with on(date(2026, 1, 20)):
+            subunit.is_vacant = False
+            subunit.sublet_tenant = self.tenant
+            subunit.save()
+        spans = OccupancyInterval.objects.filter(node_type=PortfolioNodeTypeEnums.SUBUNIT, object_id=subunit.pk)
+        self.assertEqual(spans.count(), 2)
+        self.assertEqual(spans.get(period__endswith__isnull=True).tenant, self.tenant)
+
+    def test_bulk_vacancy_change_is_recorded(self):
+        with on(date(2026, 2, 1)):
+            UnitBulkChange(set_vacant=False).apply(Unit.objects.all(), self.company)
+        vacant, occupied = self.spans()
+        self.assertEqual(vacant.period.upper, date(2026, 2, 1))
+        self.assertFalse(occupied.is_vacant)
+
+    def test_sync_repairs_open_spans(self):
+        Unit.objects.filter(pk=self.unit.pk).update(is_vacant=False)
+        with on(date(2026, 2, 1)):
+            self.assertEqual(OccupancyInterval.objects.sync(self.company.pk), 1)
+            self.assertEqual(OccupancyInterval.objects.sync(self.company.pk), 0)
+        self.assertFalse(self.spans()[-1].is_vacant)
+
+    def test_monthly_rates(self):
+        with on(date(2026, 1, 1)):
+            Unit.objects.create(
+                building=self.building, company=self.company, number="2", unit_type=UnitTypeEnums.APARTMENT,
+                is_vacant=False,
+            )
+        self.let(date(2026, 2, 15))
+
+        with on(date(2026, 3, 10)):
+            months = OccupancyInterval.objects.monthly_rates(self.company, date(2025, 12, 1))
+        self.assertEqual([month['month'] for month in months], [
+            date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1),
+        ])
+        december, january, february, march = months
+        self.assertEqual(december['unit_days'], 0)
+        self.assertEqual((january['unit_days'], january['vacant_unit_days']), (62, 31))
+        self.assertEqual(january['vacancy_rate'], 0.5)
+        self.assertEqual((february['unit_days'], february['vacant_unit_days']), (56, 14))
+        # The current month only counts the days up to today
+        self.assertEqual((march['unit_days'], march['vacant_unit_days']), (20, 0))
+        self.assertEqual(march['occupancy_rate'], 1)
+
+        with on(date(2026, 3, 10)):
+            building_months = OccupancyInterval.objects.monthly_rates(self.building, date(2026, 1, 1))
+            estate_months = OccupancyInterval.objects.monthly_rates(self.estate, date(2026, 1, 1))
+        self.assertEqual(building_months, months[1:])
+        self.assertEqual(estate_months, months[1:])
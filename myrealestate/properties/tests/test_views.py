@@ -2,12 +2,13 @@ from django.test import TestCase, Client
 from django.urls import reverse
 
 from myrealestate.properties.models import (
-    Estate, Building, Unit, Amenity, PropertyFeature,
+    Estate, Building, Unit, SubUnit, Amenity, PropertyFeature,
     EstateTypeEnums, BuildingTypeEnums, UnitTypeEnums
 )
 from myrealestate.companies.models import Company
 from myrealestate.accounts.tests.factories import UserFactory
 
+import io
 import json
 
 
@@ -342,4 +343,62 @@ class UnitViewTests(PropertyViewTestMixin, TestCase):
         self.assertEqual(self.unit.base_rent, 1200)
         # Check that other fields weren't changed
         self.assertEqual(self.unit.number, '101')
-        self.assertEqual(self.unit.square_footage, 800)
\ No newline at end of file
+        self.assertEqual(self.unit.square_footage, 800)
+
+
+class ExportViewTests(PropertyViewTestMixin, TestCase):
+    """Tests for the streaming export views"""
+
+    def setUp(self):
+        super().setUp()
+        self.building = Building.objects.create(
+            name="Block A", building_type=BuildingTypeEnums.MULTI_UNIT, company=self.company
+        )
+        self.unit = Unit.objects.create(
+            building=self.building, company=self.company, number="101",
+            unit_type=UnitTypeEnums.APARTMENT, base_rent=1000
+        )
+        SubUnit.objects.create(parent_unit=self.unit, number="1")
+
+        other_company = Company.objects.create(name="Other Company")
+        other_building = Building.objects.create(name="Other Block", company=other_company)
+        other_unit = Unit.objects.create(
+            building=other_building, company=other_company, number="999", unit_type=UnitTypeEnums.APARTMENT
+        )
+        SubUnit.objects.create(parent_unit=other_unit, number="77")
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f'properties:export-{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_building_csv_export(self):
+        response = self.export('building')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "Name,Type,Estate,Address,Managing,Total Units")
+        self.assertEqual(lines[1], "Block A,Multi Unit,,,False,1")
+        self.assertEqual(len(lines), 2)
+
+    def test_export_honours_search(self):
+        Building.objects.create(name="Tower", company=self.company)
+        response = self.export('building', q='tow')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ["Tower"])
+
+    def test_subunit_export_is_company_scoped(self):
+        response = self.export('subunit')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("Block A,101,1,"))
+
+    def test_unit_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = self.export('unit', format='xlsx')
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:3], ('Building', 'Number', 'Type'))
+        self.assertEqual(rows[1][:3], ('Block A', '101', 'Apartment'))
+        self.assertEqual(len(rows), 2)
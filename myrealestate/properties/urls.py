@@ -1,5 +1,5 @@
 from django.urls import path
-from myrealestate.properties.views import EstateCreateView, EstateListView, EstateDeleteView, BuildingCreateView, BuildingListView, BuildingUpdateView, UnitCreateView, UnitListView, UnitUpdateView, EstateUpdateView, PropertyImageUploadView, PropertyImageDeleteView, PropertyImageSetPrimaryView
+from myrealestate.properties.views import EstateCreateView, EstateListView, EstateDeleteView, BuildingCreateView, BuildingListView, BuildingUpdateView, UnitCreateView, UnitListView, UnitUpdateView, EstateUpdateView, PropertyImageUploadView, PropertyImageDeleteView, PropertyImageSetPrimaryView, PropertyImportView, EstateExportView, BuildingExportView, UnitExportView, SubUnitExportView, UnitBulkUpdateView, BuildingDeleteView, DeletionJobStatusView, UnitComparablesView
 
 
 app_name = "properties"
@@ -15,12 +15,23 @@ urlpatterns = [
     path("buildings/new/", BuildingCreateView.as_view(), name="create-building"),
     path("buildings/", BuildingListView.as_view(), name="building-list"),
     path('buildings/<int:pk>/update/', BuildingUpdateView.as_view(), name='update-building'),
-    #path('buildings/<int:pk>/delete/', BuildingDeleteView.as_view(), name='delete-building'),
+    path('buildings/<int:pk>/delete/', BuildingDeleteView.as_view(), name='delete-building'),
 
     # Units
     path("units/new/", UnitCreateView.as_view(), name="create-unit"),
     path("units/", UnitListView.as_view(), name="unit-list"),
     path('units/<int:pk>/update/', UnitUpdateView.as_view(), name='update-unit'),
+    path('units/<int:pk>/comparables/', UnitComparablesView.as_view(), name='unit-comparables'),
+    path("units/bulk-update/", UnitBulkUpdateView.as_view(), name="bulk-update-units"),
+
+    path('deletion-jobs/<int:pk>/', DeletionJobStatusView.as_view(), name='deletion-job'),
+
+    # Bulk import / export
+    path("import/", PropertyImportView.as_view(), name="import-properties"),
+    path("estates/export/", EstateExportView.as_view(), name="export-estate"),
+    path("buildings/export/", BuildingExportView.as_view(), name="export-building"),
+    path("units/export/", UnitExportView.as_view(), name="export-unit"),
+    path("subunits/export/", SubUnitExportView.as_view(), name="export-subunit"),
 
 
     # Image handling URLs
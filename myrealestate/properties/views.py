@@ -1,12 +1,17 @@
-from myrealestate.common.views import BaseListView, BaseCreateView, DeleteViewMixin, BaseUpdateView, PropertyImageHandlerMixin, CompanyViewMixin
+from myrealestate.common.views import BaseListView, BaseCreateView, DeleteViewMixin, BaseUpdateView, PropertyImageHandlerMixin, CompanyViewMixin, TitleMixin, ExportMixin
+from myrealestate.common.mixins import CompanyRequiredMixin
 from myrealestate.properties.models import Estate, Building, Unit, Amenity, PropertyFeature
-from myrealestate.properties.forms import EstateForm, BuildingForm, UnitForm, EstatePatchForm, BuildingPatchForm, UnitPatchForm
+from myrealestate.properties.forms import EstateForm, BuildingForm, UnitForm, EstatePatchForm, BuildingPatchForm, UnitPatchForm, PropertyImportForm, UnitBulkUpdateForm
+from myrealestate.properties.importers import IMPORTERS, read_rows
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from django.views import View
-from django.http import JsonResponse, Http404
+from django.views.generic import FormView
+from django.http import JsonResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404
-from .models import PropertyImage, Estate, Building, Unit, SubUnit
+from .models import PropertyImage, Estate, Building, Unit, SubUnit, UnitBulkOperation, PropertyDeletionJob, prefetch_unit_catalog
+from .catalog import amenity_catalog, feature_catalog
+from .comparables import DEFAULT_LIMIT, find_comparables
 from myrealestate.common.forms import PropertyImageForm
 import logging
 from django.contrib.contenttypes.models import ContentType
@@ -24,7 +29,7 @@ class EstateCreateView(PropertyImageHandlerMixin, BaseCreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['amenities'] = Amenity.objects.all().order_by('category', 'name')
+        context['amenity_groups'] = amenity_catalog.grouped()
         return context
 
     def form_valid(self, form):
@@ -44,6 +49,7 @@ class EstateListView(BaseListView):
     template_name = "properties/estate_list.html"
     context_object_name = "estates"
     title = "Estate List"
+    export_url_name = "properties:export-estate"
 
     def get_queryset(self):
         # Get the company-filtered queryset from parent class
@@ -52,10 +58,51 @@ class EstateListView(BaseListView):
         return queryset.filter(managing=True)
 
 
-class EstateDeleteView(DeleteViewMixin, View):
+class PropertyDeleteViewMixin(DeleteViewMixin):
+    """
+    Deletes in the background: the property and its subtree are hidden at once and a
+    PropertyDeletionJob removes the rows, so the request returns straight away with a
+    job to poll.
+    """
+    def get_queryset(self):
+        return self.model.objects.filter(company=self.get_company())
+
+    def get_object(self):
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+
+    def get_context_data(self, **kwargs):
+        return {'object': self.object, **kwargs}
+
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # Only queued here: `manage.py process_deletion_jobs` removes the rows
+        job = PropertyDeletionJob.objects.schedule(self.object, requested_by=request.user)
+
+        messages.success(request, f"{self.model._meta.verbose_name.title()} '{self.object}' is being deleted.")
+        return JsonResponse({
+            "status": "success",
+            "message": f"{self.model._meta.verbose_name.title()} scheduled for deletion.",
+            "job_id": job.pk,
+            "job_url": reverse('properties:deletion-job', args=[job.pk]),
+            "redirect_url": self.get_success_url(),
+        }, status=202)
+
+
+class EstateDeleteView(PropertyDeleteViewMixin, View):
     model = Estate
     def get_success_url(self):
         return reverse('properties:estate-list')
+
+
+class DeletionJobStatusView(CompanyRequiredMixin, CompanyViewMixin, View):
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(PropertyDeletionJob, pk=kwargs['pk'], company=self.get_company())
+        return JsonResponse({
+            "job_id": job.pk,
+            "status": job.get_status_display().lower(),
+            "rows_deleted": job.rows_deleted,
+            "error": job.error,
+        })
     
 
 class EstateUpdateView(PropertyImageHandlerMixin, BaseUpdateView):
@@ -66,7 +113,7 @@ class EstateUpdateView(PropertyImageHandlerMixin, BaseUpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['amenities'] = Amenity.objects.all().order_by('category', 'name')
+        context['amenity_groups'] = amenity_catalog.grouped()
         return context
 
     def form_valid(self, form):
@@ -96,6 +143,17 @@ class BuildingListView(BaseListView):
     template_name = "properties/building_list.html"
     context_object_name = "buildings"
     title = "Building List"
+    export_url_name = "properties:export-building"
+    search_fields = ["name", "address", "estate__name"]
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('estate')
+
+
+class BuildingDeleteView(PropertyDeleteViewMixin, View):
+    model = Building
+    def get_success_url(self):
+        return reverse('properties:building-list')
 
 
 class BuildingUpdateView(PropertyImageHandlerMixin,BaseUpdateView):
@@ -118,8 +176,8 @@ class UnitCreateView(PropertyImageHandlerMixin, BaseCreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['amenities'] = Amenity.objects.all().order_by('category', 'name')
-        context['features'] = PropertyFeature.objects.all().order_by('category', 'name')
+        context['amenity_groups'] = amenity_catalog.grouped()
+        context['feature_groups'] = feature_catalog.grouped()
         return context
 
     def form_valid(self, form):
@@ -139,6 +197,10 @@ class UnitListView(BaseListView):
     template_name = "properties/unit_list.html"
     context_object_name = "units"
     title = "Unit List"
+    export_url_name = "properties:export-unit"
+
+    def get_queryset(self):
+        return prefetch_unit_catalog(super().get_queryset().select_related('building'))
 
 
 class UnitUpdateView(PropertyImageHandlerMixin, BaseUpdateView):
@@ -149,15 +211,176 @@ class UnitUpdateView(PropertyImageHandlerMixin, BaseUpdateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['amenities'] = Amenity.objects.all().order_by('category', 'name')
-        context['features'] = PropertyFeature.objects.all().order_by('category', 'name')
+        context['amenity_groups'] = amenity_catalog.grouped()
+        context['feature_groups'] = feature_catalog.grouped()
+        context['comparables'] = comparables_for(self.object)
         return context
 
     def form_valid(self, form):
        #messages.success(self.request, f"Unit updated successfully.")
         return super(BaseUpdateView, self).form_valid(form)
+
+
+def comparables_for(unit, limit=DEFAULT_LIMIT):
+    """find_comparables() with each comparable's unit loaded (one query)"""
+    result = find_comparables(unit, limit=limit)
+    units = Unit.objects.filter(
+        company_id=unit.company_id, pk__in=[row['unit_id'] for row in result['comparables']]
+    ).select_related('building').in_bulk()
+    result['comparables'] = [
+        {**row, 'unit': units[row['unit_id']]} for row in result['comparables'] if row['unit_id'] in units
+    ]
+    return result
+
+
+class UnitComparablesView(CompanyRequiredMixin, CompanyViewMixin, View):
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        unit = get_object_or_404(Unit.objects.select_related('building'), pk=kwargs['pk'], company=self.get_company())
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), self.max_limit)
+        except ValueError:
+            return JsonResponse({"error": "limit must be a number"}, status=400)
+
+        result = comparables_for(unit, limit=limit)
+        return JsonResponse({
+            "unit_id": unit.pk,
+            "rent_percentiles": {f"p{percentile}": value for percentile, value in result['rent_percentiles'].items()},
+            "comparables": [
+                {
+                    "unit_id": row['unit_id'],
+                    "number": row['unit'].number,
+                    "building": row['unit'].building.name,
+                    "bedrooms": row['unit'].bedrooms,
+                    "bathrooms": row['unit'].bathrooms,
+                    "square_footage": row['unit'].square_footage,
+                    "furnished": row['unit'].furnished,
+                    "base_rent": row['base_rent'],
+                    "distance": row['distance'],
+                }
+                for row in result['comparables']
+            ],
+        })
     
 
+class EstateExportView(ExportMixin, EstateListView):
+    export_fields = (
+        ('Name', 'name'),
+        ('Type', 'estate_type'),
+        ('Address', 'address'),
+        ('Managing', 'managing'),
+        ('Total Buildings', 'total_buildings'),
+    )
+
+
+class BuildingExportView(ExportMixin, BuildingListView):
+    export_fields = (
+        ('Name', 'name'),
+        ('Type', 'building_type'),
+        ('Estate', 'estate__name'),
+        ('Address', 'address'),
+        ('Managing', 'managing'),
+        ('Total Units', 'total_units'),
+    )
+
+
+class UnitExportView(ExportMixin, UnitListView):
+    export_fields = (
+        ('Building', 'building__name'),
+        ('Number', 'number'),
+        ('Type', 'unit_type'),
+        ('Vacant', 'is_vacant'),
+        ('Bedrooms', 'bedrooms'),
+        ('Bathrooms', 'bathrooms'),
+        ('Square Footage', 'square_footage'),
+        ('Furnished', 'furnished'),
+        ('Parking Spots', 'parking_spots'),
+        ('Base Rent', 'base_rent'),
+        ('Deposit', 'deposit_amount'),
+        ('Available From', 'available_from'),
+        ('SubUnits', 'total_subunits'),
+    )
+
+
+class SubUnitExportView(ExportMixin, BaseListView):
+    model = SubUnit
+    export_fields = (
+        ('Building', 'parent_unit__building__name'),
+        ('Unit', 'parent_unit__number'),
+        ('Number', 'number'),
+        ('Type', 'subunit_type'),
+        ('Vacant', 'is_vacant'),
+        ('Furnished', 'furnished'),
+        ('Base Rent', 'base_rent'),
+        ('Deposit', 'deposit_amount'),
+        ('Available From', 'available_from'),
+    )
+
+
+class PropertyImportView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, FormView):
+    template_name = "common/form.html"
+    form_class = PropertyImportForm
+    title = "Import Buildings or Units"
+
+    def get_success_url(self):
+        if self.request.POST.get('kind') == 'units':
+            return reverse('properties:unit-list')
+        return reverse('properties:building-list')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['is_create'] = True
+        return context
+
+    def form_valid(self, form):
+        kind = form.cleaned_data['kind']
+        upload = form.cleaned_data['file']
+        result = IMPORTERS[kind](self.get_company()).run(read_rows(upload.file, upload.name))
+
+        if not result.rejected:
+            messages.success(self.request, f"Imported {result.created} {kind}.")
+            return super().form_valid(form)
+
+        # Hand the rejected rows back so they can be fixed and re-uploaded
+        messages.warning(self.request, f"Imported {result.created} {kind}, {result.rejected} rows were rejected.")
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{kind}-import-errors.csv"'
+        result.write_error_report(response)
+        return response
+
+
+class UnitBulkUpdateView(CompanyRequiredMixin, CompanyViewMixin, TitleMixin, FormView):
+    """Preview and apply a rent/deposit/vacancy change to a filtered set of units"""
+    template_name = "properties/unit_bulk_update.html"
+    form_class = UnitBulkUpdateForm
+    title = "Bulk Update Units"
+    success_url = reverse_lazy("properties:unit-list")
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['company'] = self.get_company()
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['recent_operations'] = UnitBulkOperation.objects.filter(
+            company=self.get_company()
+        ).select_related('performed_by')[:10]
+        return context
+
+    def form_valid(self, form):
+        units = form.get_units()
+        if 'apply' not in self.request.POST:
+            return self.render_to_response(self.get_context_data(form=form, preview=form.change.preview(units)))
+
+        operation = form.change.apply(
+            units, self.get_company(), performed_by=self.request.user, filters=form.get_filters()
+        )
+        messages.success(self.request, f"Updated {operation.units_affected} units.")
+        return super().form_valid(form)
+
+
 class PropertyImageUploadView(BaseCreateView):
     model = PropertyImage
     form_class = PropertyImageForm
@@ -216,29 +439,25 @@ class PropertyImageUploadView(BaseCreateView):
             }, status=400)
 
 
+def company_property_images(company):
+    """Images attached to any of the company's properties"""
+    # Every property model carries company, so each branch is a single-table subquery
+    ownership = Q()
+    for Model in (Estate, Building, Unit, SubUnit):
+        ownership |= Q(
+            content_type=ContentType.objects.get_for_model(Model),
+            object_id__in=Model.objects.filter(company=company).values('id'),
+        )
+    return PropertyImage.objects.filter(ownership)
+
+
 class PropertyImageDeleteView(CompanyViewMixin, View):
     model = PropertyImage
     http_method_names = ['delete']
     
     def get_queryset(self):
         """Ensure users can only delete images from their company's properties"""
-        # Get all content types for our property models
-        estate_ct = ContentType.objects.get_for_model(Estate)
-        building_ct = ContentType.objects.get_for_model(Building)
-        unit_ct = ContentType.objects.get_for_model(Unit)
-        subunit_ct = ContentType.objects.get_for_model(SubUnit)
-        
-        company = self.get_company()
-        
-        # Filter images based on content type and company ownership
-        return PropertyImage.objects.filter(
-            (
-                (Q(content_type=estate_ct) & Q(object_id__in=Estate.objects.filter(company=company).values('id'))) |
-                (Q(content_type=building_ct) & Q(object_id__in=Building.objects.filter(company=company).values('id'))) |
-                (Q(content_type=unit_ct) & Q(object_id__in=Unit.objects.filter(company=company).values('id'))) |
-                (Q(content_type=subunit_ct) & Q(object_id__in=SubUnit.objects.filter(parent_unit__company=company).values('id')))
-            )
-        )
+        return company_property_images(self.get_company())
 
     def get_object(self, queryset=None):
         """Get the image object to delete"""
@@ -268,10 +487,7 @@ class PropertyImageSetPrimaryView(BaseUpdateView):
     
     def get_queryset(self):
         """Ensure users can only modify images from their company's properties"""
-        return PropertyImage.objects.filter(
-            content_type__model__in=['estate', 'building', 'unit', 'subunit'],
-            property_object__company=self.get_company()
-        )
+        return company_property_images(self.get_company())
 
     def post(self, request, *args, **kwargs):
         """Handle setting an image as primary"""